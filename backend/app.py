@@ -14,7 +14,7 @@ from fastapi.middleware.cors import CORSMiddleware
 from prometheus_fastapi_instrumentator import Instrumentator
 
 from db import init_db
-from routes import assistant, categorize, gmail, accounts, scheduler, templates, categories, threads
+from routes import assistant, categorize, gmail, accounts, scheduler, templates, categories, threads, jobs
 
 load_dotenv()
 
@@ -93,6 +93,7 @@ app.include_router(scheduler.router, prefix="/scheduler", tags=["Scheduler"])
 app.include_router(templates.router, prefix="/templates", tags=["Templates"])
 app.include_router(categories.router, prefix="/categories", tags=["Categories"])
 app.include_router(threads.router, prefix="/threads", tags=["Threads"])
+app.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
 
 
 # Initialize Prometheus instrumentation before startup
@@ -105,6 +106,29 @@ async def _startup():
     # Initialize default categories
     from services.category_service import initialize_default_categories
     initialize_default_categories()
+    # Build or attach the full-text search index
+    from services.search_index import init_search_index
+    init_search_index()
+    # Continue bulk jobs interrupted by the previous shutdown
+    from services.job_service import resume_jobs
+    resume_jobs()
+
+
+@app.on_event("shutdown")
+async def _shutdown():
+    # Stop scheduled syncs and hand any account leases to the other replicas
+    from services.scheduler import shutdown_scheduler
+    shutdown_scheduler()
+    # Unfinished jobs keep their checkpoint and resume at the next startup
+    from services.job_service import shutdown as shutdown_jobs
+    shutdown_jobs()
+    # Close the OpenAI client's HTTP connection pool
+    from services.gpt_service import close_async_client
+    await close_async_client()
+    # Close pooled connections (and checkpoint the SQLite WAL)
+    from db import dispose_async_engine, dispose_engine
+    dispose_engine()
+    await dispose_async_engine()
 
 
 @app.get("/", tags=["Health"])
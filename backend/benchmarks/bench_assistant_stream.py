@@ -0,0 +1,90 @@
+"""/assistant/reply vs /assistant/reply/stream: time to first byte and total time.
+
+Usage (from backend/):
+    python benchmarks/bench_assistant_stream.py [--words 150] [--word-ms 20] [--latency-ms 300]
+
+Starts uvicorn against the local fake OpenAI server from tests/fake_openai.py,
+which takes ``--latency-ms`` before the first token and ``--word-ms`` per
+generated word, and reports when the first response bytes and the last
+arrived for each endpoint. A last run hangs up after the first event and
+reports how many words the fake server still generated.
+"""
+import argparse
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND / "tests"))
+
+from fake_openai import FakeOpenAIServer  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def timed(client, path, prompt):
+    start = time.perf_counter()
+    first = None
+    with client.stream("POST", path, json={"prompt": prompt}) as response:
+        for _ in response.iter_raw():
+            if first is None:
+                first = time.perf_counter() - start
+    return first, time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--words", type=int, default=150)
+    parser.add_argument("--word-ms", type=float, default=20)
+    parser.add_argument("--latency-ms", type=float, default=300)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    prompt = " ".join(f"word{n}" for n in range(args.words))
+    port = free_port()
+    db_path = Path(tempfile.mkdtemp()) / "bench_assistant_stream.db"
+    with FakeOpenAIServer(latency=args.latency_ms / 1000, chunk_delay=args.word_ms / 1000) as fake:
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}", "OPENAI_API_KEY": "bench",
+               "OPENAI_BASE_URL": fake.url, "HF_HUB_OFFLINE": "1", "TRANSFORMERS_OFFLINE": "1"}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+            cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+                for _ in range(300):
+                    try:
+                        client.get("/healthz")
+                        break
+                    except httpx.TransportError:
+                        time.sleep(0.2)
+                print(f"{args.words} words, {args.latency_ms:g} ms to first token, {args.word_ms:g} ms per word")
+                print(f"{'endpoint':>24} {'first byte ms':>14} {'total ms':>9}")
+                for path in ("/assistant/reply", "/assistant/reply/stream"):
+                    first, total = timed(client, path, prompt)
+                    print(f"{path:>24} {first * 1000:>14.0f} {total * 1000:>9.0f}")
+
+                sent = fake.chunks_sent
+                with client.stream("POST", "/assistant/reply/stream", json={"prompt": prompt}) as response:
+                    next(response.iter_raw())
+                time.sleep(1)
+                print(f"abandoned stream: {fake.chunks_sent - sent} of {args.words + 1} chunks generated, "
+                      f"upstream aborted: {fake.streams_aborted == 1}")
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Hot read endpoints under load: threadpool (sync engine) vs DB_ASYNC (async engine).
+
+Usage (from backend/):
+    python benchmarks/bench_async_db.py [--rows 5000] [--clients 200] [--seconds 15]
+
+Seeds a throwaway SQLite database, then for each mode starts uvicorn on it
+and drives ``--clients`` concurrent connections at ``/gmail/list`` and
+``/gmail/search`` for ``--seconds``, reporting requests/s and p50/p99 latency.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import httpx
+
+BACKEND = Path(__file__).resolve().parent.parent
+DB_PATH = Path(tempfile.mkdtemp()) / "bench_async_db.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, str(BACKEND))
+
+import app  # noqa: E402,F401 - registers every table for init_db
+from db import engine, init_db  # noqa: E402
+from models.email import EmailRecord  # noqa: E402
+
+PATHS = ["/gmail/list?limit=50", "/gmail/search?category=Work&limit=50", "/gmail/list?status=keep&limit=20"]
+
+
+def seed(rows):
+    init_db()
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        conn.execute(EmailRecord.__table__.insert(), [
+            {"gmail_id": f"g{i}", "subject": f"Subject {i}", "snippet": "preview " * 20, "body_text": "body " * 400,
+             "body_state": "full", "from_email": f"sender{i % 50}@example.com", "status": "keep",
+             "category": ("Work", "Personal")[i % 2], "is_read": False, "is_starred": False,
+             "has_attachments": False, "created_at": now - timedelta(seconds=i), "updated_at": now}
+            for i in range(rows)
+        ])
+    engine.dispose()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def drive(base_url, clients, seconds):
+    latencies, errors = [], 0
+    stop = time.monotonic() + seconds
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker(n):
+            nonlocal errors
+            i = n
+            while time.monotonic() < stop:
+                start = time.perf_counter()
+                response = await client.get(PATHS[i % len(PATHS)])
+                i += 1
+                if response.status_code != 200:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        await asyncio.gather(*(worker(n) for n in range(clients)))
+    return latencies, errors
+
+
+def run_mode(name, async_mode, clients, seconds):
+    port = free_port()
+    env = {**os.environ, "DB_ASYNC": "true" if async_mode else "false", "RATE_LIMIT_PER_MINUTE": "100000000",
+           "LOG_LEVEL": "WARNING", "HF_HUB_OFFLINE": "1", "TRANSFORMERS_OFFLINE": "1"}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(300):
+            try:
+                if httpx.get(f"{base_url}/healthz").status_code == 200:
+                    break
+            except httpx.TransportError:
+                time.sleep(0.2)
+        asyncio.run(drive(base_url, clients, 2))  # warm up pools and caches
+        latencies, errors = asyncio.run(drive(base_url, clients, seconds))
+    finally:
+        server.terminate()
+        server.wait()
+    q = statistics.quantiles(latencies, n=100)
+    print(f"{name:>10} {len(latencies) / seconds:>8.1f} {q[49] * 1000:>8.1f} {q[98] * 1000:>8.1f} {errors:>7}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=15)
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    seed(args.rows)
+    print(f"{args.rows} rows, {args.clients} concurrent clients, {args.seconds:g}s per mode")
+    print(f"{'mode':>10} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    run_mode("threadpool", False, args.clients, args.seconds)
+    run_mode("async", True, args.clients, args.seconds)
+    for suffix in ("", "-wal", "-shm"):
+        Path(f"{DB_PATH}{suffix}").unlink(missing_ok=True)
+
+
+if __name__ == "__main__":
+    main()
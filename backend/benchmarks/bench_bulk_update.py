@@ -0,0 +1,70 @@
+"""Bulk archive/read/star: load-then-mutate ORM loop vs set-based UPDATE.
+
+Usage (from backend/):
+    python benchmarks/bench_bulk_update.py [--rows 10000] [--body-kb 8]
+
+Fills a throwaway SQLite database with ``--rows`` emails carrying
+``--body-kb`` of body text, then flips ``is_read`` on all of them with the
+previous implementation (SELECT the rows, set the attribute, commit) and
+with ``email_store.bulk_update``.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+DB_PATH = Path(tempfile.mkdtemp()) / "bench_bulk_update.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlmodel import SQLModel, select  # noqa: E402
+
+from db import engine, get_session  # noqa: E402
+from models import account  # noqa: E402,F401 - EmailRecord references account.id
+from models.email import EmailRecord  # noqa: E402
+from services.email_store import bulk_update  # noqa: E402
+
+
+def orm_mark_read(ids, is_read):
+    """The previous implementation."""
+    with get_session() as session:
+        records = list(session.exec(select(EmailRecord).where(EmailRecord.id.in_(ids))))
+        for rec in records:
+            rec.is_read = is_read
+            rec.updated_at = datetime.utcnow()
+        session.commit()
+        return len(records)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--body-kb", type=int, default=8)
+    args = parser.parse_args()
+
+    SQLModel.metadata.create_all(engine)
+    body = "lorem ipsum " * (args.body_kb * 1024 // 12)
+    with engine.begin() as conn:
+        conn.execute(EmailRecord.__table__.insert(), [
+            {"gmail_id": f"g{i}", "subject": f"Subject {i}", "body_text": body, "body_state": "full",
+             "status": "keep", "is_read": False, "is_starred": False, "has_attachments": False,
+             "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()}
+            for i in range(args.rows)
+        ])
+    ids = list(range(1, args.rows + 1))
+
+    print(f"{args.rows} rows, {args.body_kb} KB bodies")
+    print(f"{'method':>12} {'seconds':>8} {'rows':>7}")
+    for name, run in (("orm loop", orm_mark_read), ("bulk_update", lambda ids, v: bulk_update(ids, is_read=v))):
+        start = time.perf_counter()
+        count = run(ids, True)
+        print(f"{name:>12} {time.perf_counter() - start:>8.3f} {count:>7}")
+        bulk_update(ids, is_read=False)
+    DB_PATH.unlink()
+
+
+if __name__ == "__main__":
+    main()
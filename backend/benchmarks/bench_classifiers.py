@@ -0,0 +1,99 @@
+"""Accuracy and latency of the category classifier engines.
+
+Usage (from backend/):
+    python benchmarks/bench_classifiers.py [--per-category 200] [--skip-zero-shot]
+
+Generates ``sample_emails.json``-style synthetic emails for every category,
+trains the trainable engines on 80% of them and scores all engines (plus the
+keyword rules) on the remaining 20%. The zero-shot engine is included when
+the BART model can be loaded; it is scored on a small subset because it is
+orders of magnitude slower.
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services import ai_service  # noqa: E402
+from services.classifier_engines import TRAINABLE_ENGINES, ZeroShotEngine  # noqa: E402
+
+CONTEXT = {
+    "Billing": ["amount due", "statement", "balance", "autopay", "billing cycle"],
+    "Account Info": ["two-factor", "sign-in attempt", "reset link", "profile", "credentials"],
+    "Work Update": ["sprint", "roadmap", "stakeholders", "milestone", "agenda"],
+    "Promotion": ["coupon", "save", "exclusive", "members only", "flash"],
+    "Spam": ["claim now", "wire", "beneficiary", "million dollars", "congratulations"],
+    "Personal": ["mom", "birthday", "catch up", "barbecue", "kids"],
+    "Travel": ["itinerary", "boarding pass", "check-in", "airport", "gate"],
+    "Shopping": ["tracking number", "package", "returns", "dispatched", "your items"],
+    "Newsletter": ["this week", "top stories", "edition", "read more", "curated"],
+    "Social": ["mentioned you", "new follower", "tagged", "profile view", "connections"],
+    "Support": ["ticket", "case number", "help desk", "resolved", "agent"],
+    "Legal": ["terms of service", "agreement", "compliance", "privacy policy", "counsel"],
+    "Education": ["course", "assignment", "lecture", "enrollment", "grades"],
+    "Healthcare": ["appointment", "prescription", "clinic", "lab results", "doctor"],
+    "Finance": ["portfolio", "dividend", "brokerage", "tax form", "interest rate"],
+}
+FILLER = "please let me know thanks for your time regards hello hi team note below attached".split()
+
+
+def make_corpus(per_category: int, seed: int = 3):
+    rng = random.Random(seed)
+    corpus = []
+    for label in ai_service.CATEGORIES:
+        vocabulary = ai_service.FALLBACK_KEYWORDS.get(label, []) + CONTEXT[label]
+        for _ in range(per_category):
+            words = rng.sample(vocabulary, k=2)
+            # Noise from other categories so neither rules nor models are trivially right.
+            for _ in range(rng.choice([0, 1, 2])):
+                other = rng.choice([c for c in ai_service.CATEGORIES if c != label])
+                words.append(rng.choice(ai_service.FALLBACK_KEYWORDS.get(other, []) + CONTEXT[other]))
+            rng.shuffle(words)
+            subject = " ".join(words[:2]).capitalize()
+            body = " ".join(rng.sample(FILLER, 5) + words + rng.sample(FILLER, 4))
+            corpus.append((f"{subject} {body}", label))
+    rng.shuffle(corpus)
+    return corpus
+
+
+def score(name, classify, test):
+    texts = [text for text, _ in test]
+    start = time.perf_counter()
+    predictions = classify(texts)
+    elapsed = time.perf_counter() - start
+    accuracy = sum(p == label for p, (_, label) in zip(predictions, test)) / len(test)
+    print(f"{name:>12} {accuracy:>9.3f} {elapsed / len(test) * 1000:>12.3f} {len(test):>6}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--per-category", type=int, default=200)
+    parser.add_argument("--zero-shot-samples", type=int, default=60)
+    parser.add_argument("--skip-zero-shot", action="store_true")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.per_category)
+    split = int(len(corpus) * 0.8)
+    train, test = corpus[:split], corpus[split:]
+
+    print(f"{'engine':>12} {'accuracy':>9} {'ms / email':>12} {'n':>6}")
+    score("rules", lambda texts: [ai_service._categorize_rule_based(t) for t in texts], test)
+    for name, engine_cls in TRAINABLE_ENGINES.items():
+        start = time.perf_counter()
+        engine = engine_cls().train([t for t, _ in train], [label for _, label in train])
+        print(f"{'':>12} trained {name} on {len(train)} emails in {time.perf_counter() - start:.2f}s")
+        score(name, engine.classify, test)
+
+    if not args.skip_zero_shot:
+        if ai_service.get_classifier() is None:
+            print(f"{'zero_shot':>12} skipped: model could not be loaded")
+        else:
+            engine = ZeroShotEngine(ai_service.get_classifier, ai_service.CATEGORIES)
+            score("zero_shot", engine.classify, test[:args.zero_shot_samples])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Concurrent SQLite reads and writes: default engine vs the tuned db.py engine.
+
+Usage (from backend/):
+    python benchmarks/bench_db_concurrency.py [--rows 5000] [--writers 4] [--readers 8] [--seconds 10]
+
+Runs writer threads (small UPDATE transactions, like sync upserts and flag
+changes) against reader threads (unindexed substring searches) on a throwaway
+database, first with the previous ``create_engine`` defaults and then with
+the pool and pragmas from ``db._engine_options``. Reports throughput,
+p95 latency and "database is locked" errors for each side.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+DB_DIR = Path(tempfile.mkdtemp())
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_DIR / 'unused.db'}"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import create_engine, event, func, select, update  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+import db  # noqa: E402
+from models import account  # noqa: E402,F401 - EmailRecord references account.id
+from models.email import EmailRecord  # noqa: E402
+
+table = EmailRecord.__table__
+
+
+def default_engine(url):
+    """The previous db.py engine."""
+    return create_engine(url, connect_args={"check_same_thread": False})
+
+
+def tuned_engine(url):
+    engine = create_engine(url, **db._engine_options(url))
+    event.listen(engine, "connect", db._apply_sqlite_pragmas)
+    return engine
+
+
+def seed(engine, rows):
+    SQLModel.metadata.create_all(engine)
+    body = "lorem ipsum " * 200
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [
+            {"gmail_id": f"g{i}", "subject": f"Subject {i}", "body_text": body, "body_state": "full",
+             "status": "keep", "is_read": False, "is_starred": False, "has_attachments": False,
+             "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()}
+            for i in range(rows)
+        ])
+
+
+def run(engine, rows, writers, readers, seconds):
+    stop = time.monotonic() + seconds
+    stats = {"write": [], "read": [], "locked": 0}
+    lock = threading.Lock()
+
+    def write():
+        while time.monotonic() < stop:
+            ids = random.sample(range(1, rows + 1), 20)
+            start = time.perf_counter()
+            try:
+                with engine.begin() as conn:
+                    for row_id in ids:
+                        conn.execute(update(table).where(table.c.id == row_id).values(
+                            is_read=random.random() < 0.5, updated_at=datetime.utcnow()))
+            except OperationalError as exc:
+                if "locked" not in str(exc):
+                    raise
+                with lock:
+                    stats["locked"] += 1
+                continue
+            with lock:
+                stats["write"].append(time.perf_counter() - start)
+
+    def read():
+        # An unindexed substring search: sqlite scans every body with the GIL released.
+        query = select(func.count()).select_from(table).where(table.c.body_text.like("%needle%"))
+        while time.monotonic() < stop:
+            start = time.perf_counter()
+            try:
+                with engine.connect() as conn:
+                    conn.execute(query).scalar_one()
+            except OperationalError as exc:
+                if "locked" not in str(exc):
+                    raise
+                with lock:
+                    stats["locked"] += 1
+                continue
+            with lock:
+                stats["read"].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=write) for _ in range(writers)]
+    threads += [threading.Thread(target=read) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats
+
+
+def p95(values):
+    return statistics.quantiles(values, n=20)[-1] * 1000 if len(values) > 1 else float("nan")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    print(f"{args.rows} rows, {args.writers} writers, {args.readers} readers, {args.seconds:g}s each")
+    print(f"{'engine':>8} {'writes/s':>9} {'w p95 ms':>9} {'reads/s':>9} {'r p95 ms':>9} {'locked':>7}")
+    for name, make in (("default", default_engine), ("tuned", tuned_engine)):
+        path = DB_DIR / f"{name}.db"
+        engine = make(f"sqlite:///{path}")
+        seed(engine, args.rows)
+        stats = run(engine, args.rows, args.writers, args.readers, args.seconds)
+        engine.dispose()
+        print(f"{name:>8} {len(stats['write']) / args.seconds:>9.1f} {p95(stats['write']):>9.1f} "
+              f"{len(stats['read']) / args.seconds:>9.1f} {p95(stats['read']):>9.1f} {stats['locked']:>7}")
+
+
+if __name__ == "__main__":
+    main()
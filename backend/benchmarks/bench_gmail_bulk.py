@@ -0,0 +1,62 @@
+"""Remote bulk delete/move: per-message calls vs batch requests and batchModify.
+
+Usage (from backend/):
+    python benchmarks/bench_gmail_bulk.py [--messages 1000] [--latency-ms 50]
+
+Runs against the local fake Gmail server from tests/fake_gmail.py, which
+adds ``--latency-ms`` to every HTTP request to stand in for the round trip
+to Google. The quota budget is disabled so only request shape is measured.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+sys.path.insert(0, str(BACKEND / "tests"))
+
+from fake_gmail import FakeGmailServer, make_message  # noqa: E402
+from services.gmail_service import QuotaBudget, delete_emails, move_emails_to_label  # noqa: E402
+
+
+def serial_trash(service, ids):
+    """The previous implementation: one trash call per message."""
+    for msg_id in ids:
+        service.users().messages().trash(userId="me", id=msg_id).execute()
+
+
+def serial_move(service, ids, label_id):
+    """The previous implementation: one modify call per message."""
+    for msg_id in ids:
+        service.users().messages().modify(userId="me", id=msg_id, body={"addLabelIds": [label_id]}).execute()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    args = parser.parse_args()
+
+    ids = [f"m{i:06d}" for i in range(args.messages)]
+    quota = QuotaBudget(units_per_second=0)
+    runs = [
+        ("serial trash", lambda service: serial_trash(service, ids)),
+        ("batched trash", lambda service: delete_emails(service, ids, quota=quota)),
+        ("serial modify", lambda service: serial_move(service, ids, "Label_1")),
+        ("batchModify", lambda service: move_emails_to_label(service, ids, "Label_1", quota=quota)),
+    ]
+    print(f"{args.messages} messages, {args.latency_ms:.0f} ms per request")
+    print(f"{'operation':>14} {'seconds':>8} {'requests':>9}")
+    for name, run in runs:
+        messages = [make_message(i) for i in range(args.messages)]
+        with FakeGmailServer(messages, latency=args.latency_ms / 1000) as server:
+            service = server.service()
+            start = time.perf_counter()
+            run(service)
+            elapsed = time.perf_counter() - start
+        print(f"{name:>14} {elapsed:>8.2f} {len(server.requests):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Gmail fetch latency: serial per-message gets vs batched, concurrent fetch.
+
+Usage (from backend/):
+    python benchmarks/bench_gmail_fetch.py [--messages 500] [--latency-ms 50] [--body-kb 20]
+
+Runs against the local fake Gmail server from tests/fake_gmail.py, which
+adds ``--latency-ms`` to every HTTP request to stand in for the round trip
+to Google. The quota budget is disabled so only request shape is measured.
+The last row fetches ``format=metadata`` (headers and snippet only).
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND))
+sys.path.insert(0, str(BACKEND / "tests"))
+
+from fake_gmail import FakeGmailServer, make_message  # noqa: E402
+from services.gmail_service import QuotaBudget, _parse_message, fetch_emails  # noqa: E402
+
+
+def serial_fetch(service, max_results: int):
+    """The previous implementation: one list call, then one get per message."""
+    results = service.users().messages().list(userId="me", maxResults=max_results).execute()
+    return [
+        _parse_message(service.users().messages().get(userId="me", id=msg["id"]).execute())
+        for msg in results.get("messages", [])
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--body-kb", type=int, default=20)
+    args = parser.parse_args()
+
+    body = ("lorem ipsum dolor sit amet " * (args.body_kb * 40))[:args.body_kb * 1024]
+    mailbox = [make_message(i, body=body) for i in range(args.messages)]
+    runs = [("serial gets", None, None, "full")] + [
+        (f"batch={batch} workers={workers}", batch, workers, "full")
+        for batch, workers in [(50, 1), (50, 4), (100, 4), (25, 8)]
+    ] + [("metadata batch=100 w=4", 100, 4, "metadata")]
+    print(f"{args.messages} messages of {args.body_kb} KB, {args.latency_ms:.0f} ms per HTTP request")
+    print(f"{'mode':>22} {'seconds':>9} {'requests':>9} {'msgs/s':>9} {'MB recv':>9}")
+    for name, batch, workers, message_format in runs:
+        with FakeGmailServer(mailbox, latency=args.latency_ms / 1000, page_size=500) as server:
+            service = server.service()
+            start = time.perf_counter()
+            if batch is None:
+                emails = serial_fetch(service, args.messages)
+            else:
+                emails = fetch_emails(service, args.messages, concurrency=workers, batch_size=batch,
+                                      quota=QuotaBudget(units_per_second=0), message_format=message_format)
+            elapsed = time.perf_counter() - start
+        assert len(emails) == args.messages
+        print(f"{name:>22} {elapsed:>9.2f} {len(server.requests):>9} {len(emails) / elapsed:>9.0f} "
+              f"{server.bytes_sent / 2**20:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
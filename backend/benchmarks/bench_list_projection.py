@@ -0,0 +1,73 @@
+"""/gmail/list and /gmail/search: full rows vs the summary projection.
+
+Usage (from backend/):
+    python benchmarks/bench_list_projection.py [--rows 2000] [--body-kb 16] [--limit 500]
+
+Fills a throwaway SQLite database with ``--rows`` emails carrying
+``--body-kb`` of body text and requests a ``--limit`` page through the app
+with ``fields=all`` (the previous full ``model_dump()`` rows) and with the
+default summary columns, reporting response size and median latency.
+"""
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+DB_PATH = Path(tempfile.mkdtemp()) / "bench_list_projection.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import app  # noqa: E402
+from db import engine  # noqa: E402
+from models.email import EmailRecord  # noqa: E402
+
+
+def measure(client, path, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        response = client.get(path, params=params)
+        timings.append(time.perf_counter() - start)
+        response.raise_for_status()
+    return len(response.content), statistics.median(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--body-kb", type=int, default=16)
+    parser.add_argument("--limit", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=15)
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    with TestClient(app) as client:
+        body = "lorem ipsum " * (args.body_kb * 1024 // 12)
+        with engine.begin() as conn:
+            conn.execute(EmailRecord.__table__.insert(), [
+                {"gmail_id": f"g{i}", "subject": f"Subject {i}", "snippet": body[:200], "body_text": body,
+                 "body_state": "full", "from_email": f"sender{i % 50}@example.com", "status": "keep",
+                 "category": "Work", "is_read": False, "is_starred": False, "has_attachments": False,
+                 "created_at": datetime.utcnow(), "updated_at": datetime.utcnow()}
+                for i in range(args.rows)
+            ])
+
+        print(f"{args.rows} rows, {args.body_kb} KB bodies, limit={args.limit}")
+        print(f"{'endpoint':>14} {'fields':>8} {'bytes':>11} {'ms':>8}")
+        for path, params in (("/gmail/list", {}), ("/gmail/search", {"category": "Work"})):
+            for fields in ("all", None):
+                query = {**params, "limit": args.limit, **({"fields": fields} if fields else {})}
+                size, seconds = measure(client, path, query, args.repeat)
+                print(f"{path:>14} {fields or 'summary':>8} {size:>11,} {seconds * 1000:>8.1f}")
+    DB_PATH.unlink()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Tail latency of LLM calls with and without the provider deadline and fallback.
+
+Usage (from backend/):
+    python benchmarks/bench_llm_fallback.py [--requests 400] [--stall-rate 0.05] [--stall-s 8] [--timeout-s 1]
+
+Runs ``llm_providers.complete`` against two in-process fake providers: the
+preferred one answers in ~80 ms but stalls for ``--stall-s`` on
+``--stall-rate`` of calls; the backup always answers in ~250 ms. The first
+run has no per-provider timeout or fallback, the second cuts attempts off at
+``--timeout-s`` and falls back. Reports p50/p95/p99 and the per-provider
+counts from the ``llm_call_seconds`` histogram.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services import llm_providers  # noqa: E402
+
+
+class FakeProvider:
+    def __init__(self, name, latency, stall_rate=0.0, stall=0.0):
+        self.name = name
+        self.latency = latency
+        self.stall_rate = stall_rate
+        self.stall = stall
+
+    def available(self):
+        return True
+
+    async def complete(self, prompt):
+        stalled = random.random() < self.stall_rate
+        await asyncio.sleep(self.stall if stalled else self.latency * random.uniform(0.8, 1.2))
+        return f"{self.name}: {prompt}"
+
+    async def stream(self, prompt):
+        yield await self.complete(prompt)
+
+
+def percentile(values, pct):
+    return sorted(values)[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def call_counts():
+    counts = {}
+    for metric in llm_providers.LLM_CALL_SECONDS.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_count") and sample.value:
+                key = f"{sample.labels['provider']}/{sample.labels['outcome']}"
+                counts[key] = counts.get(key, 0) + int(sample.value)
+    return counts
+
+
+async def run(requests):
+    async def one(n):
+        start = time.perf_counter()
+        await llm_providers.complete(f"email {n}", prefer="primary")
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(one(n) for n in range(requests)))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--stall-rate", type=float, default=0.05)
+    parser.add_argument("--stall-s", type=float, default=8.0)
+    parser.add_argument("--timeout-s", type=float, default=1.0)
+    args = parser.parse_args()
+
+    logging.getLogger("services.llm_providers").setLevel(logging.ERROR)
+    random.seed(7)
+    llm_providers.register(FakeProvider("primary", 0.08, args.stall_rate, args.stall_s))
+    llm_providers.register(FakeProvider("backup", 0.25))
+    llm_providers.LLM_PROVIDERS = ["primary", "backup"]
+    llm_providers.LLM_DEADLINE_SECONDS = args.stall_s * 2
+    # Keep the breaker out of it: every request should try the primary first.
+    llm_providers.LLM_BREAKER_FAILURES = args.requests + 1
+
+    for label, timeout, fallback in (
+        ("no deadline, no fallback", args.stall_s * 2, False),
+        (f"{args.timeout_s:g}s timeout + fallback", args.timeout_s, True),
+    ):
+        llm_providers.LLM_TIMEOUT_SECONDS = timeout
+        llm_providers.LLM_FALLBACK = fallback
+        llm_providers.reset()
+        before = call_counts()
+        latencies = asyncio.run(run(args.requests))
+        after = call_counts()
+        calls = {key: after[key] - before.get(key, 0) for key in after if after[key] != before.get(key, 0)}
+        print(
+            f"{label:28s} p50 {statistics.median(latencies) * 1000:6.0f} ms  "
+            f"p95 {percentile(latencies, 95) * 1000:6.0f} ms  p99 {percentile(latencies, 99) * 1000:6.0f} ms  "
+            f"max {max(latencies) * 1000:6.0f} ms  calls {calls}"
+        )
+
+
+if __name__ == "__main__":
+    main()
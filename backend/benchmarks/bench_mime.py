@@ -0,0 +1,104 @@
+"""Body extraction cost on synthetic nested and oversized MIME payloads.
+
+Usage (from backend/):
+    python benchmarks/bench_mime.py
+
+Compares the previous recursive ``_extract_body`` (decode everything, keep
+everything) with ``services.mime_body.extract_body`` (iterative walk,
+attachments skipped, per-part/per-message caps). Reports wall time, peak
+traced memory and characters kept per payload.
+"""
+import base64
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.mime_body import extract_body  # noqa: E402
+
+
+def legacy_extract_body(payload: dict) -> Tuple[str, str]:
+    """The previous recursive implementation from gmail_service."""
+    if not payload:
+        return "", ""
+    mime_type = payload.get("mimeType", "")
+    data = payload.get("body", {}).get("data")
+    plain_parts: List[str] = []
+    html_parts: List[str] = []
+    if data:
+        try:
+            decoded = base64.urlsafe_b64decode(data).decode("utf-8", errors="ignore")
+            if mime_type.startswith("text/plain"):
+                plain_parts.append(decoded)
+            elif mime_type.startswith("text/html"):
+                html_parts.append(decoded)
+            else:
+                plain_parts.append(decoded)
+        except Exception:
+            pass
+    for part in payload.get("parts") or []:
+        text_part, html_part = legacy_extract_body(part)
+        if text_part:
+            plain_parts.append(text_part)
+        if html_part:
+            html_parts.append(html_part)
+    if plain_parts:
+        return "\n".join(plain_parts), ("\n".join(html_parts) if html_parts else "")
+    if html_parts:
+        return "", "\n".join(html_parts)
+    return "", ""
+
+
+def leaf(mime_type: str, size: int, filename: str = "") -> dict:
+    raw = (b"The quick brown fox jumps over the lazy dog. " * (size // 45 + 1))[:size]
+    return {"mimeType": mime_type, "filename": filename,
+            "body": {"data": base64.urlsafe_b64encode(raw).decode(), "size": size}}
+
+
+def nested(depth: int) -> dict:
+    payload = {"mimeType": "multipart/alternative", "parts": [leaf("text/plain", 2000), leaf("text/html", 4000)]}
+    for _ in range(depth):
+        payload = {"mimeType": "multipart/mixed", "parts": [payload]}
+    return payload
+
+
+SCENARIOS = {
+    "typical plain+html 6 KB": {"mimeType": "multipart/alternative",
+                                "parts": [leaf("text/plain", 2000), leaf("text/html", 4000)]},
+    "nested depth 500": nested(500),
+    "nested depth 1500": nested(1500),
+    "20 MB inline text part": {"mimeType": "multipart/mixed", "parts": [leaf("text/plain", 20 * 2**20)]},
+    "10 MB inline PDF + text": {"mimeType": "multipart/mixed",
+                                "parts": [leaf("text/plain", 3000), leaf("application/pdf", 10 * 2**20, "a.pdf")]},
+    "1500 x 2 KB html parts": {"mimeType": "multipart/mixed", "parts": [leaf("text/html", 2048) for _ in range(1500)]},
+}
+
+
+def measure(extract, payload):
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        result = extract(payload)
+        kept = sum(len(x) for x in result[:2])
+    except RecursionError:
+        kept = None
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, kept
+
+
+def main() -> None:
+    print(f"{'payload':>26} {'impl':>7} {'ms':>9} {'peak MB':>9} {'chars kept':>11}")
+    for name, payload in SCENARIOS.items():
+        for label, extract in (("legacy", legacy_extract_body), ("new", extract_body)):
+            elapsed, peak, kept = measure(extract, payload)
+            kept_col = "RecursionError" if kept is None else f"{kept:,}"
+            print(f"{name:>26} {label:>7} {elapsed * 1000:>9.2f} {peak / 2**20:>9.2f} {kept_col:>11}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Query latency of the search backends over a synthetic mailbox.
+
+Usage (from backend/):
+    python benchmarks/bench_search.py [--size 100000] [--queries 200]
+
+Loads ``--size`` synthetic emails into a fresh SQLite file, then runs the same
+query mix against each backend and reports p50/p95 latency in milliseconds.
+The ``like`` backend is the original triple ``ILIKE '%q%'`` scan.
+"""
+import argparse
+import itertools
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_db_dir = tempfile.mkdtemp(prefix="bench_search_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/bench.db"
+os.environ["SEARCH_BACKEND"] = "fts5"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import insert  # noqa: E402
+
+from db import engine, init_db  # noqa: E402
+from models.account import Account  # noqa: E402,F401 - registers the FK target
+from models.email import EmailRecord  # noqa: E402
+from services import search_index  # noqa: E402
+from services.email_store import search_emails  # noqa: E402
+
+# Zipf-distributed vocabulary so term frequencies look like real mail: a few
+# words appear everywhere, most are rare.
+VOCABULARY = [f"term{rank}" for rank in range(20_000)]
+_CUM_WEIGHTS = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(VOCABULARY))))
+CATEGORIES = ["Billing", "Work Update", "Promotion", "Travel", "Shopping", "Personal"]
+
+
+def _sentence(rng: random.Random, length: int) -> str:
+    return " ".join(rng.choices(VOCABULARY, cum_weights=_CUM_WEIGHTS, k=length))
+
+
+def load_corpus(size: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    batch = []
+    with engine.begin() as conn:
+        for idx in range(size):
+            batch.append({
+                "gmail_id": f"bench-{idx}",
+                "subject": _sentence(rng, 6),
+                "snippet": _sentence(rng, 20),
+                "body_text": _sentence(rng, 200),
+                "from_email": f"sender{idx % 500}@example.com",
+                "category": rng.choice(CATEGORIES),
+                "status": "keep",
+            })
+            if len(batch) == 5000:
+                conn.execute(insert(EmailRecord), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(EmailRecord), batch)
+
+
+def run_queries(queries, filters) -> list:
+    latencies = []
+    for query, kwargs in zip(queries, filters):
+        start = time.perf_counter()
+        search_emails(query=query, limit=50, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--backends", nargs="+", default=["like", "fts5", "memory"])
+    args = parser.parse_args()
+
+    init_db()
+    search_index.set_search_backend("fts5")  # installs triggers before loading
+    start = time.perf_counter()
+    load_corpus(args.size)
+    print(f"loaded {args.size} emails in {time.perf_counter() - start:.1f}s")
+
+    rng = random.Random(11)
+    # Mid-frequency terms: common enough to match, rare enough to be selective.
+    query_terms = VOCABULARY[20:2000]
+    queries = [" ".join(rng.sample(query_terms, rng.choice([1, 2]))) for _ in range(args.queries)]
+    filters = [{"category": rng.choice(CATEGORIES)} if rng.random() < 0.5 else {} for _ in queries]
+
+    print(f"{'backend':>8} {'p50 ms':>9} {'p95 ms':>9} {'setup s':>8}")
+    for name in args.backends:
+        start = time.perf_counter()
+        search_index.set_search_backend(name)
+        setup_s = time.perf_counter() - start
+        run_queries(queries[:5], filters[:5])  # warm caches
+        latencies = sorted(run_queries(queries, filters))
+        p50 = statistics.median(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{name:>8} {p50:>9.1f} {p95:>9.1f} {setup_s:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
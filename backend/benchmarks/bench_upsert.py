@@ -0,0 +1,114 @@
+"""Compare the chunked upsert path with the original per-message loop.
+
+Usage (from backend/):
+    python benchmarks/bench_upsert.py [--sizes 100 1000 10000]
+
+Each size runs against a fresh SQLite file: one cold insert pass followed by a
+re-fetch pass that updates every row, which is what the scheduler does on
+every interval.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+_db_dir = tempfile.mkdtemp(prefix="bench_upsert_")
+os.environ["DATABASE_URL"] = f"sqlite:///{_db_dir}/bench.db"
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlmodel import SQLModel, delete, select  # noqa: E402
+
+from db import engine, get_session, init_db  # noqa: E402
+from models.account import Account  # noqa: E402,F401 - registers the FK target
+from models.email import EmailRecord  # noqa: E402
+from services.email_store import upsert_emails  # noqa: E402
+
+
+def legacy_upsert_emails(emails: Iterable[dict]) -> List[EmailRecord]:
+    """The pre-batching implementation: one SELECT and one refresh per email."""
+    records: List[EmailRecord] = []
+    with get_session() as session:
+        for email in emails:
+            gmail_id = email.get("gmail_id")
+            existing: Optional[EmailRecord] = None
+            if gmail_id:
+                stmt = select(EmailRecord).where(EmailRecord.gmail_id == gmail_id)
+                existing = session.exec(stmt).first()
+            defaults = {
+                "subject": email.get("subject", "No Subject"),
+                "snippet": email.get("snippet", ""),
+                "body_text": email.get("body_text", ""),
+                "from_email": email.get("from_email"),
+                "account_id": email.get("account_id"),
+                "category": email.get("category", "Unlabeled"),
+                "sentiment": email.get("sentiment", "Neutral"),
+                "urgency": email.get("urgency", "Normal"),
+                "status": email.get("status", "keep"),
+                "is_read": email.get("is_read", False),
+                "is_starred": email.get("is_starred", False),
+            }
+            if existing:
+                for field, value in defaults.items():
+                    setattr(existing, field, value if value is not None else getattr(existing, field))
+                existing.updated_at = datetime.utcnow()
+                records.append(existing)
+            else:
+                rec = EmailRecord(gmail_id=gmail_id, **defaults)
+                session.add(rec)
+                records.append(rec)
+        session.commit()
+        for rec in records:
+            session.refresh(rec)
+    return records
+
+
+def make_emails(count: int) -> List[dict]:
+    return [
+        {
+            "gmail_id": f"bench-{idx}",
+            "subject": f"Invoice #{idx} for your subscription",
+            "snippet": "Your monthly invoice is ready",
+            "body_text": "Hi there, your invoice is attached. " * 20,
+            "from_email": f"billing{idx % 50}@example.com",
+            "is_read": bool(idx % 2),
+        }
+        for idx in range(count)
+    ]
+
+
+def _reset() -> None:
+    with get_session() as session:
+        session.exec(delete(EmailRecord))
+        session.commit()
+
+
+def _time(fn, emails: List[dict]) -> float:
+    start = time.perf_counter()
+    fn(emails)
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    args = parser.parse_args()
+
+    SQLModel.metadata.drop_all(engine)
+    init_db()
+
+    print(f"{'size':>7} {'impl':>8} {'insert s':>10} {'update s':>10}")
+    for size in args.sizes:
+        emails = make_emails(size)
+        for name, fn in (("legacy", legacy_upsert_emails), ("batched", upsert_emails)):
+            _reset()
+            insert_s = _time(fn, emails)
+            update_s = _time(fn, emails)
+            print(f"{size:>7} {name:>8} {insert_s:>10.3f} {update_s:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,16 +1,192 @@
 import os
+import time
+from pathlib import Path
 
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event, inspect
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from sqlmodel import SQLModel, Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./emails.db")
+# Apply pending Alembic migrations at startup; disable when migrations run as a deploy step.
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "true").lower() in {"1", "true", "yes"}
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+# Serve the hot read endpoints from an async engine (aiosqlite / asyncpg) on
+# the event loop instead of from the sync engine on the threadpool.
+DB_ASYNC = os.getenv("DB_ASYNC", "false").lower() in {"1", "true", "yes"}
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "postgres": "postgresql+asyncpg"}
 
-connect_args = {"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {}
-engine = create_engine(DATABASE_URL, connect_args=connect_args, echo=False)
+# Connection pool. Size it for the API threadpool plus the sync and job workers.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+# Server databases only: drop connections the server or a proxy may have closed.
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in {"1", "true", "yes"}
+
+# SQLite pragmas, applied to every new connection. WAL lets readers run
+# alongside the single writer, and busy_timeout makes a second writer wait
+# for the lock instead of failing with "database is locked".
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "15000"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+
+POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+POOL_TIMEOUTS = Counter("db_pool_timeouts_total", "Connection checkouts that timed out waiting for the pool")
+POOL_CHECKED_OUT = Gauge("db_pool_checked_out", "Database connections currently checked out")
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size")
+POOL_SIZE = Gauge("db_pool_size", "Configured database connection pool size")
+
+
+class _TimedPool:
+    """Pool mixin that records how long each checkout waited."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+
+class _TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+
+class _TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    scheme, _, path = url.partition("://")
+    return scheme.startswith("sqlite") and path.lstrip("/") in {"", ":memory:"}
+
+
+def _engine_options(url: str, is_async: bool = False) -> dict:
+    if _is_memory_sqlite(url):
+        # One shared connection per thread; there is nothing to pool.
+        return {"connect_args": {"check_same_thread": False}}
+    options = {
+        "poolclass": _TimedAsyncQueuePool if is_async else _TimedQueuePool,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+    }
+    if url.startswith("sqlite"):
+        options["connect_args"] = {"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+    else:
+        options.update(pool_pre_ping=DB_POOL_PRE_PING, pool_recycle=DB_POOL_RECYCLE_SECONDS)
+    return options
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        # Negative cache_size is in KiB rather than pages.
+        cursor.execute(f"PRAGMA cache_size = {-SQLITE_CACHE_SIZE_KB}")
+    finally:
+        cursor.close()
+
+
+engine = create_engine(DATABASE_URL, echo=False, **_engine_options(DATABASE_URL))
+if engine.dialect.name == "sqlite" and not _is_memory_sqlite(DATABASE_URL):
+    event.listen(engine, "connect", _apply_sqlite_pragmas)
+if isinstance(engine.pool, QueuePool):
+    POOL_SIZE.set(engine.pool.size())
+    POOL_CHECKED_OUT.set_function(lambda: engine.pool.checkedout())
+    POOL_OVERFLOW.set_function(lambda: max(0, engine.pool.overflow()))
 
 
 def init_db() -> None:
+    """Create missing tables, then bring the schema to the latest migration.
+
+    A brand-new database gets the current schema from ``create_all`` and is
+    stamped at head; an existing one is upgraded so new indexes and columns
+    are applied to tables ``create_all`` will not touch.
+    """
+    fresh = not inspect(engine).has_table("emailrecord")
     SQLModel.metadata.create_all(engine)
+    if fresh:
+        run_migrations("stamp")
+    elif DB_AUTO_MIGRATE:
+        run_migrations("upgrade")
+
+
+def run_migrations(action: str = "upgrade", revision: str = "head") -> None:
+    from alembic import command
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    config.attributes["configure_logger"] = False
+    with engine.begin() as connection:
+        config.attributes["connection"] = connection
+        getattr(command, action)(config, revision)
 
 
 def get_session() -> Session:
     return Session(engine)
+
+
+def dispose_engine() -> None:
+    """Close pooled connections; on SQLite the last close checkpoints and removes the WAL."""
+    engine.dispose()
+
+
+def async_database_url(url: str) -> str:
+    """``url`` with its driver swapped for the asyncio one (aiosqlite / asyncpg)."""
+    scheme, _, rest = url.partition("://")
+    driver = ASYNC_DRIVERS.get(scheme.split("+", 1)[0])
+    if driver is None:
+        raise ValueError(f"No async driver for database URL scheme {scheme!r}")
+    return f"{driver}://{rest}"
+
+
+_async_engine = None
+
+
+def get_async_engine():
+    """The asyncio engine for ``DATABASE_URL``, created on first use with the same pool and pragmas."""
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        url = async_database_url(DATABASE_URL)
+        _async_engine = create_async_engine(url, echo=False, **_engine_options(url, is_async=True))
+        if _async_engine.dialect.name == "sqlite" and not _is_memory_sqlite(url):
+            event.listen(_async_engine.sync_engine, "connect", _apply_sqlite_pragmas)
+    return _async_engine
+
+
+def get_async_session() -> AsyncSession:
+    # Results are used after the session closes, as with the sync get_session callers.
+    return AsyncSession(get_async_engine(), expire_on_commit=False)
+
+
+async def run_db(sync_fn, async_fn, *args, **kwargs):
+    """Call ``async_fn`` on the event loop when ``DB_ASYNC`` is on, else ``sync_fn`` on the threadpool."""
+    if DB_ASYNC:
+        return await async_fn(*args, **kwargs)
+    return await run_in_threadpool(sync_fn, *args, **kwargs)
+
+
+async def dispose_async_engine() -> None:
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
@@ -0,0 +1,66 @@
+"""Alembic environment.
+
+Tables are created by ``db.init_db()``; migrations carry everything
+``create_all`` cannot apply to an existing database (new indexes, new columns).
+``init_db()`` stamps fresh databases at head and upgrades existing ones.
+"""
+from logging.config import fileConfig
+
+from alembic import context
+from sqlmodel import SQLModel
+
+import db
+from models import (  # noqa: F401 - populate metadata; autogenerate drops tables missing here
+    account,
+    analysis_cache,
+    category,
+    email,
+    job,
+    llm_cache,
+    scheduler_lease,
+    sync_state,
+    template,
+    thread,
+)
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = SQLModel.metadata
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=db.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=db.DATABASE_URL.startswith("sqlite"),
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with db.engine.connect() as connection:
+        _run(connection)
+
+
+def _run(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
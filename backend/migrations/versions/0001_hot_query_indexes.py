@@ -0,0 +1,58 @@
+"""Composite indexes for hot email and thread list/search queries
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17
+
+Query shapes covered (see tests/test_query_plans.py):
+- email_store.list_emails / search_emails: optional equality filter on
+  status, category, is_read or is_starred, ordered by created_at DESC, id DESC.
+- threading_service.get_thread_emails: thread_id, ordered by created_at.
+- threading_service.list_threads: [account_id,] is_archived, ordered by
+  last_message_at DESC NULLS LAST, id DESC.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+EMAIL_INDEXES = {
+    "ix_emailrecord_created_at_id": ["created_at", "id"],
+    "ix_emailrecord_status_created_at_id": ["status", "created_at", "id"],
+    "ix_emailrecord_category_created_at_id": ["category", "created_at", "id"],
+    "ix_emailrecord_is_read_created_at_id": ["is_read", "created_at", "id"],
+    "ix_emailrecord_is_starred_created_at_id": ["is_starred", "created_at", "id"],
+    "ix_emailrecord_thread_id_created_at": ["thread_id", "created_at"],
+}
+
+
+def _thread_indexes(dialect: str) -> dict:
+    if dialect == "postgresql":
+        ordering = [sa.text("last_message_at DESC NULLS LAST"), sa.text("id DESC")]
+        return {
+            "ix_emailthread_archived_last_message_pg": ["is_archived", *ordering],
+            "ix_emailthread_account_archived_last_message_pg": ["account_id", "is_archived", *ordering],
+        }
+    return {
+        "ix_emailthread_archived_last_message": ["is_archived", "last_message_at", "id"],
+        "ix_emailthread_account_archived_last_message": ["account_id", "is_archived", "last_message_at", "id"],
+    }
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for name, columns in EMAIL_INDEXES.items():
+        op.create_index(name, "emailrecord", columns, if_not_exists=True)
+    for name, columns in _thread_indexes(dialect).items():
+        op.create_index(name, "emailthread", columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+    for name in _thread_indexes(dialect):
+        op.drop_index(name, table_name="emailthread", if_exists=True)
+    for name in EMAIL_INDEXES:
+        op.drop_index(name, table_name="emailrecord", if_exists=True)
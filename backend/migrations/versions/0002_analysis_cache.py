@@ -0,0 +1,35 @@
+"""Persistent analysis cache table
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17
+
+Backs the second tier of services.analysis_cache: one row per
+(content hash, analysis version).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("analysiscacheentry"):
+        return
+    op.create_table(
+        "analysiscacheentry",
+        sa.Column("content_hash", sa.String(length=64), nullable=False),
+        sa.Column("version", sa.String(length=128), nullable=False),
+        sa.Column("category", sa.String(), nullable=False),
+        sa.Column("sentiment", sa.String(), nullable=False),
+        sa.Column("urgency", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("content_hash", "version"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("analysiscacheentry")
@@ -0,0 +1,35 @@
+"""Content fingerprint and analysis version on emailrecord
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+
+Existing rows keep NULLs; upsert_emails fills content_hash the next time a
+row is fetched and the fetch pipeline re-analyzes it once.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+COLUMNS = {
+    "content_hash": sa.String(length=64),
+    "analysis_version": sa.String(length=128),
+}
+
+
+def upgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("emailrecord")}
+    with op.batch_alter_table("emailrecord") as batch:
+        for name, type_ in COLUMNS.items():
+            if name not in existing:
+                batch.add_column(sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("emailrecord") as batch:
+        for name in COLUMNS:
+            batch.drop_column(name)
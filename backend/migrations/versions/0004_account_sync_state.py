@@ -0,0 +1,33 @@
+"""Per-account Gmail sync state
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+
+Stores the last seen Gmail historyId per account for incremental syncs.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("accountsyncstate"):
+        return
+    op.create_table(
+        "accountsyncstate",
+        sa.Column("account_id", sa.Integer(), sa.ForeignKey("account.id"), nullable=False),
+        sa.Column("history_id", sa.String(), nullable=True),
+        sa.Column("last_full_sync_at", sa.DateTime(), nullable=True),
+        sa.Column("last_synced_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("account_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("accountsyncstate")
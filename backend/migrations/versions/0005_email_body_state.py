@@ -0,0 +1,28 @@
+"""Body hydration state on emailrecord
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17
+
+Existing rows were fetched with full bodies and default to 'full'.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("emailrecord")}
+    if "body_state" in existing:
+        return
+    with op.batch_alter_table("emailrecord") as batch:
+        batch.add_column(sa.Column("body_state", sa.String(length=16), nullable=False, server_default="full"))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("emailrecord") as batch:
+        batch.drop_column("body_state")
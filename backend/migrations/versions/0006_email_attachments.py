@@ -0,0 +1,29 @@
+"""Attachment metadata on emailrecord
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+
+JSON list of {filename, mime_type, size, attachment_id}; NULL for rows
+fetched before attachment parsing.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = {c["name"] for c in sa.inspect(op.get_bind()).get_columns("emailrecord")}
+    if "attachments" in existing:
+        return
+    with op.batch_alter_table("emailrecord") as batch:
+        batch.add_column(sa.Column("attachments", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("emailrecord") as batch:
+        batch.drop_column("attachments")
@@ -0,0 +1,35 @@
+"""Scheduler leases
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+
+Row leases that let several backend replicas share scheduled account syncs.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("schedulerlease"):
+        return
+    op.create_table(
+        "schedulerlease",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("owner", sa.String(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.create_index("ix_schedulerlease_owner", "schedulerlease", ["owner"])
+    op.create_index("ix_schedulerlease_expires_at", "schedulerlease", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_schedulerlease_expires_at", table_name="schedulerlease")
+    op.drop_index("ix_schedulerlease_owner", table_name="schedulerlease")
+    op.drop_table("schedulerlease")
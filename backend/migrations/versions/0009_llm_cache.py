@@ -0,0 +1,36 @@
+"""LLM response cache
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+
+Persisted summaries and action items keyed by operation, model and prompt hash.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table("llmcacheentry"):
+        return
+    op.create_table(
+        "llmcacheentry",
+        sa.Column("key", sa.String(length=64), nullable=False),
+        sa.Column("operation", sa.String(length=64), nullable=False),
+        sa.Column("model", sa.String(length=128), nullable=False),
+        sa.Column("response", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("key"),
+    )
+    op.create_index("ix_llmcacheentry_expires_at", "llmcacheentry", ["expires_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_llmcacheentry_expires_at", table_name="llmcacheentry")
+    op.drop_table("llmcacheentry")
@@ -0,0 +1,17 @@
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class AnalysisCacheEntry(SQLModel, table=True):
+    """Persisted result of ``ai_service`` analysis for one email content hash."""
+    # sha256 of subject + body; see services.analysis_cache.content_hash
+    content_hash: str = Field(primary_key=True, max_length=64)
+    # Engine version + label set + sentiment model; a model change misses every old row
+    version: str = Field(primary_key=True, max_length=128)
+
+    category: str
+    sentiment: str
+    urgency: str
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,10 +1,23 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
+from sqlalchemy import JSON, Column, Index
 from sqlmodel import Field, SQLModel
 
 
 class EmailRecord(SQLModel, table=True):
+    # Composite indexes for the list/search shapes in email_store and
+    # threading_service: equality filter, then newest-first keyset order.
+    # Existing databases get them from migrations/versions/0001.
+    __table_args__ = (
+        Index("ix_emailrecord_created_at_id", "created_at", "id"),
+        Index("ix_emailrecord_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_emailrecord_category_created_at_id", "category", "created_at", "id"),
+        Index("ix_emailrecord_is_read_created_at_id", "is_read", "created_at", "id"),
+        Index("ix_emailrecord_is_starred_created_at_id", "is_starred", "created_at", "id"),
+        Index("ix_emailrecord_thread_id_created_at", "thread_id", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     gmail_id: Optional[str] = Field(default=None, index=True)
     account_id: Optional[int] = Field(default=None, foreign_key="account.id", index=True)
@@ -14,14 +27,23 @@ class EmailRecord(SQLModel, table=True):
     subject: str
     snippet: Optional[str] = Field(default="", max_length=2000)
     body_text: Optional[str] = Field(default="") # Added full body storage
+    # "full" once body_text is downloaded; "metadata" rows only have headers/snippet
+    # until sync_service.hydrate_emails fetches the body on demand.
+    body_state: str = Field(default="full", max_length=16, sa_column_kwargs={"server_default": "full"})
     from_email: Optional[str] = Field(default=None, index=True)
     to_email: Optional[str] = Field(default=None)  # Recipients
     has_attachments: bool = Field(default=False)  # Attachment indicator
+    # [{filename, mime_type, size, attachment_id}] from services.mime_body; bytes stay in Gmail
+    attachments: Optional[List[dict]] = Field(default=None, sa_column=Column(JSON))
     
     # AI Analysis Fields
     category: Optional[str] = Field(default="Unlabeled")
     sentiment: Optional[str] = Field(default="Neutral") # New: Positive/Negative/Neutral
     urgency: Optional[str] = Field(default="Normal")    # New: High/Normal
+    # sha256 of subject + body (services.analysis_cache.content_hash) and the
+    # ai_service.analysis_version() that produced the fields above; NULL = not analyzed.
+    content_hash: Optional[str] = Field(default=None, max_length=64)
+    analysis_version: Optional[str] = Field(default=None, max_length=128)
     
     # User Interaction
     status: str = Field(default="keep")  # keep | delete_review | deleted | archived
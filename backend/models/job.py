@@ -0,0 +1,29 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import JSON, Column
+from sqlmodel import Field, SQLModel
+
+
+class Job(SQLModel, table=True):
+    """A background bulk operation run by services.job_service."""
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(index=True)  # gmail.delete | gmail.move
+    status: str = Field(default="queued", index=True)  # queued | running | succeeded | failed
+
+    # {"items": [...], plus kind-specific arguments such as label_id}
+    params: dict = Field(default_factory=dict, sa_column=Column(JSON))
+    total: int = Field(default=0)
+    # Items handled so far, in order; a resumed job continues from here.
+    processed: int = Field(default=0)
+    succeeded_count: int = Field(default=0)
+    failed_count: int = Field(default=0)
+    # item -> error for failed items, capped at JOB_MAX_FAILURE_DETAILS entries
+    failures: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    error: Optional[str] = Field(default=None)
+    attempts: int = Field(default=0)
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = Field(default=None)
+    finished_at: Optional[datetime] = Field(default=None)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
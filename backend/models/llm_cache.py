@@ -0,0 +1,15 @@
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class LLMCacheEntry(SQLModel, table=True):
+    """Persisted LLM answer; see services.llm_cache."""
+    # sha256 of operation + model + normalized prompt
+    key: str = Field(primary_key=True, max_length=64)
+    operation: str = Field(max_length=64)
+    model: str = Field(max_length=128)
+    response: str
+
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)
@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from sqlmodel import Field, SQLModel
+
+
+class SchedulerLease(SQLModel, table=True):
+    """Time-limited ownership of a named resource by one backend replica.
+
+    Used by services.leases: ``account:<id>`` rows say which replica syncs an
+    account, ``replica:<id>`` rows are replica heartbeats.
+    """
+    name: str = Field(primary_key=True)
+    owner: str = Field(index=True)
+    expires_at: datetime = Field(index=True)
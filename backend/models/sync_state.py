@@ -0,0 +1,16 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import Field, SQLModel
+
+
+class AccountSyncState(SQLModel, table=True):
+    """Per-account Gmail sync cursor used by services.sync_service."""
+    account_id: int = Field(foreign_key="account.id", primary_key=True)
+
+    # Gmail historyId the local copy is current to; NULL forces a full sync
+    history_id: Optional[str] = Field(default=None)
+    last_full_sync_at: Optional[datetime] = Field(default=None)
+    last_synced_at: Optional[datetime] = Field(default=None)
+
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
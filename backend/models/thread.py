@@ -1,6 +1,7 @@
 from datetime import datetime
 from typing import Optional
 
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
 
 
@@ -30,3 +31,28 @@ class EmailThread(SQLModel, table=True):
     
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+def _not_postgresql(ddl, target, bind, **kw) -> bool:
+    return kw["dialect"].name != "postgresql"
+
+
+# list_threads orders by last_message_at DESC NULLS LAST, id DESC. SQLite
+# cannot spell NULLS LAST in an index but already sorts NULLs last under DESC;
+# PostgreSQL needs the explicit ordering to avoid a sort.
+_columns = EmailThread.__table__.c
+Index(
+    "ix_emailthread_archived_last_message", _columns.is_archived, _columns.last_message_at, _columns.id,
+).ddl_if(callable_=_not_postgresql)
+Index(
+    "ix_emailthread_account_archived_last_message",
+    _columns.account_id, _columns.is_archived, _columns.last_message_at, _columns.id,
+).ddl_if(callable_=_not_postgresql)
+Index(
+    "ix_emailthread_archived_last_message_pg",
+    _columns.is_archived, _columns.last_message_at.desc().nulls_last(), _columns.id.desc(),
+).ddl_if(dialect="postgresql")
+Index(
+    "ix_emailthread_account_archived_last_message_pg",
+    _columns.account_id, _columns.is_archived, _columns.last_message_at.desc().nulls_last(), _columns.id.desc(),
+).ddl_if(dialect="postgresql")
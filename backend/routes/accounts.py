@@ -4,6 +4,7 @@ from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, EmailStr, Field
 
+from services import gmail_clients
 from services.account_service import (
     create_account,
     delete_account,
@@ -98,6 +99,8 @@ def update_tokens(account_id: int, payload: TokenUpdate):
     )
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
+    # The next Gmail call loads the new tokens instead of the cached ones.
+    gmail_clients.invalidate(account_id)
     return {"account": account.model_dump()}
 
 
@@ -107,4 +110,5 @@ def remove_account(account_id: int):
     success = delete_account(account_id)
     if not success:
         raise HTTPException(status_code=404, detail="Account not found")
+    gmail_clients.invalidate(account_id)
     return {"deleted": True}
@@ -1,9 +1,26 @@
 
+import asyncio
+import json
+from typing import AsyncIterator
+
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
+from prometheus_client import Counter
 from pydantic import BaseModel, Field
 
-from services.gpt_service import generate_reply
-from services.gemini_service import generate_summary, extract_action_items, rewrite_draft
+from services.gpt_service import generate_reply_async, stream_reply
+from services.gemini_service import (
+    extract_action_items,
+    generate_summary,
+    rewrite_draft,
+    stream_action_items,
+    stream_rewrite,
+    stream_summary,
+)
+
+STREAMS_CANCELLED = Counter(
+    "assistant_streams_cancelled_total", "Assistant SSE streams abandoned by the client", ["endpoint"]
+)
 
 
 class PromptRequest(BaseModel):
@@ -18,25 +35,71 @@ class RewriteRequest(BaseModel):
 router = APIRouter()
 
 
+def _event_stream(endpoint: str, chunks: AsyncIterator[str]) -> StreamingResponse:
+    """Relay ``chunks`` as Server-Sent Events: ``{"delta": ...}`` messages, then ``event: done``.
+
+    When the client disconnects Starlette cancels this task; the cancellation
+    reaches the model call inside ``chunks``, which stops generating.
+    """
+
+    async def events():
+        try:
+            async for chunk in chunks:
+                yield f"data: {json.dumps({'delta': chunk})}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except asyncio.CancelledError:
+            STREAMS_CANCELLED.labels(endpoint=endpoint).inc()
+            raise
+        finally:
+            await chunks.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # Keep proxies (nginx) from buffering the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.post("/reply")
-def gpt_reply(request: PromptRequest):
-    reply = generate_reply(request.prompt)
+async def gpt_reply(request: PromptRequest):
+    reply = await generate_reply_async(request.prompt)
     return {"reply": reply}
 
 
+@router.post("/reply/stream")
+async def gpt_reply_stream(request: PromptRequest):
+    return _event_stream("reply", stream_reply(request.prompt))
+
+
 @router.post("/gemini/summarize")
 async def gemini_summarize(request: PromptRequest):
     summary = await generate_summary(request.prompt)
     return {"reply": summary}
 
 
+@router.post("/gemini/summarize/stream")
+async def gemini_summarize_stream(request: PromptRequest):
+    return _event_stream("summarize", stream_summary(request.prompt))
+
+
 @router.post("/gemini/actions")
 async def gemini_actions(request: PromptRequest):
     actions = await extract_action_items(request.prompt)
     return {"reply": actions}
 
 
+@router.post("/gemini/actions/stream")
+async def gemini_actions_stream(request: PromptRequest):
+    return _event_stream("actions", stream_action_items(request.prompt))
+
+
 @router.post("/gemini/rewrite")
 async def gemini_rewrite(request: RewriteRequest):
     rewritten = await rewrite_draft(request.text, request.tone)
     return {"reply": rewritten}
+
+
+@router.post("/gemini/rewrite/stream")
+async def gemini_rewrite_stream(request: RewriteRequest):
+    return _event_stream("rewrite", stream_rewrite(request.text, request.tone))
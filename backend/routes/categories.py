@@ -3,11 +3,14 @@ from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 
+from db import run_db
 from services.category_service import (
     create_category,
     delete_category,
     get_category,
+    get_category_async,
     list_categories,
+    list_categories_async,
     update_category,
 )
 
@@ -44,19 +47,21 @@ def create_new_category(payload: CategoryCreate):
 
 
 @router.get("/")
-def list_all_categories(
+async def list_all_categories(
     account_id: Optional[int] = None,
     include_global: bool = True,
 ):
     """List all categories."""
-    categories = list_categories(account_id=account_id, include_global=include_global)
+    categories = await run_db(
+        list_categories, list_categories_async, account_id=account_id, include_global=include_global
+    )
     return {"categories": [cat.model_dump() for cat in categories]}
 
 
 @router.get("/{category_id}")
-def get_category_details(category_id: int):
+async def get_category_details(category_id: int):
     """Get category details by ID."""
-    category = get_category(category_id)
+    category = await run_db(get_category, get_category_async, category_id)
     if not category:
         raise HTTPException(status_code=404, detail="Category not found")
     return {"category": category.model_dump()}
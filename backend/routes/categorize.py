@@ -1,10 +1,15 @@
 
-from typing import Optional
+from typing import List, Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel, Field
 
-from services.ai_service import analyze_email
+from services.ai_service import (
+    CLASSIFIER_ENGINES,
+    analyze_changed_emails,
+    get_classifier_engine,
+    set_classifier_engine,
+)
 from services.email_store import upsert_emails
 
 
@@ -15,6 +20,14 @@ class EmailPayload(BaseModel):
     from_email: Optional[str] = None
 
 
+class BatchPayload(BaseModel):
+    emails: List[EmailPayload] = Field(..., min_length=1, max_length=500)
+
+
+class EngineUpdate(BaseModel):
+    engine: str = Field(..., description="zero_shot, naive_bayes or centroid; trainable engines retrain on every switch")
+
+
 router = APIRouter()
 
 
@@ -23,19 +36,47 @@ def categorize(payload: EmailPayload):
     # Extract account_id if available from the email payload
     account_id = payload.dict().get("account_id") if hasattr(payload, "account_id") else None
     
-    analysis = analyze_email(payload.subject, payload.body, account_id=account_id, auto_create_category=True)
-    record = upsert_emails(
-        [
-            {
-                "gmail_id": payload.gmail_id,
-                "subject": payload.subject,
-                "snippet": payload.body[:2000],
-                "body_text": payload.body,
-                "from_email": payload.from_email,
-                "category": analysis["category"],
-                "sentiment": analysis["sentiment"],
-                "urgency": analysis["urgency"],
-            }
-        ]
-    )[0]
-    return {"category": analysis["category"], "email": record.model_dump()}
+    emails = [_record_fields(payload)]
+    analyze_changed_emails(emails, account_id=account_id, auto_create_category=True)
+    record = upsert_emails(emails)[0]
+    return {"category": record.category, "email": record.model_dump()}
+
+
+@router.post("/batch")
+def categorize_batch(payload: BatchPayload):
+    """Analyze many emails in one call; model work runs in padded batches.
+
+    Emails already stored with the same content and analysis version are not re-analyzed.
+    """
+    emails = [_record_fields(email) for email in payload.emails]
+    analyze_changed_emails(emails, auto_create_category=True)
+    records = upsert_emails(emails)
+    return {"emails": [rec.model_dump() for rec in records]}
+
+
+def _record_fields(payload: EmailPayload) -> dict:
+    fields = {
+        "gmail_id": payload.gmail_id,
+        "subject": payload.subject,
+        "snippet": payload.body[:2000],
+        "body_text": payload.body,
+    }
+    if payload.from_email is not None:
+        fields["from_email"] = payload.from_email
+    return fields
+
+
+@router.get("/engine")
+def get_engine():
+    """Show the active category classifier engine."""
+    engine = get_classifier_engine()
+    return {"engine": engine.name, "version": engine.version, "available": list(CLASSIFIER_ENGINES)}
+
+
+@router.post("/engine")
+def switch_engine(payload: EngineUpdate):
+    """Hot-swap (or retrain) the category classifier engine."""
+    if payload.engine not in CLASSIFIER_ENGINES:
+        raise HTTPException(status_code=400, detail=f"engine must be one of {', '.join(CLASSIFIER_ENGINES)}")
+    engine = set_classifier_engine(payload.engine)
+    return {"engine": engine.name, "version": engine.version}
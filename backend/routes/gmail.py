@@ -1,28 +1,29 @@
 
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Literal, Optional
 
-from fastapi import APIRouter, HTTPException, Query
+from fastapi import APIRouter, HTTPException, Query, Response
 from prometheus_client import Counter
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
+from db import run_db
+from services.ai_service import AI_CATEGORIZE_ON_FETCH, analyze_changed_emails
 from services.email_store import (
-    bulk_archive_emails,
-    bulk_delete_emails,
-    bulk_mark_read,
-    bulk_star_emails,
+    bulk_update,
     delete_by_gmail_ids,
+    get_email_by_gmail_id,
     list_emails,
+    list_emails_async,
+    resolve_fields,
     search_emails,
+    search_emails_async,
     upsert_emails,
 )
-from services.gmail_service import (
-    authenticate_gmail,
-    delete_emails,
-    fetch_emails,
-    load_sample_emails,
-    move_emails_to_label,
-)
+from services.gmail_clients import get_gmail_service
+from services.gmail_service import fetch_emails, load_sample_emails
+from services.job_service import submit as submit_job
+from services.pagination import next_cursor
+from services.sync_service import apply_label_effects, fill_bodies, hydrate_emails
 
 
 router = APIRouter()
@@ -53,53 +54,115 @@ class BulkOperationRequest(BaseModel):
     email_ids: List[int]
 
 
+class BulkUpdateRequest(BaseModel):
+    email_ids: List[int]
+    status: Optional[Literal["keep", "delete_review", "deleted", "archived"]] = None
+    is_read: Optional[bool] = None
+    is_starred: Optional[bool] = None
+
+
+class HydrateRequest(BaseModel):
+    gmail_ids: List[str] = Field(..., min_length=1, max_length=500)
+
+
+FIELDS_QUERY = Query(
+    None,
+    description="Comma-separated columns to return, or 'all'; defaults to a summary without body_text",
+)
+
+
 @router.get("/fetch")
 def fetch_gmail_emails(use_sample: bool = Query(False, description="Use bundled sample data instead of Gmail")):
-    emails = load_sample_emails() if use_sample else fetch_emails(authenticate_gmail())
+    service = None if use_sample else get_gmail_service()
+    emails = load_sample_emails() if use_sample else fetch_emails(service)
+    if AI_CATEGORIZE_ON_FETCH:
+        analyze_changed_emails(emails, hydrate=service and (lambda bodiless: fill_bodies(service, bodiless)))
     records = upsert_emails(emails)
     EMAIL_FETCH_COUNTER.labels(source="sample" if use_sample else "live").inc(len(records))
     return {"emails": [rec.model_dump() for rec in records]}
 
 
+@router.get("/email/{gmail_id}")
+def get_saved_email(gmail_id: str):
+    """Open one email, downloading its body first if only metadata was synced."""
+    record = get_email_by_gmail_id(gmail_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Email not found")
+    if record.body_state == "metadata":
+        try:
+            record = next(iter(hydrate_emails([gmail_id])), record)
+        except Exception as exc:  # pragma: no cover - best-effort remote
+            raise HTTPException(status_code=502, detail=f"Failed to load body from Gmail: {exc}")
+    return {"email": record.model_dump()}
+
+
+@router.post("/hydrate")
+def hydrate_saved_emails(payload: HydrateRequest):
+    """Download bodies for metadata-only emails (e.g. before summarizing them)."""
+    try:
+        records = hydrate_emails(payload.gmail_ids)
+    except Exception as exc:  # pragma: no cover - best-effort remote
+        raise HTTPException(status_code=502, detail=f"Failed to load bodies from Gmail: {exc}")
+    return {"hydrated": len(records)}
+
+
 @router.get("/list")
-def list_saved_emails(
+async def list_saved_emails(
     status: Optional[str] = None,
     category: Optional[str] = None,
     limit: int = Query(100, ge=1, le=500),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page; overrides offset"),
+    fields: Optional[str] = FIELDS_QUERY,
 ):
-    records = list_emails(status=status, category=category, limit=limit, offset=offset)
-    return {"emails": [rec.model_dump() for rec in records]}
-
-
-@router.post("/delete")
-def delete_saved_emails(payload: DeleteRequest):
-    deleted_count = delete_by_gmail_ids(payload.gmail_ids)
-    if not payload.skip_remote:
-        try:
-            delete_emails(authenticate_gmail(), payload.gmail_ids)
-        except Exception as exc:  # pragma: no cover - best-effort remote
-            raise HTTPException(status_code=502, detail=f"Failed to delete in Gmail: {exc}")
-    EMAIL_DELETE_COUNTER.labels(remote=str(not payload.skip_remote)).inc(deleted_count)
-    return {"deleted": deleted_count}
-
-
-@router.post("/move")
-def move_emails(payload: MoveRequest):
+    """List stored emails newest first; bodies are left out unless ``fields`` asks for them."""
+    try:
+        records = await run_db(
+            list_emails, list_emails_async,
+            status=status, category=category, limit=limit, offset=offset, cursor=cursor,
+            fields=resolve_fields(fields),
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {
+        "emails": [row._asdict() for row in records],
+        "next_cursor": next_cursor(records, limit, "created_at"),
+    }
+
+
+@router.post("/delete", status_code=202)
+def delete_saved_emails(payload: DeleteRequest, response: Response):
+    """Trash emails in Gmail as a background job (poll ``/jobs/{job_id}``).
+
+    Rows are marked deleted as Gmail accepts them; ``skip_remote`` only
+    marks them locally and answers synchronously.
+    """
+    if payload.skip_remote:
+        deleted_count = delete_by_gmail_ids(payload.gmail_ids)
+        EMAIL_DELETE_COUNTER.labels(remote="False").inc(deleted_count)
+        response.status_code = 200
+        return {"deleted": deleted_count}
+    job = submit_job("gmail.delete", payload.gmail_ids)
+    return {"job_id": job.id, "status": job.status, "total": job.total}
+
+
+@router.post("/move", status_code=202)
+def move_emails(payload: MoveRequest, response: Response):
+    """Add a Gmail label to emails as a background job (poll ``/jobs/{job_id}``)."""
     if not payload.label_id:
         raise HTTPException(status_code=400, detail="label_id is required")
-    if not payload.skip_remote:
-        try:
-            move_emails_to_label(authenticate_gmail(), payload.gmail_ids, payload.label_id)
-        except Exception as exc:  # pragma: no cover
-            raise HTTPException(status_code=502, detail=f"Failed to move in Gmail: {exc}")
-    EMAIL_MOVE_COUNTER.labels(remote=str(not payload.skip_remote)).inc(len(payload.gmail_ids))
-    return {"moved": len(payload.gmail_ids)}
+    if payload.skip_remote:
+        apply_label_effects(payload.gmail_ids, payload.label_id)
+        EMAIL_MOVE_COUNTER.labels(remote="False").inc(len(payload.gmail_ids))
+        response.status_code = 200
+        return {"moved": len(payload.gmail_ids)}
+    job = submit_job("gmail.move", payload.gmail_ids, label_id=payload.label_id)
+    return {"job_id": job.id, "status": job.status, "total": job.total}
 
 
 @router.get("/search")
-def search_saved_emails(
-    query: Optional[str] = Query(None, description="Search text in subject, body, or snippet"),
+async def search_saved_emails(
+    query: Optional[str] = Query(None, description="Full-text search over subject, body and snippet (ranked)"),
     from_email: Optional[str] = Query(None, description="Filter by sender email"),
     subject: Optional[str] = Query(None, description="Filter by subject"),
     category: Optional[str] = Query(None, description="Filter by category"),
@@ -110,61 +173,76 @@ def search_saved_emails(
     date_to: Optional[datetime] = Query(None, description="Filter emails until this date (ISO format)"),
     limit: int = Query(100, ge=1, le=500),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page (filter-only searches)"),
+    fields: Optional[str] = FIELDS_QUERY,
 ):
     """Search and filter emails with multiple criteria."""
-    records = search_emails(
-        query=query,
-        from_email=from_email,
-        subject=subject,
-        category=category,
-        status=status,
-        is_read=is_read,
-        is_starred=is_starred,
-        date_from=date_from,
-        date_to=date_to,
-        limit=limit,
-        offset=offset,
-    )
-    return {"emails": [rec.model_dump() for rec in records], "count": len(records)}
+    try:
+        records = await run_db(
+            search_emails, search_emails_async,
+            query=query,
+            from_email=from_email,
+            subject=subject,
+            category=category,
+            status=status,
+            is_read=is_read,
+            is_starred=is_starred,
+            date_from=date_from,
+            date_to=date_to,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            fields=resolve_fields(fields),
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {
+        "emails": [row._asdict() for row in records],
+        "count": len(records),
+        "next_cursor": None if query else next_cursor(records, limit, "created_at"),
+    }
+
+
+@router.post("/bulk/update")
+def bulk_update_emails(payload: BulkUpdateRequest):
+    """Set status and/or read/starred flags on many emails with set-based UPDATEs."""
+    values = payload.model_dump(exclude={"email_ids"}, exclude_none=True)
+    if not values:
+        raise HTTPException(status_code=400, detail="Nothing to update: set status, is_read or is_starred")
+    return {"updated": bulk_update(payload.email_ids, **values)}
 
 
 @router.post("/bulk/archive")
 def bulk_archive(payload: BulkOperationRequest):
     """Archive multiple emails at once."""
-    count = bulk_archive_emails(payload.email_ids)
-    return {"archived": count}
+    return {"archived": bulk_update(payload.email_ids, status="archived")}
 
 
 @router.post("/bulk/delete")
 def bulk_delete(payload: BulkOperationRequest):
     """Delete multiple emails at once."""
-    count = bulk_delete_emails(payload.email_ids)
-    return {"deleted": count}
+    return {"deleted": bulk_update(payload.email_ids, status="deleted")}
 
 
 @router.post("/bulk/mark-read")
 def bulk_mark_as_read(payload: BulkOperationRequest):
     """Mark multiple emails as read."""
-    count = bulk_mark_read(payload.email_ids, is_read=True)
-    return {"marked_read": count}
+    return {"marked_read": bulk_update(payload.email_ids, is_read=True)}
 
 
 @router.post("/bulk/mark-unread")
 def bulk_mark_as_unread(payload: BulkOperationRequest):
     """Mark multiple emails as unread."""
-    count = bulk_mark_read(payload.email_ids, is_read=False)
-    return {"marked_unread": count}
+    return {"marked_unread": bulk_update(payload.email_ids, is_read=False)}
 
 
 @router.post("/bulk/star")
 def bulk_star(payload: BulkOperationRequest):
     """Star multiple emails."""
-    count = bulk_star_emails(payload.email_ids, is_starred=True)
-    return {"starred": count}
+    return {"starred": bulk_update(payload.email_ids, is_starred=True)}
 
 
 @router.post("/bulk/unstar")
 def bulk_unstar(payload: BulkOperationRequest):
     """Unstar multiple emails."""
-    count = bulk_star_emails(payload.email_ids, is_starred=False)
-    return {"unstarred": count}
+    return {"unstarred": bulk_update(payload.email_ids, is_starred=False)}
@@ -0,0 +1,36 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query
+
+from services.job_service import get_job, list_jobs
+
+
+router = APIRouter()
+
+
+def _job_view(job) -> dict:
+    """Job status without the (possibly very long) item list."""
+    data = job.model_dump()
+    params = dict(data.pop("params") or {})
+    params.pop("items", None)
+    data["params"] = params
+    data["progress"] = round(job.processed / job.total, 4) if job.total else 1.0
+    return data
+
+
+@router.get("/")
+def list_recent_jobs(
+    status: Optional[str] = Query(None, description="queued | running | succeeded | failed"),
+    limit: int = Query(50, ge=1, le=500),
+):
+    """Most recent background jobs first."""
+    return {"jobs": [_job_view(job) for job in list_jobs(status=status, limit=limit)]}
+
+
+@router.get("/{job_id}")
+def get_job_status(job_id: int):
+    """Status and progress of a background job."""
+    job = get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return {"job": _job_view(job)}
@@ -2,43 +2,67 @@ from typing import Optional
 
 from fastapi import APIRouter, HTTPException, Query
 
+from db import run_db
+from services.email_store import resolve_fields
 from services.threading_service import (
     archive_thread,
     get_thread_emails,
+    get_thread_emails_async,
     list_threads,
+    list_threads_async,
     unarchive_thread,
 )
+from services.pagination import next_cursor
 
 
 router = APIRouter()
 
 
 @router.get("/")
-def list_email_threads(
+async def list_email_threads(
     account_id: Optional[int] = None,
     unread_only: bool = False,
     archived_only: bool = False,
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque next_cursor from a previous page; overrides offset"),
 ):
     """List email threads with filters."""
-    threads = list_threads(
-        account_id=account_id,
-        unread_only=unread_only,
-        archived_only=archived_only,
-        limit=limit,
-        offset=offset,
-    )
-    return {"threads": [thread.model_dump() for thread in threads], "count": len(threads)}
+    try:
+        threads = await run_db(
+            list_threads, list_threads_async,
+            account_id=account_id,
+            unread_only=unread_only,
+            archived_only=archived_only,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return {
+        "threads": [thread.model_dump() for thread in threads],
+        "count": len(threads),
+        "next_cursor": next_cursor(threads, limit, "last_message_at"),
+    }
 
 
 @router.get("/{thread_id}/emails")
-def get_thread_messages(thread_id: str, limit: int = Query(100, ge=1, le=500)):
+async def get_thread_messages(
+    thread_id: str,
+    limit: int = Query(100, ge=1, le=500),
+    fields: Optional[str] = Query(None, description="Comma-separated columns, or 'all'; defaults to a summary"),
+):
     """Get all emails in a thread."""
-    emails = get_thread_emails(thread_id, limit=limit)
+    try:
+        emails = await run_db(
+            get_thread_emails, get_thread_emails_async, thread_id, limit=limit, fields=resolve_fields(fields)
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
     if not emails:
         raise HTTPException(status_code=404, detail="Thread not found or empty")
-    return {"emails": [email.model_dump() for email in emails], "count": len(emails)}
+    return {"emails": [row._asdict() for row in emails], "count": len(emails)}
 
 
 @router.post("/{thread_id}/archive")
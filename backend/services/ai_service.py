@@ -1,13 +1,49 @@
+import hashlib
 import logging
-from functools import lru_cache
-from typing import Optional
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, List, NamedTuple, Optional, Sequence, Tuple
+
+from prometheus_client import Histogram
 from transformers import pipeline
 
+from services import analysis_cache
+from services.classifier_engines import TRAINABLE_ENGINES, ZeroShotEngine
+
 log = logging.getLogger(__name__)
 
-# Initialize pipelines lazily to save startup time/memory if not used
-_classifier = None
-_sentiment_analyzer = None
+# Micro-batching: concurrent requests are coalesced for up to AI_BATCH_WAIT_MS
+# or until AI_BATCH_SIZE texts are queued, then run as one padded forward pass.
+AI_BATCH_SIZE = int(os.getenv("AI_BATCH_SIZE", "16"))
+AI_BATCH_WAIT_MS = float(os.getenv("AI_BATCH_WAIT_MS", "5"))
+# Each worker holds its own copy of the pipelines (tokenizers are not thread-safe),
+# and torch's intra-op threads are split between workers so the pool fills the cores.
+AI_INFERENCE_WORKERS = max(1, int(os.getenv("AI_INFERENCE_WORKERS", "1")))
+
+INFERENCE_BATCH_SIZE = Histogram(
+    "ai_inference_batch_size", "Texts per model forward batch",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+INFERENCE_LATENCY = Histogram("ai_inference_batch_seconds", "Model time per inference batch")
+
+# Category engine: zero_shot (BART-MNLI), naive_bayes or centroid (trained from
+# labeled EmailRecord rows). Swap at runtime with set_classifier_engine().
+AI_CLASSIFIER_ENGINE = os.getenv("AI_CLASSIFIER_ENGINE", "zero_shot")
+# Analyze new/changed messages during /gmail/fetch and scheduled fetches.
+AI_CATEGORIZE_ON_FETCH = os.getenv("AI_CATEGORIZE_ON_FETCH", "false").lower() in {"1", "true", "yes"}
+
+# Pipelines are loaded lazily per inference worker to save startup time/memory if not used
+_local = threading.local()
+
+CATEGORIES = [
+    "Billing", "Account Info", "Work Update", "Promotion", "Spam", "Personal",
+    "Travel", "Shopping", "Newsletter", "Social", "Support", "Legal",
+    "Education", "Healthcare", "Finance"
+]
 
 FALLBACK_KEYWORDS = {
     "Billing": ["invoice", "payment", "receipt", "bill", "subscription", "charge"],
@@ -24,74 +60,269 @@ FALLBACK_KEYWORDS = {
 
 URGENCY_KEYWORDS = ["asap", "urgent", "deadline", "immediately", "critical", "overdue", "action required"]
 
+# Default model of transformers' "sentiment-analysis" pipeline; part of the cache version.
+SENTIMENT_MODEL = "distilbert-base-uncased-finetuned-sst-2-english"
+
+
+class Analysis(NamedTuple):
+    category: str
+    sentiment: str
+    urgency: str
+    # False when a model failed to load and a fallback was used; such results are not cached.
+    complete: bool = True
+
+
 def get_classifier():
-    global _classifier
-    if _classifier is None:
+    if getattr(_local, "classifier", None) is None:
         try:
-            _classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
+            _local.classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli")
         except Exception as e:
             log.error(f"Failed to load classifier model: {e}")
             return None
-    return _classifier
+    return _local.classifier
 
 def get_sentiment_analyzer():
-    global _sentiment_analyzer
-    if _sentiment_analyzer is None:
+    if getattr(_local, "sentiment_analyzer", None) is None:
         try:
-            _sentiment_analyzer = pipeline("sentiment-analysis")
+            _local.sentiment_analyzer = pipeline("sentiment-analysis")
         except Exception as e:
             log.error(f"Failed to load sentiment model: {e}")
             return None
-    return _sentiment_analyzer
+    return _local.sentiment_analyzer
+
+
+CLASSIFIER_ENGINES = ("zero_shot",) + tuple(TRAINABLE_ENGINES)
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def build_classifier_engine(name: str):
+    """Create an engine; trainable engines are fit on the labeled emails in the store."""
+    if name == ZeroShotEngine.name:
+        return ZeroShotEngine(get_classifier, CATEGORIES, batch_size=AI_BATCH_SIZE)
+    if name not in TRAINABLE_ENGINES:
+        raise ValueError(f"Unknown classifier engine: {name}")
+    from services.email_store import labeled_examples
+    texts, labels = labeled_examples()
+    return TRAINABLE_ENGINES[name]().train([text[:1024] for text in texts], labels)
+
+
+def get_classifier_engine():
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = build_classifier_engine(AI_CLASSIFIER_ENGINE)
+    return _engine
+
+
+def set_classifier_engine(name: str):
+    """Build (and train) a new engine off the hot path, then swap it in atomically."""
+    global _engine
+    engine = build_classifier_engine(name)
+    with _engine_lock:
+        _engine = engine
+    analysis_cache.clear()  # old entries are unreachable under the new version anyway
+    log.info("Classifier engine switched to %s (%s)", engine.name, engine.version)
+    return engine
+
+
+class InferenceBatcher:
+    """Queue that coalesces single-text requests into micro-batches.
+
+    ``workers`` daemon threads pull from one queue; each takes the first
+    waiting text, gathers more for up to ``wait_ms`` or ``batch_size`` texts,
+    and resolves every caller's future from one ``infer`` call.
+    """
+
+    def __init__(
+        self,
+        infer: Callable[[List[str]], List[Tuple]],
+        batch_size: int = AI_BATCH_SIZE,
+        wait_ms: float = AI_BATCH_WAIT_MS,
+        workers: int = AI_INFERENCE_WORKERS,
+    ):
+        self._infer = infer
+        self._batch_size = max(1, batch_size)
+        self._wait = wait_ms / 1000
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._workers = workers
+        for idx in range(workers):
+            threading.Thread(target=self._run, name=f"ai-inference-{idx}", daemon=True).start()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future
+
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def _run(self) -> None:
+        _configure_torch_threads(self._workers)
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self._wait
+            while len(batch) < self._batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            INFERENCE_BATCH_SIZE.observe(len(batch))
+            try:
+                with INFERENCE_LATENCY.time():
+                    results = self._infer([text for text, _ in batch])
+            except Exception as exc:  # noqa: BLE001 - surface to every waiting caller
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+
+def _configure_torch_threads(workers: int) -> None:
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+
+_batcher: Optional[InferenceBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> InferenceBatcher:
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = InferenceBatcher(_analyze_batch)
+    return _batcher
+
 
 def analyze_email(subject: str, body: str, account_id: Optional[int] = None, auto_create_category: bool = True) -> dict:
     """Comprehensive AI analysis of an email with light caching and dynamic category creation."""
-    category, sentiment, urgency = _analyze_cached(subject, body)
-    
+    return analyze_emails([(subject, body)], account_id=account_id, auto_create_category=auto_create_category)[0]
+
+
+def analyze_emails(
+    emails: Sequence[Tuple[str, str]],
+    account_id: Optional[int] = None,
+    auto_create_category: bool = True,
+) -> List[dict]:
+    """Analyze many ``(subject, body)`` pairs, batching uncached texts through the inference workers."""
+    version = analysis_version()
+    hashes = [analysis_cache.content_hash(subject, body) for subject, body in emails]
+    cached = analysis_cache.lookup(version, hashes)
+    analyses: List[Optional[Tuple[str, str, str]]] = [cached.get(key) for key in hashes]
+
+    pending = {}
+    for idx, key in enumerate(hashes):
+        if analyses[idx] is None and key not in pending:
+            pending[key] = get_batcher().submit(_analysis_text(*emails[idx]))
+    computed = {key: future.result() for key, future in pending.items()}
+    analysis_cache.store(version, {key: tuple(a[:3]) for key, a in computed.items() if a.complete})
+    analyses = [a if a is not None else computed[key] for a, key in zip(analyses, hashes)]
+
+    results = [{"category": a[0], "sentiment": a[1], "urgency": a[2]} for a in analyses]
+
     # Auto-create category if enabled and using dynamic categorization
     if auto_create_category:
         from services.category_service import auto_create_category_if_needed, increment_category_count
-        category = auto_create_category_if_needed(category, account_id)
-        increment_category_count(category, account_id)
-    
-    return {"category": category, "sentiment": sentiment, "urgency": urgency}
+        counts: "OrderedDict[str, int]" = OrderedDict()
+        for result in results:
+            counts[result["category"]] = counts.get(result["category"], 0) + 1
+        resolved = {}
+        for category, count in counts.items():
+            resolved[category] = auto_create_category_if_needed(category, account_id)
+            increment_category_count(resolved[category], account_id, amount=count)
+        for result in results:
+            result["category"] = resolved[result["category"]]
 
+    return results
 
-@lru_cache(maxsize=256)
-def _analyze_cached(subject: str, body: str) -> tuple[str, str, str]:
-    text = f"{subject} {body}".strip()
-    truncated_text = text[:1024]  # Models have token limits
 
-    category = _categorize_rule_based(text)
+def analyze_changed_emails(
+    emails: List[dict],
+    account_id: Optional[int] = None,
+    auto_create_category: bool = True,
+    hydrate: Optional[Callable[[List[dict]], None]] = None,
+) -> int:
+    """Analyze only emails that are new, whose content changed, or that an older model analyzed.
+
+    Results are written into the email dicts (with ``analysis_version``) for
+    ``upsert_emails``; unchanged emails are left alone so their stored
+    analysis is kept and their rows are not rewritten. Metadata-only emails
+    that need analysis are passed to ``hydrate`` first, which fills in their
+    ``body_text``. Returns how many emails were analyzed.
+    """
+    from services.email_store import analysis_state
+    version = analysis_version()
+    stored = analysis_state(email.get("gmail_id") for email in emails)
+    todo = [email for email in emails if _needs_analysis(email, stored.get(email.get("gmail_id")), version)]
+    if not todo:
+        return 0
+    bodiless = [email for email in todo if email.get("body_state") == "metadata"]
+    if bodiless and hydrate:
+        hydrate(bodiless)
+    analyses = analyze_emails(
+        [(email.get("subject", "No Subject"), email.get("body_text", "")) for email in todo],
+        account_id=account_id,
+        auto_create_category=auto_create_category,
+    )
+    for email, analysis in zip(todo, analyses):
+        email.update(analysis, analysis_version=version)
+    return len(todo)
+
+
+def _needs_analysis(email: dict, state: Optional[Tuple[Optional[str], Optional[str]]], version: str) -> bool:
+    from services.email_store import content_fingerprint
+    if state is None:
+        return True
+    if email.get("body_state") == "metadata":
+        # Gmail message content is immutable; without the body only a model change counts.
+        return state[1] != version
+    return state != (content_fingerprint(email), version)
 
-    classifier = get_classifier()
-    if classifier:
-        try:
-            # Use expanded category list for better classification
-            categories = [
-                "Billing", "Account Info", "Work Update", "Promotion", "Spam", "Personal",
-                "Travel", "Shopping", "Newsletter", "Social", "Support", "Legal", 
-                "Education", "Healthcare", "Finance"
-            ]
-            result = classifier(truncated_text, candidate_labels=categories)
-            category = result['labels'][0]
-        except Exception:
-            pass  # Fallback to rule-based
 
-    sentiment = "Neutral"
+def analysis_version() -> str:
+    """Cache version: active engine, label set and sentiment model."""
+    labels = hashlib.sha1("|".join(CATEGORIES).encode()).hexdigest()[:8]
+    return f"{get_classifier_engine().version}:labels-{labels}:{SENTIMENT_MODEL}"
+
+
+def _analysis_text(subject: str, body: str) -> str:
+    return f"{subject} {body}".strip()
+
+
+def _analyze_batch(texts: List[str]) -> List[Analysis]:
+    """Classify a batch with the active engine and run sentiment over it in padded batches."""
+    truncated = [text[:1024] for text in texts]  # Models have token limits
+    engine = get_classifier_engine()
+    labels = engine.classify(truncated)
+    categories = [label or _categorize_rule_based(text) for label, text in zip(labels, texts)]
+    # Trained engines abstain deliberately; a zero-shot abstention means the model is unavailable.
+    complete = engine.name != ZeroShotEngine.name or all(labels)
+
+    sentiments = ["Neutral"] * len(texts)
     analyzer = get_sentiment_analyzer()
+    sentiment_ok = False
     if analyzer:
         try:
-            res = analyzer(truncated_text)[0]
-            sentiment = res['label']
+            results = analyzer(truncated, batch_size=AI_BATCH_SIZE, truncation=True)
+            sentiments = [result['label'] for result in results]
+            sentiment_ok = True
         except Exception:
             pass
 
-    urgency = "Normal"
-    if any(k in text.lower() for k in URGENCY_KEYWORDS):
-        urgency = "High"
-
-    return category, sentiment, urgency
+    urgencies = ["High" if any(k in text.lower() for k in URGENCY_KEYWORDS) else "Normal" for text in texts]
+    return [
+        Analysis(category, sentiment, urgency, complete and sentiment_ok)
+        for category, sentiment, urgency in zip(categories, sentiments, urgencies)
+    ]
 
 def _categorize_rule_based(text: str) -> str:
     lowered = text.lower()
@@ -0,0 +1,144 @@
+"""Two-tier cache of email analyses keyed by content hash.
+
+Tier 1 is a bounded in-process LRU; tier 2 is the ``analysiscacheentry``
+table, so results survive restarts and are shared between uvicorn workers
+and replicas. Keys are ``sha256(subject, body)`` rather than the raw strings,
+and every entry is stored under an analysis version (classifier engine,
+label set, sentiment model) so changing any of them invalidates old entries
+without a flush.
+"""
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Tuple
+
+from prometheus_client import Counter
+from sqlalchemy.exc import SQLAlchemyError
+from sqlmodel import col, select
+
+from db import engine, get_session
+from models.analysis_cache import AnalysisCacheEntry
+
+log = logging.getLogger(__name__)
+
+ANALYSIS_CACHE_SIZE = int(os.getenv("ANALYSIS_CACHE_SIZE", "4096"))
+# Set to false to keep the cache in memory only (e.g. for throwaway runs).
+ANALYSIS_CACHE_PERSIST = os.getenv("ANALYSIS_CACHE_PERSIST", "true").lower() in {"1", "true", "yes"}
+# Keeps IN (...) lists well under SQLite's bound-parameter limit.
+_LOOKUP_CHUNK = 500
+
+CACHE_HITS = Counter("ai_analysis_cache_hits_total", "Analysis cache hits", ["tier"])
+CACHE_MISSES = Counter("ai_analysis_cache_misses_total", "Analyses not found in any cache tier")
+CACHE_EVICTIONS = Counter("ai_analysis_cache_evictions_total", "Entries evicted from the in-process LRU")
+
+Analysis = Tuple[str, str, str]
+
+_lru: "OrderedDict[Tuple[str, str], Analysis]" = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def content_hash(subject: str, body: str) -> str:
+    digest = hashlib.sha256()
+    digest.update((subject or "").encode("utf-8", "surrogatepass"))
+    digest.update(b"\x00")
+    digest.update((body or "").encode("utf-8", "surrogatepass"))
+    return digest.hexdigest()
+
+
+def lookup(version: str, hashes: Iterable[str]) -> Dict[str, Analysis]:
+    """Return cached analyses for ``hashes``; memory first, then one query per chunk."""
+    found: Dict[str, Analysis] = {}
+    missing = []
+    with _lru_lock:
+        for key in dict.fromkeys(hashes):
+            result = _lru.get((version, key))
+            if result is None:
+                missing.append(key)
+                continue
+            _lru.move_to_end((version, key))
+            found[key] = result
+    CACHE_HITS.labels(tier="memory").inc(len(found))
+
+    if missing and ANALYSIS_CACHE_PERSIST:
+        stored = _load(version, missing)
+        CACHE_HITS.labels(tier="db").inc(len(stored))
+        _remember(version, stored)
+        found.update(stored)
+    CACHE_MISSES.inc(sum(1 for key in missing if key not in found))
+    return found
+
+
+def store(version: str, analyses: Dict[str, Analysis]) -> None:
+    if not analyses:
+        return
+    _remember(version, analyses)
+    if ANALYSIS_CACHE_PERSIST:
+        _save(version, analyses)
+
+
+def clear() -> None:
+    """Drop the in-process tier; persisted entries are kept (they are versioned)."""
+    with _lru_lock:
+        _lru.clear()
+
+
+def _remember(version: str, analyses: Dict[str, Analysis]) -> None:
+    evicted = 0
+    with _lru_lock:
+        for key, result in analyses.items():
+            _lru[(version, key)] = tuple(result)
+            _lru.move_to_end((version, key))
+        while len(_lru) > ANALYSIS_CACHE_SIZE:
+            _lru.popitem(last=False)
+            evicted += 1
+    if evicted:
+        CACHE_EVICTIONS.inc(evicted)
+
+
+def _load(version: str, hashes: list) -> Dict[str, Analysis]:
+    stored: Dict[str, Analysis] = {}
+    try:
+        with get_session() as session:
+            for start in range(0, len(hashes), _LOOKUP_CHUNK):
+                chunk = hashes[start:start + _LOOKUP_CHUNK]
+                rows = session.exec(
+                    select(AnalysisCacheEntry).where(
+                        AnalysisCacheEntry.version == version,
+                        col(AnalysisCacheEntry.content_hash).in_(chunk),
+                    )
+                ).all()
+                for row in rows:
+                    stored[row.content_hash] = (row.category, row.sentiment, row.urgency)
+    except SQLAlchemyError as exc:
+        # The cache is an optimisation; a missing table or locked DB only costs a recompute.
+        log.warning("analysis cache lookup failed: %s", exc)
+    return stored
+
+
+def _save(version: str, analyses: Dict[str, Analysis]) -> None:
+    rows = [
+        {"content_hash": key, "version": version, "category": c, "sentiment": s, "urgency": u}
+        for key, (c, s, u) in analyses.items()
+    ]
+    table = AnalysisCacheEntry.__table__
+    try:
+        with engine.begin() as conn:
+            if engine.dialect.name == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+                conn.execute(insert(table).on_conflict_do_nothing(), rows)
+            elif engine.dialect.name == "sqlite":
+                from sqlalchemy.dialects.sqlite import insert
+                conn.execute(insert(table).on_conflict_do_nothing(), rows)
+            else:
+                existing = set(conn.execute(
+                    select(table.c.content_hash).where(
+                        table.c.version == version, table.c.content_hash.in_(list(analyses))
+                    )
+                ).scalars())
+                rows = [row for row in rows if row["content_hash"] not in existing]
+                if rows:
+                    conn.execute(table.insert(), rows)
+    except SQLAlchemyError as exc:
+        log.warning("analysis cache write failed: %s", exc)
@@ -4,7 +4,7 @@ from typing import List, Optional
 
 from sqlmodel import select
 
-from db import get_session
+from db import get_async_session, get_session
 from models.category import Category
 
 log = logging.getLogger(__name__)
@@ -74,6 +74,12 @@ def get_category(category_id: int) -> Optional[Category]:
         return session.get(Category, category_id)
 
 
+async def get_category_async(category_id: int) -> Optional[Category]:
+    """``get_category`` on the async engine."""
+    async with get_async_session() as session:
+        return await session.get(Category, category_id)
+
+
 def get_category_by_name(name: str, account_id: Optional[int] = None) -> Optional[Category]:
     """Get category by name."""
     with get_session() as session:
@@ -88,22 +94,31 @@ def get_category_by_name(name: str, account_id: Optional[int] = None) -> Optiona
 def list_categories(account_id: Optional[int] = None, include_global: bool = True) -> List[Category]:
     """List all categories."""
     with get_session() as session:
-        stmt = select(Category)
-        
-        if account_id and include_global:
-            # Include both account-specific and global categories
-            stmt = stmt.where(
-                (Category.account_id == account_id) | (Category.account_id.is_(None))
-            )
-        elif account_id:
-            # Only account-specific
-            stmt = stmt.where(Category.account_id == account_id)
-        else:
-            # Only global
-            stmt = stmt.where(Category.account_id.is_(None))
-        
-        stmt = stmt.order_by(Category.is_system.desc(), Category.email_count.desc())
-        return list(session.exec(stmt))
+        return list(session.exec(_categories_stmt(account_id, include_global)))
+
+
+async def list_categories_async(account_id: Optional[int] = None, include_global: bool = True) -> List[Category]:
+    """``list_categories`` on the async engine."""
+    async with get_async_session() as session:
+        return list(await session.exec(_categories_stmt(account_id, include_global)))
+
+
+def _categories_stmt(account_id: Optional[int], include_global: bool):
+    stmt = select(Category)
+
+    if account_id and include_global:
+        # Include both account-specific and global categories
+        stmt = stmt.where(
+            (Category.account_id == account_id) | (Category.account_id.is_(None))
+        )
+    elif account_id:
+        # Only account-specific
+        stmt = stmt.where(Category.account_id == account_id)
+    else:
+        # Only global
+        stmt = stmt.where(Category.account_id.is_(None))
+
+    return stmt.order_by(Category.is_system.desc(), Category.email_count.desc())
 
 
 def update_category(
@@ -145,7 +160,7 @@ def delete_category(category_id: int) -> bool:
         return True
 
 
-def increment_category_count(category_name: str, account_id: Optional[int] = None):
+def increment_category_count(category_name: str, account_id: Optional[int] = None, amount: int = 1):
     """Increment the email count for a category."""
     with get_session() as session:
         stmt = select(Category).where(Category.name == category_name)
@@ -156,7 +171,7 @@ def increment_category_count(category_name: str, account_id: Optional[int] = Non
         
         category = session.exec(stmt).first()
         if category:
-            category.email_count += 1
+            category.email_count += amount
             category.updated_at = datetime.utcnow()
             session.commit()
 
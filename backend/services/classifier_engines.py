@@ -0,0 +1,169 @@
+"""Category classifier engines used by ``ai_service``.
+
+Every engine exposes ``name``, ``version`` and ``classify(texts)``, which
+returns one label per text or ``None`` to abstain (the caller then falls back
+to keyword rules).
+
+- ``zero_shot``: BART-MNLI zero-shot; one NLI forward pass per candidate label.
+- ``naive_bayes``: hashed unigram/bigram counts with multinomial Naive Bayes,
+  a linear model in log space trained from already-labeled emails.
+- ``centroid``: hashed TF-IDF vectors, nearest category centroid by cosine.
+
+The trained engines are pure Python and cost microseconds per email on CPU.
+"""
+import hashlib
+import logging
+import math
+import re
+import zlib
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional, Sequence
+
+log = logging.getLogger(__name__)
+
+N_FEATURES = 2 ** 18
+# Below this many labeled examples (or with a single class) trained engines abstain.
+MIN_TRAINING_EXAMPLES = 20
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+
+def hashed_features(text: str) -> Counter:
+    """Unigram and bigram counts hashed into ``N_FEATURES`` buckets (stable across processes)."""
+    tokens = _TOKEN_RE.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return Counter(zlib.crc32(gram.encode()) % N_FEATURES for gram in grams)
+
+
+def _training_version(name: str, texts: Sequence[str], labels: Sequence[str]) -> str:
+    digest = hashlib.sha1()
+    for text, label in zip(texts, labels):
+        digest.update(label.encode())
+        digest.update(text.encode("utf-8", "ignore"))
+    return f"{name}-{len(texts)}-{digest.hexdigest()[:12]}"
+
+
+class ZeroShotEngine:
+    name = "zero_shot"
+
+    def __init__(self, get_pipeline: Callable, labels: Sequence[str], batch_size: int = 16):
+        self._get_pipeline = get_pipeline
+        self._labels = list(labels)
+        self._batch_size = batch_size
+        self.version = f"zero_shot-bart-large-mnli-{len(self._labels)}"
+
+    def classify(self, texts: List[str]) -> List[Optional[str]]:
+        classifier = self._get_pipeline()
+        if not classifier:
+            return [None] * len(texts)
+        try:
+            results = classifier(texts, candidate_labels=self._labels, batch_size=self._batch_size)
+        except Exception:
+            return [None] * len(texts)
+        if isinstance(results, dict):
+            results = [results]
+        return [result["labels"][0] for result in results]
+
+
+class NaiveBayesEngine:
+    name = "naive_bayes"
+
+    def __init__(self, alpha: float = 0.5):
+        self.alpha = alpha
+        self.version = f"{self.name}-untrained"
+        self._log_prior: Dict[str, float] = {}
+        self._log_likelihood: Dict[str, Dict[int, float]] = {}
+        self._log_unseen: Dict[str, float] = {}
+
+    def train(self, texts: Sequence[str], labels: Sequence[str]) -> "NaiveBayesEngine":
+        if len(texts) < MIN_TRAINING_EXAMPLES or len(set(labels)) < 2:
+            log.warning("naive_bayes: %d labeled examples is too few to train; abstaining", len(texts))
+            return self
+        class_counts: Counter = Counter(labels)
+        feature_counts: Dict[str, Counter] = defaultdict(Counter)
+        for text, label in zip(texts, labels):
+            feature_counts[label].update(hashed_features(text))
+        vocabulary = len(set().union(*feature_counts.values())) or 1
+        total = sum(class_counts.values())
+        for label, count in class_counts.items():
+            self._log_prior[label] = math.log(count / total)
+            denominator = sum(feature_counts[label].values()) + self.alpha * vocabulary
+            self._log_likelihood[label] = {
+                feature: math.log((freq + self.alpha) / denominator)
+                for feature, freq in feature_counts[label].items()
+            }
+            self._log_unseen[label] = math.log(self.alpha / denominator)
+        self.version = _training_version(self.name, texts, labels)
+        return self
+
+    def classify(self, texts: List[str]) -> List[Optional[str]]:
+        if not self._log_prior:
+            return [None] * len(texts)
+        predictions: List[Optional[str]] = []
+        for text in texts:
+            features = hashed_features(text)
+            best_label, best_score = None, -math.inf
+            for label, prior in self._log_prior.items():
+                likelihood = self._log_likelihood[label]
+                unseen = self._log_unseen[label]
+                score = prior + sum(count * likelihood.get(f, unseen) for f, count in features.items())
+                if score > best_score:
+                    best_label, best_score = label, score
+            predictions.append(best_label)
+        return predictions
+
+
+class CentroidEngine:
+    name = "centroid"
+
+    def __init__(self):
+        self.version = f"{self.name}-untrained"
+        self._idf: Dict[int, float] = {}
+        self._default_idf = 0.0
+        self._centroids: Dict[str, Dict[int, float]] = {}
+
+    def _vector(self, text: str) -> Dict[int, float]:
+        features = hashed_features(text)
+        vector = {f: (1 + math.log(c)) * self._idf.get(f, self._default_idf) for f, c in features.items()}
+        norm = math.sqrt(sum(v * v for v in vector.values())) or 1.0
+        return {f: v / norm for f, v in vector.items()}
+
+    def train(self, texts: Sequence[str], labels: Sequence[str]) -> "CentroidEngine":
+        if len(texts) < MIN_TRAINING_EXAMPLES or len(set(labels)) < 2:
+            log.warning("centroid: %d labeled examples is too few to train; abstaining", len(texts))
+            return self
+        document_frequency: Counter = Counter()
+        for text in texts:
+            document_frequency.update(hashed_features(text).keys())
+        total = len(texts)
+        self._idf = {f: math.log((1 + total) / (1 + df)) + 1 for f, df in document_frequency.items()}
+        self._default_idf = math.log(1 + total) + 1
+        sums: Dict[str, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+        for text, label in zip(texts, labels):
+            for f, v in self._vector(text).items():
+                sums[label][f] += v
+        for label, centroid in sums.items():
+            norm = math.sqrt(sum(v * v for v in centroid.values())) or 1.0
+            self._centroids[label] = {f: v / norm for f, v in centroid.items()}
+        self.version = _training_version(self.name, texts, labels)
+        return self
+
+    def classify(self, texts: List[str]) -> List[Optional[str]]:
+        if not self._centroids:
+            return [None] * len(texts)
+        predictions: List[Optional[str]] = []
+        for text in texts:
+            vector = self._vector(text)
+            scores = {
+                label: sum(v * centroid.get(f, 0.0) for f, v in vector.items())
+                for label, centroid in self._centroids.items()
+            }
+            label, score = max(scores.items(), key=lambda item: item[1])
+            predictions.append(label if score > 0 else None)
+        return predictions
+
+
+TRAINABLE_ENGINES = {
+    NaiveBayesEngine.name: NaiveBayesEngine,
+    CentroidEngine.name: CentroidEngine,
+}
@@ -1,74 +1,236 @@
 from datetime import datetime
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
 
-from sqlmodel import select, or_, col
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Row, update
+from sqlmodel import select, col
 
-from db import get_session
+from db import engine, get_async_session, get_session
 from models.email import EmailRecord
+from services.analysis_cache import content_hash
+from services.pagination import apply_cursor, order_newest_first
+from services.search_index import escape_like_pattern, get_search_backend, index_records
 
 
-def upsert_emails(emails: Iterable[dict]) -> List[EmailRecord]:
-    """Insert or update emails, persisting AI fields and interaction flags."""
+# Keep IN (...) lists well below SQLite's bound-parameter limit.
+UPSERT_CHUNK_SIZE = 500
+# Interaction fields bulk_update may set; content and AI fields go through upsert_emails.
+BULK_UPDATE_FIELDS = {"status", "is_read", "is_starred"}
+# What list views show by default: no body_text or attachment metadata, whose
+# size is unbounded. Full rows come from GET /gmail/email/{gmail_id}.
+SUMMARY_FIELDS = (
+    "id", "gmail_id", "account_id", "thread_id", "subject", "snippet", "body_state",
+    "from_email", "to_email", "has_attachments", "category", "sentiment", "urgency",
+    "status", "is_read", "is_starred", "created_at", "updated_at",
+)
+EMAIL_FIELDS = tuple(EmailRecord.__table__.columns.keys())
+# Keyset cursors are built from these, so every projection carries them.
+_REQUIRED_FIELDS = ("id", "created_at")
+
+
+def upsert_emails(emails: Iterable[dict], chunk_size: int = UPSERT_CHUNK_SIZE) -> List[EmailRecord]:
+    """Insert or update emails, persisting AI fields and interaction flags.
+
+    Existing rows are resolved with one ``gmail_id IN (...)`` lookup per chunk
+    and the returned records are kept loaded after commit, so a fetch costs a
+    handful of round trips instead of a SELECT and a refresh per message.
+
+    An existing row only takes the fields present in ``email`` and is only
+    written (and its ``updated_at`` bumped) when one of them actually differs,
+    so re-fetching an unchanged mailbox issues no UPDATEs. A content change
+    clears ``analysis_version`` unless the caller supplies a fresh one.
+    """
+    emails = list(emails)
     records: List[EmailRecord] = []
+    written: List[EmailRecord] = []
     with get_session() as session:
-        for email in emails:
-            gmail_id = email.get("gmail_id")
-            existing: Optional[EmailRecord] = None
-            if gmail_id:
-                stmt = select(EmailRecord).where(EmailRecord.gmail_id == gmail_id)
-                existing = session.exec(stmt).first()
-
-            defaults = {
-                "subject": email.get("subject", "No Subject"),
-                "snippet": email.get("snippet", ""),
-                "body_text": email.get("body_text", ""),
-                "from_email": email.get("from_email"),
-                "account_id": email.get("account_id"),
-                "category": email.get("category", "Unlabeled"),
-                "sentiment": email.get("sentiment", "Neutral"),
-                "urgency": email.get("urgency", "Normal"),
-                "status": email.get("status", "keep"),
-                "is_read": email.get("is_read", False),
-                "is_starred": email.get("is_starred", False),
-            }
-
-            if existing:
-                for field, value in defaults.items():
-                    setattr(existing, field, value if value is not None else getattr(existing, field))
-                existing.updated_at = datetime.utcnow()
-                records.append(existing)
-            else:
-                rec = EmailRecord(
-                    gmail_id=gmail_id,
-                    **defaults,
-                )
-                session.add(rec)
-                records.append(rec)
+        # Records stay usable after the session closes without a refresh.
+        session.expire_on_commit = False
+        for start in range(0, len(emails), chunk_size):
+            chunk = emails[start:start + chunk_size]
+            gmail_ids = {email.get("gmail_id") for email in chunk if email.get("gmail_id")}
+            existing_by_gmail_id: Dict[str, EmailRecord] = {}
+            if gmail_ids:
+                stmt = select(EmailRecord).where(col(EmailRecord.gmail_id).in_(gmail_ids))
+                for rec in session.exec(stmt):
+                    existing_by_gmail_id.setdefault(rec.gmail_id, rec)
+
+            for email in chunk:
+                gmail_id = email.get("gmail_id")
+                existing: Optional[EmailRecord] = existing_by_gmail_id.get(gmail_id) if gmail_id else None
+
+                if existing:
+                    if _apply_changes(existing, email):
+                        written.append(existing)
+                    records.append(existing)
+                else:
+                    rec = EmailRecord(
+                        gmail_id=gmail_id,
+                        **_record_fields(email),
+                    )
+                    rec.content_hash = content_hash(rec.subject, rec.body_text)
+                    session.add(rec)
+                    records.append(rec)
+                    written.append(rec)
+                    if gmail_id:
+                        # Later duplicates in the same batch update this row.
+                        existing_by_gmail_id[gmail_id] = rec
+            session.flush()
         session.commit()
-        for rec in records:
-            session.refresh(rec)
+    index_records(written)
     return records
 
 
+def _record_fields(email: dict) -> dict:
+    return {
+        "subject": email.get("subject", "No Subject"),
+        "snippet": email.get("snippet", ""),
+        "body_text": email.get("body_text", ""),
+        "from_email": email.get("from_email"),
+        "to_email": email.get("to_email"),
+        "has_attachments": email.get("has_attachments", False),
+        "attachments": email.get("attachments"),
+        "account_id": email.get("account_id"),
+        "category": email.get("category", "Unlabeled"),
+        "sentiment": email.get("sentiment", "Neutral"),
+        "urgency": email.get("urgency", "Normal"),
+        "status": email.get("status", "keep"),
+        "is_read": email.get("is_read", False),
+        "is_starred": email.get("is_starred", False),
+        "analysis_version": email.get("analysis_version"),
+        "body_state": email.get("body_state", "full"),
+    }
+
+
+def _apply_changes(record: EmailRecord, email: dict) -> bool:
+    """Copy the non-null fields given in ``email`` onto ``record``; True if anything changed."""
+    changes = {
+        field: value
+        for field, value in _record_fields(email).items()
+        if field in email and value is not None and getattr(record, field) != value
+    }
+    if changes.get("body_state") == "metadata":
+        changes.pop("body_state")  # a metadata re-sync never discards a downloaded body
+    fingerprint = content_hash(changes.get("subject", record.subject), changes.get("body_text", record.body_text))
+    if fingerprint != record.content_hash:
+        changes["content_hash"] = fingerprint
+        if "analysis_version" not in email:
+            changes["analysis_version"] = None
+    if not changes:
+        return False
+    for field, value in changes.items():
+        setattr(record, field, value)
+    record.updated_at = datetime.utcnow()
+    return True
+
+
+def content_fingerprint(email: dict) -> str:
+    """Fingerprint an incoming email dict the way ``upsert_emails`` stores it."""
+    return content_hash(email.get("subject", "No Subject"), email.get("body_text", ""))
+
+
+def metadata_only(gmail_ids: Iterable[str]) -> List[str]:
+    """Which of ``gmail_ids`` are stored without a downloaded body."""
+    gmail_ids = list(dict.fromkeys(gmail_id for gmail_id in gmail_ids if gmail_id))
+    pending: List[str] = []
+    with get_session() as session:
+        for start in range(0, len(gmail_ids), UPSERT_CHUNK_SIZE):
+            stmt = select(EmailRecord.gmail_id).where(
+                col(EmailRecord.gmail_id).in_(gmail_ids[start:start + UPSERT_CHUNK_SIZE]),
+                EmailRecord.body_state == "metadata",
+            )
+            pending.extend(session.exec(stmt))
+    return pending
+
+
+def get_email_by_gmail_id(gmail_id: str) -> Optional[EmailRecord]:
+    with get_session() as session:
+        return session.exec(select(EmailRecord).where(EmailRecord.gmail_id == gmail_id)).first()
+
+
+def analysis_state(gmail_ids: Iterable[str], chunk_size: int = UPSERT_CHUNK_SIZE) -> Dict[str, Tuple[Optional[str], Optional[str]]]:
+    """``(content_hash, analysis_version)`` of stored rows by gmail_id, without loading bodies."""
+    gmail_ids = list(dict.fromkeys(gmail_id for gmail_id in gmail_ids if gmail_id))
+    state: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+    with get_session() as session:
+        for start in range(0, len(gmail_ids), chunk_size):
+            stmt = select(EmailRecord.gmail_id, EmailRecord.content_hash, EmailRecord.analysis_version).where(
+                col(EmailRecord.gmail_id).in_(gmail_ids[start:start + chunk_size])
+            )
+            for gmail_id, fingerprint, version in session.exec(stmt):
+                state.setdefault(gmail_id, (fingerprint, version))
+    return state
+
+
+def resolve_fields(fields: Optional[str]) -> Tuple[str, ...]:
+    """Parse a ``fields=`` query value: empty for the summary, ``all``, or a comma list."""
+    if not fields:
+        return SUMMARY_FIELDS
+    if fields.strip() == "all":
+        return EMAIL_FIELDS
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(EMAIL_FIELDS))
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return tuple(dict.fromkeys([*_REQUIRED_FIELDS, *names]))
+
+
+# A full record, or a ``Row`` of just the requested columns when ``fields`` is given.
+EmailResult = Union[EmailRecord, Row]
+
+
+def select_emails(fields: Optional[Sequence[str]] = None):
+    """``select(EmailRecord)``, or of just ``fields`` (plus id/created_at) as plain rows."""
+    if fields is None:
+        return select(EmailRecord)
+    names = dict.fromkeys([*_REQUIRED_FIELDS, *fields])
+    return select(*[getattr(EmailRecord, name) for name in names])
+
+
 def list_emails(
     status: Optional[str] = None,
     category: Optional[str] = None,
     limit: int = 100,
     offset: int = 0,
-) -> List[EmailRecord]:
+    cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[EmailResult]:
+    """List emails newest first; ``cursor`` (keyset) takes precedence over ``offset``.
+
+    With ``fields`` only those columns are read, and rows are returned as
+    named tuples (``row._asdict()``) instead of records.
+    """
     with get_session() as session:
-        stmt = select(EmailRecord)
-        if status:
-            stmt = stmt.where(EmailRecord.status == status)
-        if category:
-            stmt = stmt.where(EmailRecord.category == category)
-        stmt = stmt.offset(offset).limit(limit)
-        return list(session.exec(stmt))
+        return list(session.exec(_list_stmt(status, category, limit, offset, cursor, fields)))
 
 
-def _escape_like_pattern(pattern: str) -> str:
-    """Escape SQL LIKE wildcards in user input to prevent wildcard injection."""
-    return pattern.replace("%", "\\%").replace("_", "\\_")
+async def list_emails_async(
+    status: Optional[str] = None,
+    category: Optional[str] = None,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[EmailResult]:
+    """``list_emails`` on the async engine."""
+    async with get_async_session() as session:
+        return list(await session.exec(_list_stmt(status, category, limit, offset, cursor, fields)))
+
+
+def _list_stmt(status, category, limit, offset, cursor, fields):
+    stmt = select_emails(fields)
+    if status:
+        stmt = stmt.where(EmailRecord.status == status)
+    if category:
+        stmt = stmt.where(EmailRecord.category == category)
+    return _paginate(stmt, limit, offset, cursor)
+
+
+def _paginate(stmt, limit: int, offset: int, cursor: Optional[str]):
+    stmt = order_newest_first(stmt, EmailRecord.created_at, EmailRecord.id)
+    if cursor:
+        return apply_cursor(stmt, EmailRecord.created_at, EmailRecord.id, cursor).limit(limit)
+    return stmt.offset(offset).limit(limit)
 
 
 def search_emails(
@@ -83,71 +245,141 @@ def search_emails(
     date_to: Optional[datetime] = None,
     limit: int = 100,
     offset: int = 0,
-) -> List[EmailRecord]:
-    """Search and filter emails with multiple criteria."""
+    cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[EmailResult]:
+    """Search and filter emails with multiple criteria.
+
+    Text queries are ranked by relevance and paged by ``offset``; filter-only
+    searches are newest first and also accept a keyset ``cursor``. ``fields``
+    projects the result as in ``list_emails``.
+    """
+    if query and cursor:
+        raise ValueError("Cursor pagination is not supported for ranked text queries; use offset")
+    stmt = _search_stmt(from_email, subject, category, status, is_read, is_starred, date_from, date_to, fields)
     with get_session() as session:
-        stmt = select(EmailRecord)
-        
-        # Full-text search across subject and body (with wildcard escaping)
+        # Full-text search across subject, body and snippet, ranked by relevance
         if query:
-            escaped_query = _escape_like_pattern(query)
-            search_pattern = f"%{escaped_query}%"
-            stmt = stmt.where(
-                or_(
-                    col(EmailRecord.subject).ilike(search_pattern, escape="\\"),
-                    col(EmailRecord.body_text).ilike(search_pattern, escape="\\"),
-                    col(EmailRecord.snippet).ilike(search_pattern, escape="\\")
-                )
-            )
-        
-        # Filter by sender (with wildcard escaping)
-        if from_email:
-            escaped_email = _escape_like_pattern(from_email)
-            stmt = stmt.where(col(EmailRecord.from_email).ilike(f"%{escaped_email}%", escape="\\"))
-        
-        # Filter by subject (with wildcard escaping)
-        if subject:
-            escaped_subject = _escape_like_pattern(subject)
-            stmt = stmt.where(col(EmailRecord.subject).ilike(f"%{escaped_subject}%", escape="\\"))
-        
-        # Filter by category
-        if category:
-            stmt = stmt.where(EmailRecord.category == category)
-        
-        # Filter by status
-        if status:
-            stmt = stmt.where(EmailRecord.status == status)
-        
-        # Filter by read status
-        if is_read is not None:
-            stmt = stmt.where(EmailRecord.is_read == is_read)
-        
-        # Filter by starred status
-        if is_starred is not None:
-            stmt = stmt.where(EmailRecord.is_starred == is_starred)
-        
-        # Filter by date range
-        if date_from:
-            stmt = stmt.where(EmailRecord.created_at >= date_from)
-        if date_to:
-            stmt = stmt.where(EmailRecord.created_at <= date_to)
-        
+            return get_search_backend().search(session, stmt, query, limit, offset)
+
         # Order by most recent first
-        stmt = stmt.order_by(EmailRecord.created_at.desc())
-        stmt = stmt.offset(offset).limit(limit)
-        
-        return list(session.exec(stmt))
+        return list(session.exec(_paginate(stmt, limit, offset, cursor)))
 
 
-def mark_status(ids: List[int], status: str) -> int:
+async def search_emails_async(
+    query: Optional[str] = None,
+    from_email: Optional[str] = None,
+    subject: Optional[str] = None,
+    category: Optional[str] = None,
+    status: Optional[str] = None,
+    is_read: Optional[bool] = None,
+    is_starred: Optional[bool] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = 100,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> List[EmailResult]:
+    """``search_emails`` on the async engine.
+
+    Ranked text queries run ``search_emails`` in the threadpool instead:
+    backends are written against a sync session, and the ``memory`` backend
+    scores in Python, which would block the event loop.
+    """
+    if query:
+        return await run_in_threadpool(
+            search_emails,
+            query=query, from_email=from_email, subject=subject, category=category, status=status,
+            is_read=is_read, is_starred=is_starred, date_from=date_from, date_to=date_to,
+            limit=limit, offset=offset, cursor=cursor, fields=fields,
+        )
+    stmt = _search_stmt(from_email, subject, category, status, is_read, is_starred, date_from, date_to, fields)
+    async with get_async_session() as session:
+        return list(await session.exec(_paginate(stmt, limit, offset, cursor)))
+
+
+def _search_stmt(from_email, subject, category, status, is_read, is_starred, date_from, date_to, fields):
+    stmt = select_emails(fields)
+
+    # Filter by sender (with wildcard escaping)
+    if from_email:
+        escaped_email = escape_like_pattern(from_email)
+        stmt = stmt.where(col(EmailRecord.from_email).ilike(f"%{escaped_email}%", escape="\\"))
+
+    # Filter by subject (with wildcard escaping)
+    if subject:
+        escaped_subject = escape_like_pattern(subject)
+        stmt = stmt.where(col(EmailRecord.subject).ilike(f"%{escaped_subject}%", escape="\\"))
+
+    # Filter by category
+    if category:
+        stmt = stmt.where(EmailRecord.category == category)
+
+    # Filter by status
+    if status:
+        stmt = stmt.where(EmailRecord.status == status)
+
+    # Filter by read status
+    if is_read is not None:
+        stmt = stmt.where(EmailRecord.is_read == is_read)
+
+    # Filter by starred status
+    if is_starred is not None:
+        stmt = stmt.where(EmailRecord.is_starred == is_starred)
+
+    # Filter by date range
+    if date_from:
+        stmt = stmt.where(EmailRecord.created_at >= date_from)
+    if date_to:
+        stmt = stmt.where(EmailRecord.created_at <= date_to)
+    return stmt
+
+
+def labeled_examples(limit: int = 20000) -> Tuple[List[str], List[str]]:
+    """Most recent ``(subject + body, category)`` pairs that carry a real category."""
     with get_session() as session:
-        stmt = select(EmailRecord).where(EmailRecord.id.in_(ids))
-        records = list(session.exec(stmt))
-        for rec in records:
-            rec.status = status
-            rec.updated_at = datetime.utcnow()
-        session.commit()
-        return len(records)
+        stmt = (
+            select(EmailRecord.subject, EmailRecord.body_text, EmailRecord.category)
+            .where(col(EmailRecord.category).is_not(None), EmailRecord.category != "Unlabeled")
+            .order_by(EmailRecord.created_at.desc())
+            .limit(limit)
+        )
+        rows = list(session.exec(stmt))
+    return [f"{subject} {body or ''}".strip() for subject, body, _ in rows], [category for _, _, category in rows]
+
+
+def bulk_update(
+    ids: Optional[Iterable[int]] = None,
+    gmail_ids: Optional[Iterable[str]] = None,
+    chunk_size: int = UPSERT_CHUNK_SIZE,
+    **values,
+) -> int:
+    """Set ``values`` on the rows with the given ``ids`` or ``gmail_ids``; returns rows matched.
+
+    Runs one ``UPDATE ... WHERE id IN (...)`` per ``chunk_size`` ids in a
+    single transaction, so no row (or its body) is loaded into Python.
+    """
+    unknown = set(values) - BULK_UPDATE_FIELDS
+    if unknown:
+        raise ValueError(f"Fields not bulk-updatable: {', '.join(sorted(unknown))}")
+    if not values:
+        raise ValueError("Nothing to update")
+    if (ids is None) == (gmail_ids is None):
+        raise ValueError("Pass exactly one of ids or gmail_ids")
+    column = EmailRecord.id if ids is not None else EmailRecord.gmail_id
+    keys = list(dict.fromkeys(ids if ids is not None else gmail_ids))
+    values["updated_at"] = datetime.utcnow()
+    matched = 0
+    with engine.begin() as conn:
+        for start in range(0, len(keys), chunk_size):
+            stmt = update(EmailRecord).where(col(column).in_(keys[start:start + chunk_size])).values(**values)
+            matched += conn.execute(stmt).rowcount
+    return matched
+
+
+def mark_status(ids: List[int], status: str) -> int:
+    return bulk_update(ids, status=status)
 
 
 def bulk_archive_emails(ids: List[int]) -> int:
@@ -162,34 +394,13 @@ def bulk_delete_emails(ids: List[int]) -> int:
 
 def bulk_mark_read(ids: List[int], is_read: bool = True) -> int:
     """Mark multiple emails as read or unread."""
-    with get_session() as session:
-        stmt = select(EmailRecord).where(EmailRecord.id.in_(ids))
-        records = list(session.exec(stmt))
-        for rec in records:
-            rec.is_read = is_read
-            rec.updated_at = datetime.utcnow()
-        session.commit()
-        return len(records)
+    return bulk_update(ids, is_read=is_read)
 
 
 def bulk_star_emails(ids: List[int], is_starred: bool = True) -> int:
     """Star or unstar multiple emails."""
-    with get_session() as session:
-        stmt = select(EmailRecord).where(EmailRecord.id.in_(ids))
-        records = list(session.exec(stmt))
-        for rec in records:
-            rec.is_starred = is_starred
-            rec.updated_at = datetime.utcnow()
-        session.commit()
-        return len(records)
+    return bulk_update(ids, is_starred=is_starred)
 
 
 def delete_by_gmail_ids(gmail_ids: List[str]) -> int:
-    with get_session() as session:
-        stmt = select(EmailRecord).where(EmailRecord.gmail_id.in_(gmail_ids))
-        records = list(session.exec(stmt))
-        for rec in records:
-            rec.status = "deleted"
-            rec.updated_at = datetime.utcnow()
-        session.commit()
-        return len(records)
+    return bulk_update(gmail_ids=gmail_ids, status="deleted")
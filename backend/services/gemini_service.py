@@ -1,11 +1,23 @@
+import asyncio
 import logging
 import os
+from typing import AsyncIterator, Optional
 
 import google.generativeai as genai
 
+from services import llm_cache, llm_providers
+
 log = logging.getLogger(__name__)
 
 _gemini_configured = False
+_model = None
+
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-pro")
+
+NOT_CONFIGURED = "Gemini API is not configured. Please set GOOGLE_API_KEY."
+SUMMARY_PROMPT = "Summarize the following email concisely:\n\n{text}"
+ACTIONS_PROMPT = "Extract all action items and tasks from this email:\n\n{text}"
+REWRITE_PROMPT = "Rewrite the following text in a {tone} tone:\n\n{text}"
 
 
 def _configure_gemini():
@@ -26,44 +38,123 @@ def _configure_gemini():
 
 async def generate_summary(email_text: str) -> str:
     """Generate a summary of an email using Gemini."""
-    if not _configure_gemini():
-        return "Gemini API is not configured. Please set GOOGLE_API_KEY."
-    
-    try:
-        model = genai.GenerativeModel('gemini-pro')
-        prompt = f"Summarize the following email concisely:\n\n{email_text}"
-        response = await model.generate_content_async(prompt)
-        return response.text
-    except Exception as exc:
-        log.error("Gemini summary failed: %s", exc)
-        return "Error generating summary. Please try again later."
+    return await _complete(
+        SUMMARY_PROMPT.format(text=email_text), "summary", "Error generating summary. Please try again later.",
+        cache_as="summary",
+    )
 
 
 async def extract_action_items(email_text: str) -> str:
     """Extract action items from an email using Gemini."""
-    if not _configure_gemini():
-        return "Gemini API is not configured. Please set GOOGLE_API_KEY."
-    
-    try:
-        model = genai.GenerativeModel('gemini-pro')
-        prompt = f"Extract all action items and tasks from this email:\n\n{email_text}"
-        response = await model.generate_content_async(prompt)
-        return response.text
-    except Exception as exc:
-        log.error("Gemini action extraction failed: %s", exc)
-        return "Error extracting action items. Please try again later."
+    return await _complete(
+        ACTIONS_PROMPT.format(text=email_text), "action extraction",
+        "Error extracting action items. Please try again later.", cache_as="actions",
+    )
 
 
 async def rewrite_draft(text: str, tone: str) -> str:
     """Rewrite a draft email in a specific tone using Gemini."""
-    if not _configure_gemini():
-        return "Gemini API is not configured. Please set GOOGLE_API_KEY."
-    
+    return await _complete(REWRITE_PROMPT.format(tone=tone, text=text), "rewrite", "Error rewriting text. Please try again later.")
+
+
+def stream_summary(email_text: str) -> AsyncIterator[str]:
+    """``generate_summary``, yielding text as Gemini generates it."""
+    return _stream(
+        SUMMARY_PROMPT.format(text=email_text), "summary", "Error generating summary. Please try again later.",
+        cache_as="summary",
+    )
+
+
+def stream_action_items(email_text: str) -> AsyncIterator[str]:
+    """``extract_action_items``, yielding text as Gemini generates it."""
+    return _stream(
+        ACTIONS_PROMPT.format(text=email_text), "action extraction", "Error extracting action items. Please try again later.",
+        cache_as="actions",
+    )
+
+
+def stream_rewrite(text: str, tone: str) -> AsyncIterator[str]:
+    """``rewrite_draft``, yielding text as Gemini generates it."""
+    return _stream(REWRITE_PROMPT.format(tone=tone, text=text), "rewrite", "Error rewriting text. Please try again later.")
+
+
+async def _complete(prompt: str, what: str, error_text: str, cache_as: Optional[str] = None) -> str:
+    # Only Gemini's own answers are cached under GEMINI_MODEL; a fallback
+    # provider's answer is returned but not stored.
+    async def compute():
+        served_by = []
+        answer = await llm_providers.complete(prompt, prefer="gemini", served_by=served_by.append)
+        return answer, served_by == [GeminiProvider.name]
+
     try:
-        model = genai.GenerativeModel('gemini-pro')
-        prompt = f"Rewrite the following text in a {tone} tone:\n\n{text}"
-        response = await model.generate_content_async(prompt)
-        return response.text
+        if cache_as:
+            return await llm_cache.cached(cache_as, GEMINI_MODEL, prompt, compute)
+        return await llm_providers.complete(prompt, prefer="gemini")
+    except llm_providers.NotConfigured:
+        return NOT_CONFIGURED
     except Exception as exc:
-        log.error("Gemini rewrite failed: %s", exc)
-        return "Error rewriting text. Please try again later."
+        log.error("Gemini %s failed: %s", what, exc)
+        return error_text
+
+
+async def _stream(prompt: str, what: str, error_text: str, cache_as: Optional[str] = None) -> AsyncIterator[str]:
+    # Cancelling the consuming task (client disconnect) cancels the pending
+    # read, which cancels the streaming RPC so Gemini stops generating.
+    # With ``cache_as`` a cached answer is sent in one piece, and a stream
+    # Gemini completes is cached for the non-streaming call and vice versa.
+    if cache_as:
+        hit = await llm_cache.get(cache_as, GEMINI_MODEL, prompt)
+        if hit is not None:
+            yield hit
+            return
+
+    parts, served_by = [], []
+    chunks = llm_providers.stream(prompt, prefer="gemini", served_by=served_by.append)
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+    except llm_providers.NotConfigured:
+        yield NOT_CONFIGURED
+        return
+    except (asyncio.CancelledError, GeneratorExit):
+        raise
+    except Exception as exc:
+        log.error("Gemini %s stream failed: %s", what, exc)
+        yield error_text
+        return
+    finally:
+        await chunks.aclose()
+    if cache_as and served_by == [GeminiProvider.name]:
+        await llm_cache.put(cache_as, GEMINI_MODEL, prompt, "".join(parts))
+
+
+def _get_model():
+    """The one ``GenerativeModel``; it holds no connection, so it is shared by every call."""
+    global _model
+    if _model is None:
+        _model = genai.GenerativeModel(GEMINI_MODEL)
+    return _model
+
+
+class GeminiProvider:
+    """Gemini through google-generativeai (see services.llm_providers)."""
+    name = "gemini"
+
+    def available(self) -> bool:
+        return _gemini_configured or bool(os.getenv("GOOGLE_API_KEY"))
+
+    async def complete(self, prompt: str) -> str:
+        _configure_gemini()
+        response = await _get_model().generate_content_async(prompt)
+        return response.text
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        _configure_gemini()
+        response = await _get_model().generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+
+
+llm_providers.register(GeminiProvider())
@@ -0,0 +1,175 @@
+"""Cached OAuth credentials and Gmail API clients, keyed by account.
+
+``get_gmail_service(account_id)`` replaces ``authenticate_gmail()`` per
+call. Credentials are loaded once (from the account's stored tokens, or
+token.json for the default key) and refreshed ahead of expiry under a
+per-account lock, with refreshed tokens written back. Service objects are
+built from a discovery document parsed once per process and reused, one
+per thread and account, because httplib2 connections must not be shared
+between threads. The least recently used accounts are evicted beyond
+``GMAIL_CLIENT_CACHE_SIZE``.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, Union
+
+from google.auth.exceptions import RefreshError
+from google.auth.transport.requests import Request
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from prometheus_client import Counter, Histogram
+
+from services.account_service import get_account, update_account_tokens
+from services.gmail_service import CLIENT_SECRET_FILE, SCOPES, TOKEN_PATH, load_default_credentials
+
+log = logging.getLogger(__name__)
+
+GMAIL_CLIENT_CACHE_SIZE = int(os.getenv("GMAIL_CLIENT_CACHE_SIZE", "256"))
+# Refresh access tokens this long before they expire, so no request races the expiry.
+GMAIL_TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv("GMAIL_TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+TOKEN_URI = "https://oauth2.googleapis.com/token"
+
+CLIENT_CACHE = Counter("gmail_client_cache_total", "Gmail client lookups by result", ["result"])
+TOKEN_REFRESH_SECONDS = Histogram(
+    "gmail_token_refresh_seconds", "Latency of OAuth access token refreshes",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+TOKEN_REFRESH_FAILURES = Counter("gmail_token_refresh_failures_total", "OAuth token refreshes that failed")
+
+DEFAULT = "default"
+Key = Union[int, str]
+
+
+class _Client:
+    def __init__(self, source: Key, credentials: Credentials):
+        # Whose tokens these are: an account id, or DEFAULT for token.json.
+        self.source = source
+        self.credentials = credentials
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+
+_clients: "OrderedDict[Key, _Client]" = OrderedDict()
+_clients_lock = threading.Lock()
+_discovery_doc: Optional[dict] = None
+
+
+def get_gmail_service(account_id: Optional[int] = None):
+    """An authorized Gmail client for ``account_id`` (or the default token.json)."""
+    key = DEFAULT if account_id is None else account_id
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None:
+            _clients.move_to_end(key)
+    if client is None:
+        CLIENT_CACHE.labels(result="miss").inc()
+        client = _load(key)
+    else:
+        CLIENT_CACHE.labels(result="hit").inc()
+    if _expiring(client.credentials):
+        with client.lock:
+            if _expiring(client.credentials):
+                _refresh(client)
+    service = getattr(client.local, "service", None)
+    if service is None:
+        service = client.local.service = build_from_document(_discovery(), credentials=client.credentials)
+    return service
+
+
+def invalidate(account_id: Optional[int] = None) -> None:
+    """Drop the cached client, e.g. after the account's tokens were replaced."""
+    with _clients_lock:
+        _clients.pop(DEFAULT if account_id is None else account_id, None)
+
+
+def clear() -> None:
+    with _clients_lock:
+        _clients.clear()
+
+
+def _load(key: Key) -> _Client:
+    account = get_account(key) if key != DEFAULT else None
+    if account and account.refresh_token:
+        client = _Client(key, _account_credentials(account))
+    else:
+        # Accounts without stored tokens share the default token.json login.
+        with _clients_lock:
+            client = _clients.get(DEFAULT)
+        if client is None:
+            client = _Client(DEFAULT, load_default_credentials())
+    with _clients_lock:
+        # Another thread may have loaded it meanwhile; keep the first one.
+        if client.source == DEFAULT:
+            client = _clients.setdefault(DEFAULT, client)
+        client = _clients.setdefault(key, client)
+        _clients.move_to_end(key)
+        while len(_clients) > GMAIL_CLIENT_CACHE_SIZE:
+            _clients.popitem(last=False)
+    return client
+
+
+def _account_credentials(account) -> Credentials:
+    client_id, client_secret = _client_config()
+    return Credentials(
+        token=account.access_token,
+        refresh_token=account.refresh_token,
+        token_uri=TOKEN_URI,
+        client_id=client_id,
+        client_secret=client_secret,
+        scopes=SCOPES,
+        expiry=account.token_expiry,
+    )
+
+
+def _expiring(credentials: Credentials) -> bool:
+    if not credentials.token:
+        return True
+    if credentials.expiry is None:
+        return False
+    return credentials.expiry - datetime.utcnow() < timedelta(seconds=GMAIL_TOKEN_REFRESH_MARGIN_SECONDS)
+
+
+def _refresh(client: _Client) -> None:
+    credentials = client.credentials
+    start = time.perf_counter()
+    try:
+        credentials.refresh(Request())
+    except RefreshError:
+        TOKEN_REFRESH_FAILURES.inc()
+        # A revoked or invalid grant will not fix itself; reload on the next call.
+        with _clients_lock:
+            for key in [key for key, cached in _clients.items() if cached is client]:
+                del _clients[key]
+        raise
+    finally:
+        TOKEN_REFRESH_SECONDS.observe(time.perf_counter() - start)
+    log.info(f"gmail token refreshed for {client.source}")
+    if client.source == DEFAULT:
+        TOKEN_PATH.write_text(credentials.to_json())
+    else:
+        update_account_tokens(client.source, credentials.token, credentials.refresh_token, credentials.expiry)
+
+
+def _client_config():
+    client_id = os.getenv("GOOGLE_CLIENT_ID")
+    client_secret = os.getenv("GOOGLE_CLIENT_SECRET")
+    if (not client_id or not client_secret) and os.path.exists(CLIENT_SECRET_FILE):
+        with open(CLIENT_SECRET_FILE, encoding="utf-8") as handle:
+            config = json.load(handle)
+        section = config.get("installed") or config.get("web") or {}
+        client_id = client_id or section.get("client_id")
+        client_secret = client_secret or section.get("client_secret")
+    return client_id, client_secret
+
+
+def _discovery() -> dict:
+    global _discovery_doc
+    if _discovery_doc is None:
+        _discovery_doc = json.loads(get_static_doc("gmail", "v1"))
+    return _discovery_doc
@@ -1,15 +1,24 @@
 
-import base64
 import json
 import logging
 import os
+import random
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Tuple
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 
+import httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+
+from services.mime_body import extract_body
 
 SCOPES = ['https://www.googleapis.com/auth/gmail.modify']
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
@@ -17,11 +26,85 @@ SAMPLE_PATH = PROJECT_ROOT / "sample_emails.json"
 TOKEN_PATH = PROJECT_ROOT / "token.json"
 CLIENT_SECRET_FILE = os.getenv("GOOGLE_CLIENT_SECRET_FILE", "credentials.json")
 
+# messages.get calls per BatchHttpRequest (Gmail caps batches at 100; >50 tends to hit rate limits).
+GMAIL_BATCH_SIZE = min(100, max(1, int(os.getenv("GMAIL_BATCH_SIZE", "50"))))
+# Batches in flight at once; each worker thread uses its own HTTP connection.
+GMAIL_FETCH_CONCURRENCY = max(1, int(os.getenv("GMAIL_FETCH_CONCURRENCY", "4")))
+# Per-user Gmail quota is 250 units/s; messages.list and messages.get cost 5 units each.
+GMAIL_QUOTA_UNITS_PER_SECOND = float(os.getenv("GMAIL_QUOTA_UNITS_PER_SECOND", "250"))
+GMAIL_FETCH_RETRIES = int(os.getenv("GMAIL_FETCH_RETRIES", "3"))
+LIST_PAGE_MAX = 500
+# Ids per users.messages.batchModify call (the API maximum).
+MODIFY_CHUNK_MAX = 1000
+QUOTA_UNITS = {
+    "messages.list": 5, "messages.get": 5, "history.list": 2, "getProfile": 1,
+    "messages.trash": 5, "messages.modify": 5, "messages.batchModify": 50,
+}
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# "metadata" syncs headers, snippet and labels only; bodies are hydrated on demand
+# (sync_service.hydrate_emails). "full" downloads and decodes bodies up front.
+GMAIL_FETCH_FORMAT = os.getenv("GMAIL_FETCH_FORMAT", "full")
+METADATA_HEADERS = ["Subject", "From", "To"]
+# Partial-response masks: skip sizeEstimate, internal ids and (for metadata) every other header.
+MESSAGE_FIELDS = {
+    "metadata": "id,threadId,labelIds,snippet,historyId,payload/headers",
+    "full": "id,threadId,labelIds,snippet,historyId,payload",
+}
+
 log = logging.getLogger(__name__)
 
 
+class HistoryExpired(Exception):
+    """The start historyId is older than Gmail keeps (about a week); do a full sync."""
+
+
+class BulkResult(NamedTuple):
+    """Per-message outcome of a remote bulk operation."""
+    succeeded: List[str]
+    failed: Dict[str, str]  # gmail_id -> error
+
+
+class QuotaBudget:
+    """Token bucket over Gmail quota units shared by every fetch worker.
+
+    ``acquire`` blocks until the units are available; a request larger than
+    one second of budget (a full batch) runs the bucket into debt and the
+    following callers wait it off.
+    """
+
+    def __init__(self, units_per_second: float = GMAIL_QUOTA_UNITS_PER_SECOND):
+        self.rate = units_per_second
+        self._available = units_per_second
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, units: float) -> None:
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._available = min(self.rate, self._available + (now - self._updated) * self.rate)
+            self._updated = now
+            self._available -= units
+            wait = -self._available / self.rate if self._available < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+_quota = QuotaBudget()
+
+
 def authenticate_gmail():
-    """Perform OAuth flow and return an authenticated Gmail service client."""
+    """Perform OAuth flow and return an authenticated Gmail service client.
+
+    Uncached: reads token.json and rebuilds the client on every call. Request
+    handlers and jobs use ``gmail_clients.get_gmail_service`` instead.
+    """
+    return build('gmail', 'v1', credentials=load_default_credentials())
+
+
+def load_default_credentials() -> Credentials:
+    """Credentials from token.json, refreshed or created via the OAuth flow as needed."""
     creds = None
     if TOKEN_PATH.exists():
         creds = Credentials.from_authorized_user_file(str(TOKEN_PATH), SCOPES)
@@ -38,51 +121,320 @@ def authenticate_gmail():
         except Exception:
             log.exception("gmail auth failed")
             raise
-    service = build('gmail', 'v1', credentials=creds)
-    return service
-
-
-def fetch_emails(service, max_results: int = 50) -> List[dict]:
-    results = service.users().messages().list(userId='me', maxResults=max_results).execute()
-    messages = results.get('messages', [])
-    email_data: List[dict] = []
-    for msg in messages:
-        msg_detail = service.users().messages().get(userId='me', id=msg['id']).execute()
-        snippet = msg_detail.get('snippet', '')
-        payload = msg_detail.get('payload', {})
-        headers = payload.get('headers', [])
-        subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
-        sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown sender')
-        body_text, body_html = _extract_body(payload)
-        body_content = body_text or body_html
-        labels = msg_detail.get('labelIds', [])
-        email_data.append({
-            'subject': subject,
-            'snippet': snippet,
-            'body_text': body_content,
-            'from_email': sender,
-            'gmail_id': msg['id'],
-            'is_read': 'UNREAD' not in labels,
-            'is_starred': 'STARRED' in labels,
-        })
-    return email_data
+    return creds
 
 
-def delete_emails(service, gmail_ids: List[str]) -> None:
-    for gid in gmail_ids:
+def fetch_emails(
+    service,
+    max_results: int = 50,
+    query: Optional[str] = None,
+    concurrency: int = GMAIL_FETCH_CONCURRENCY,
+    batch_size: int = GMAIL_BATCH_SIZE,
+    quota: Optional[QuotaBudget] = None,
+    message_format: Optional[str] = None,
+) -> List[dict]:
+    """Fetch up to ``max_results`` messages, newest first.
+
+    ``messages.list`` pages are followed via ``nextPageToken``; as each page
+    arrives its ids are split into ``BatchHttpRequest``s of ``batch_size``
+    gets, which ``concurrency`` worker threads execute while the next page is
+    being listed. All calls draw from ``quota`` (quota units per second).
+    ``message_format`` (default ``GMAIL_FETCH_FORMAT``) is ``full`` or
+    ``metadata``; metadata emails carry no ``body_text`` and
+    ``body_state="metadata"``.
+    """
+    quota = quota or _quota
+    pages = _list_message_ids(service, max_results, query, quota)
+    return _fetch_pages(service, pages, concurrency, batch_size, quota, message_format or GMAIL_FETCH_FORMAT)
+
+
+def get_messages(
+    service,
+    ids: List[str],
+    concurrency: int = GMAIL_FETCH_CONCURRENCY,
+    batch_size: int = GMAIL_BATCH_SIZE,
+    quota: Optional[QuotaBudget] = None,
+    message_format: Optional[str] = None,
+) -> List[dict]:
+    """Fetch and parse specific messages; ids Gmail no longer has are skipped."""
+    pages = [list(ids)] if ids else []
+    return _fetch_pages(service, pages, concurrency, batch_size, quota or _quota, message_format or GMAIL_FETCH_FORMAT)
+
+
+def _fetch_pages(service, pages, concurrency: int, batch_size: int, quota: "QuotaBudget", message_format: str) -> List[dict]:
+    details: Dict[str, dict] = {}
+    order: List[str] = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="gmail-fetch") as pool:
+        futures = []
+        for ids in pages:
+            order.extend(ids)
+            for start in range(0, len(ids), batch_size):
+                chunk = ids[start:start + batch_size]
+                futures.append(pool.submit(_get_messages, service, chunk, quota, message_format))
+        for future in futures:
+            details.update(future.result())
+    return [_parse_message(details[msg_id], message_format) for msg_id in order if msg_id in details]
+
+
+def get_history_id(service, quota: Optional[QuotaBudget] = None) -> str:
+    """The mailbox's current historyId, the starting point for incremental syncs."""
+    (quota or _quota).acquire(QUOTA_UNITS["getProfile"])
+    return str(service.users().getProfile(userId="me").execute()["historyId"])
+
+
+def list_history(service, start_history_id: str, quota: Optional[QuotaBudget] = None) -> Tuple[List[dict], str]:
+    """All history records after ``start_history_id`` and the mailbox's latest historyId.
+
+    Raises ``HistoryExpired`` when Gmail answers 404 for a too-old start id.
+    """
+    quota = quota or _quota
+    records: List[dict] = []
+    page_token = None
+    latest = start_history_id
+    while True:
+        quota.acquire(QUOTA_UNITS["history.list"])
+        kwargs = {
+            "userId": "me",
+            "startHistoryId": start_history_id,
+            "historyTypes": ["messageAdded", "messageDeleted", "labelAdded", "labelRemoved"],
+            "maxResults": LIST_PAGE_MAX,
+        }
+        if page_token:
+            kwargs["pageToken"] = page_token
         try:
-            service.users().messages().trash(userId='me', id=gid).execute()
-        except Exception:
-            # Keep best-effort; log in real impl
-            continue
+            results = service.users().history().list(**kwargs).execute()
+        except HttpError as exc:
+            if exc.resp.status == 404:
+                raise HistoryExpired(start_history_id) from exc
+            raise
+        records.extend(results.get("history", []))
+        latest = str(results.get("historyId", latest))
+        page_token = results.get("nextPageToken")
+        if not page_token:
+            return records, latest
+
+
+def _list_message_ids(service, max_results: int, query: Optional[str], quota: QuotaBudget):
+    """Yield message ids one ``messages.list`` page at a time."""
+    page_token = None
+    remaining = max_results
+    while remaining > 0:
+        quota.acquire(QUOTA_UNITS["messages.list"])
+        kwargs = {"userId": "me", "maxResults": min(remaining, LIST_PAGE_MAX)}
+        if page_token:
+            kwargs["pageToken"] = page_token
+        if query:
+            kwargs["q"] = query
+        results = service.users().messages().list(**kwargs).execute()
+        ids = [msg["id"] for msg in results.get("messages", [])][:remaining]
+        if ids:
+            yield ids
+        remaining -= len(ids)
+        page_token = results.get("nextPageToken")
+        if not page_token or not ids:
+            return
+
+
+def _get_messages(service, ids: List[str], quota: QuotaBudget, message_format: str = "full") -> Dict[str, dict]:
+    """Fetch ``ids`` with batch requests, retrying rate-limited or 5xx parts with jittered backoff."""
+    fetched, errors = _execute_batch(
+        service, ids, lambda msg_id: _get_request(service, msg_id, message_format),
+        QUOTA_UNITS["messages.get"], quota,
+    )
+    for msg_id, exc in errors.items():
+        log.warning("gmail get %s failed: %s", msg_id, exc)
+    return fetched
+
 
+def _execute_batch(
+    service,
+    ids: List[str],
+    make_request: Callable[[str], object],
+    units: int,
+    quota: QuotaBudget,
+) -> Tuple[Dict[str, dict], Dict[str, Exception]]:
+    """Run one request per id in a BatchHttpRequest; returns (responses, errors) by id.
 
-def move_emails_to_label(service, gmail_ids: List[str], label_id: str) -> None:
-    for gid in gmail_ids:
+    Rate-limited or 5xx parts are retried with jittered backoff; parts still
+    failing after ``GMAIL_FETCH_RETRIES`` retries are reported as errors.
+    """
+    http = _worker_http(service)
+    responses: Dict[str, dict] = {}
+    errors: Dict[str, Exception] = {}
+    pending = list(ids)
+    for attempt in range(GMAIL_FETCH_RETRIES + 1):
+        retry: Dict[str, Exception] = {}
+
+        def _collect(request_id, response, exception):
+            if exception is None:
+                responses[request_id] = response
+            elif isinstance(exception, HttpError) and exception.resp.status in RETRYABLE_STATUS:
+                retry[request_id] = exception
+            else:
+                errors[request_id] = exception
+
+        batch = service.new_batch_http_request(callback=_collect)
+        for msg_id in pending:
+            batch.add(make_request(msg_id), request_id=msg_id)
+        quota.acquire(units * len(pending))
         try:
-            service.users().messages().modify(userId='me', id=gid, body={"addLabelIds": [label_id]}).execute()
-        except Exception:
-            continue
+            batch.execute(http=http)
+        except HttpError as exc:
+            if exc.resp.status not in RETRYABLE_STATUS:
+                raise
+            retry = {msg_id: exc for msg_id in pending if msg_id not in responses and msg_id not in errors}
+        if not retry:
+            break
+        pending = list(retry)
+        if attempt < GMAIL_FETCH_RETRIES:
+            time.sleep(_backoff(attempt))
+    else:
+        log.warning("gmail batch gave up on %d messages after %d retries", len(pending), GMAIL_FETCH_RETRIES)
+        errors.update(retry)
+    return responses, errors
+
+
+def _backoff(attempt: int) -> float:
+    return min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5)
+
+
+def _get_request(service, msg_id: str, message_format: str):
+    kwargs = {"userId": "me", "id": msg_id, "format": message_format, "fields": MESSAGE_FIELDS[message_format]}
+    if message_format == "metadata":
+        kwargs["metadataHeaders"] = METADATA_HEADERS
+    return service.users().messages().get(**kwargs)
+
+
+_http_local = threading.local()
+
+
+def _worker_http(service):
+    """A per-thread HTTP client: httplib2 connections must not be shared between threads.
+
+    Clients are held weakly by service, so a dropped service takes its
+    clients (and credentials) with it.
+    """
+    clients = getattr(_http_local, "clients", None)
+    if clients is None:
+        clients = _http_local.clients = weakref.WeakKeyDictionary()
+    http = clients.get(service)
+    if http is None:
+        shared = getattr(service, "_http", None)
+        http = httplib2.Http(timeout=60)
+        if isinstance(shared, AuthorizedHttp):
+            http = AuthorizedHttp(shared.credentials, http=http)
+        clients[service] = http
+    return http
+
+
+def _parse_message(msg_detail: dict, message_format: str = "full") -> dict:
+    snippet = msg_detail.get('snippet', '')
+    payload = msg_detail.get('payload', {})
+    headers = payload.get('headers', [])
+    subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
+    sender = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown sender')
+    recipients = next((h['value'] for h in headers if h['name'] == 'To'), None)
+    email = {
+        'subject': subject,
+        'snippet': snippet,
+        'from_email': sender,
+        'to_email': recipients,
+        'gmail_id': msg_detail['id'],
+        'body_state': message_format,
+        **label_flags(msg_detail.get('labelIds', [])),
+    }
+    if message_format == "full":
+        body = extract_body(payload)
+        email['body_text'] = body.analysis_text()
+        email['has_attachments'] = body.has_attachments
+        email['attachments'] = body.attachments
+    return email
+
+
+def label_flags(label_ids: List[str]) -> dict:
+    """EmailRecord read/starred flags for a message's Gmail labels."""
+    return {'is_read': 'UNREAD' not in label_ids, 'is_starred': 'STARRED' in label_ids}
+
+
+def delete_emails(
+    service,
+    gmail_ids: List[str],
+    batch_size: int = GMAIL_BATCH_SIZE,
+    quota: Optional[QuotaBudget] = None,
+) -> BulkResult:
+    """Move messages to the Gmail trash, ``batch_size`` trash calls per batch request.
+
+    ``users.messages.batchDelete`` would take 1,000 ids per call, but it
+    deletes permanently and needs the full ``https://mail.google.com/``
+    scope; trashing keeps deletes recoverable under ``gmail.modify``.
+    """
+    quota = quota or _quota
+    ids = list(dict.fromkeys(gmail_ids))
+    succeeded: List[str] = []
+    failed: Dict[str, str] = {}
+    for start in range(0, len(ids), batch_size):
+        chunk = ids[start:start + batch_size]
+        done, errors = _execute_batch(
+            service, chunk, lambda msg_id: service.users().messages().trash(userId='me', id=msg_id, fields='id'),
+            QUOTA_UNITS["messages.trash"], quota,
+        )
+        succeeded.extend(msg_id for msg_id in chunk if msg_id in done)
+        failed.update({msg_id: str(exc) for msg_id, exc in errors.items()})
+    if failed:
+        log.warning("gmail trash failed for %d of %d messages", len(failed), len(ids))
+    return BulkResult(succeeded, failed)
+
+
+def move_emails_to_label(
+    service,
+    gmail_ids: List[str],
+    label_id: str,
+    quota: Optional[QuotaBudget] = None,
+) -> BulkResult:
+    """Add ``label_id`` to messages with ``users.messages.batchModify``, 1,000 ids per call.
+
+    batchModify succeeds or fails as a whole; when a chunk is rejected
+    outright (e.g. one unknown id), it is retried as per-message modify
+    calls in batch requests so the bad ids are isolated and reported.
+    """
+    quota = quota or _quota
+    ids = list(dict.fromkeys(gmail_ids))
+    body = {"addLabelIds": [label_id]}
+    succeeded: List[str] = []
+    failed: Dict[str, str] = {}
+    for start in range(0, len(ids), MODIFY_CHUNK_MAX):
+        chunk = ids[start:start + MODIFY_CHUNK_MAX]
+        error = _batch_modify(service, chunk, body, quota)
+        if error is None:
+            succeeded.extend(chunk)
+        elif error.resp.status in (400, 404) and len(chunk) > 1:
+            for part in range(0, len(chunk), GMAIL_BATCH_SIZE):
+                sub = chunk[part:part + GMAIL_BATCH_SIZE]
+                done, errors = _execute_batch(
+                    service, sub,
+                    lambda msg_id: service.users().messages().modify(userId='me', id=msg_id, body=body, fields='id'),
+                    QUOTA_UNITS["messages.modify"], quota,
+                )
+                succeeded.extend(msg_id for msg_id in sub if msg_id in done)
+                failed.update({msg_id: str(exc) for msg_id, exc in errors.items()})
+        else:
+            failed.update({msg_id: str(error) for msg_id in chunk})
+    if failed:
+        log.warning("gmail label %s failed for %d of %d messages", label_id, len(failed), len(ids))
+    return BulkResult(succeeded, failed)
+
+
+def _batch_modify(service, ids: List[str], body: dict, quota: QuotaBudget) -> Optional[HttpError]:
+    """One batchModify call with retries; returns the final error, or None on success."""
+    for attempt in range(GMAIL_FETCH_RETRIES + 1):
+        quota.acquire(QUOTA_UNITS["messages.batchModify"])
+        try:
+            service.users().messages().batchModify(userId='me', body={"ids": ids, **body}).execute()
+            return None
+        except HttpError as exc:
+            if exc.resp.status not in RETRYABLE_STATUS or attempt == GMAIL_FETCH_RETRIES:
+                return exc
+            time.sleep(_backoff(attempt))
 
 
 def load_sample_emails(limit: int = 50) -> List[dict]:
@@ -101,41 +453,3 @@ def load_sample_emails(limit: int = 50) -> List[dict]:
             "body_text": item.get("body_text", item.get("snippet", "")),
         })
     return enriched
-
-
-def _extract_body(payload: dict) -> Tuple[str, str]:
-    """Extract plain text and HTML bodies from a Gmail message payload."""
-    if not payload:
-        return "", ""
-
-    mime_type = payload.get("mimeType", "")
-    body = payload.get("body", {})
-    data = body.get("data")
-
-    plain_parts: List[str] = []
-    html_parts: List[str] = []
-
-    if data:
-        try:
-            decoded = base64.urlsafe_b64decode(data).decode("utf-8", errors="ignore")
-            if mime_type.startswith("text/plain"):
-                plain_parts.append(decoded)
-            elif mime_type.startswith("text/html"):
-                html_parts.append(decoded)
-            else:
-                plain_parts.append(decoded)
-        except Exception:
-            pass
-
-    for part in payload.get("parts") or []:
-        text_part, html_part = _extract_body(part)
-        if text_part:
-            plain_parts.append(text_part)
-        if html_part:
-            html_parts.append(html_part)
-
-    if plain_parts:
-        return "\n".join(plain_parts), ("\n".join(html_parts) if html_parts else "")
-    if html_parts:
-        return "", "\n".join(html_parts)
-    return "", ""
@@ -1,39 +1,229 @@
+"""OpenAI chat completions for ``/assistant/reply``.
 
+``generate_reply_async`` is what the route awaits. It goes through
+services.llm_providers, which adds the deadline, circuit breaker and
+fallback to another provider; ``OpenAIProvider`` makes the calls. It shares
+one ``AsyncOpenAI`` client, and with it one pooled HTTP connection pool, per
+event loop, closed when the loop changes or by ``close_async_client`` at
+shutdown. At most ``OPENAI_MAX_CONCURRENCY`` calls are in flight; the
+rest wait on a semaphore instead of holding a threadpool worker. Rate limits
+(429), server errors (5xx), timeouts and connection errors are retried with
+jittered exponential backoff. ``OPENAI_BASE_URL`` points the client at any
+OpenAI-compatible server.
+
+``stream_reply`` yields the reply as it is generated. Closing or cancelling
+the generator (a client disconnecting from the SSE route) closes the
+upstream response, so the completion stops instead of running to the end.
+"""
+import asyncio
 import logging
 import os
+import random
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import anyio
+import httpx
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    AsyncOpenAI,
+)
+from prometheus_client import Counter, Gauge, Histogram
 
-from openai import OpenAI
+from services import llm_providers
 
 log = logging.getLogger(__name__)
 
-_client: OpenAI | None = None
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "15"))
+# Completions allowed in flight per process; further callers queue.
+OPENAI_MAX_CONCURRENCY = max(1, int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")))
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+OPENAI_RETRY_BASE_SECONDS = float(os.getenv("OPENAI_RETRY_BASE_SECONDS", "0.5"))
+OPENAI_RETRY_MAX_SECONDS = float(os.getenv("OPENAI_RETRY_MAX_SECONDS", "8"))
+
+NOT_CONFIGURED = "OPENAI_API_KEY is not set. Please configure it in your environment."
+FAILED = "Error generating reply right now. Please try again later."
+
+LLM_QUEUE_SECONDS = Histogram(
+    "llm_queue_seconds", "Time LLM calls waited for a concurrency slot", ["provider"],
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30),
+)
+LLM_IN_FLIGHT = Gauge("llm_in_flight", "LLM calls currently being made", ["provider"])
+LLM_RETRIES = Counter("llm_retries_total", "LLM call attempts that were retried", ["provider", "reason"])
+
+_async_client: Optional[AsyncOpenAI] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
 
 
-def _get_client() -> OpenAI | None:
-    global _client
-    if _client is not None:
-        return _client
+async def _get_async_client() -> Optional[AsyncOpenAI]:
+    """The shared async client for the running loop; httpx pools cannot cross loops."""
+    global _async_client, _semaphore, _loop
+    loop = asyncio.get_running_loop()
+    if _async_client is not None and _loop is loop:
+        return _async_client
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         log.warning("OPENAI_API_KEY is not set; GPT replies will be disabled.")
         return None
-    _client = OpenAI(api_key=api_key)
-    return _client
+    limits = httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_CONNECTIONS)
+    previous = _async_client
+    _async_client = client = AsyncOpenAI(
+        api_key=api_key,
+        base_url=os.getenv("OPENAI_BASE_URL") or None,
+        timeout=OPENAI_TIMEOUT_SECONDS,
+        # Retries happen here, with jitter and (for plain replies) outside the concurrency slot.
+        max_retries=0,
+        http_client=httpx.AsyncClient(limits=limits, timeout=OPENAI_TIMEOUT_SECONDS),
+    )
+    _semaphore = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+    _loop = loop
+    if previous is not None:
+        await _close(previous)
+    return client
 
 
-def generate_reply(prompt: str) -> str:
-    client = _get_client()
-    if not client:
-        return "OPENAI_API_KEY is not set. Please configure it in your environment."
+async def close_async_client() -> None:
+    """Close the shared client's connection pool (app shutdown)."""
+    global _async_client, _loop
+    client, _async_client, _loop = _async_client, None, None
+    if client is not None:
+        await _close(client)
 
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+async def _close(client: AsyncOpenAI) -> None:
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[{"role": "user", "content": prompt}],
-            timeout=15,
-        )
-        return response.choices[0].message.content
+        await client.close()
+    except RuntimeError as exc:
+        # Its connections belong to a loop that has already been closed.
+        log.debug(f"Could not close an OpenAI client: {exc}")
+
+
+def _model() -> str:
+    return os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+
+async def generate_reply_async(prompt: str) -> str:
+    """A chat completion for ``prompt``, bounded, retried and with fallback."""
+    try:
+        return await llm_providers.complete(prompt, prefer="openai")
+    except llm_providers.NotConfigured:
+        return NOT_CONFIGURED
     except Exception as exc:  # noqa: BLE001 - want full capture
         log.error("OpenAI reply failed: %s", exc)
-        return "Error generating reply right now. Please try again later."
+        return FAILED
+
+
+async def stream_reply(prompt: str) -> AsyncIterator[str]:
+    """Yield the reply in pieces as the model generates it."""
+    chunks = llm_providers.stream(prompt, prefer="openai")
+    try:
+        async for chunk in chunks:
+            yield chunk
+    except llm_providers.NotConfigured:
+        yield NOT_CONFIGURED
+    except (asyncio.CancelledError, GeneratorExit):
+        raise
+    except Exception as exc:  # noqa: BLE001 - want full capture
+        log.error("OpenAI reply stream failed: %s", exc)
+        yield FAILED
+    finally:
+        await chunks.aclose()
+
+
+class OpenAIProvider:
+    """Chat completions on the shared async client (see services.llm_providers)."""
+    name = "openai"
+
+    def available(self) -> bool:
+        return bool(os.getenv("OPENAI_API_KEY"))
+
+    async def complete(self, prompt: str) -> str:
+        client = await _get_async_client()
+
+        async def call():
+            async with _slot():
+                return await client.chat.completions.create(
+                    model=_model(), messages=[{"role": "user", "content": prompt}]
+                )
+
+        response = await _with_retries(call)
+        return response.choices[0].message.content
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        # Failures before the first token are retried; the slot is held
+        # until the stream ends or is closed.
+        client = await _get_async_client()
+        async with _slot():
+            stream = await _with_retries(
+                lambda: client.chat.completions.create(
+                    model=_model(), messages=[{"role": "user", "content": prompt}], stream=True
+                )
+            )
+            try:
+                async for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta:
+                        yield delta
+            finally:
+                # Shielded: a cancelled request must still close the upstream connection.
+                with anyio.CancelScope(shield=True):
+                    await stream.close()
+
+
+@asynccontextmanager
+async def _slot():
+    """One of the ``OPENAI_MAX_CONCURRENCY`` in-flight slots."""
+    queued = time.perf_counter()
+    async with _semaphore:
+        LLM_QUEUE_SECONDS.labels(provider="openai").observe(time.perf_counter() - queued)
+        LLM_IN_FLIGHT.labels(provider="openai").inc()
+        try:
+            yield
+        finally:
+            LLM_IN_FLIGHT.labels(provider="openai").dec()
+
+
+async def _with_retries(call):
+    for attempt in range(OPENAI_MAX_RETRIES + 1):
+        try:
+            return await call()
+        except Exception as exc:  # noqa: BLE001 - classified below
+            reason = _retry_reason(exc)
+            if reason is None or attempt == OPENAI_MAX_RETRIES:
+                raise
+            delay = _retry_delay(exc, attempt)
+        LLM_RETRIES.labels(provider="openai", reason=reason).inc()
+        log.warning(f"OpenAI call failed ({reason}), retrying in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+
+def _retry_reason(exc: Exception) -> Optional[str]:
+    if isinstance(exc, APITimeoutError):
+        return "timeout"
+    if isinstance(exc, APIConnectionError):
+        return "connection"
+    if isinstance(exc, APIStatusError):
+        if exc.status_code == 429:
+            return "rate_limited"
+        if exc.status_code >= 500:
+            return "server_error"
+    return None
+
+
+def _retry_delay(exc: Exception, attempt: int) -> float:
+    delay = min(OPENAI_RETRY_MAX_SECONDS, OPENAI_RETRY_BASE_SECONDS * 2 ** attempt) * random.uniform(0.5, 1.5)
+    if isinstance(exc, APIStatusError):
+        # Honour the server's Retry-After when it asks for longer.
+        try:
+            delay = max(delay, min(OPENAI_RETRY_MAX_SECONDS, float(exc.response.headers.get("retry-after", 0))))
+        except ValueError:
+            pass
+    return delay
+
+
+llm_providers.register(OpenAIProvider())
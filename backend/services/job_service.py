@@ -0,0 +1,229 @@
+"""Persistent background jobs for bulk operations.
+
+``submit`` stores a ``job`` row and returns at once; a small worker pool
+runs the job in chunks of ``JOB_CHUNK_SIZE`` items, retrying a chunk that
+raises with backoff and checkpointing progress after every chunk. Jobs left
+queued or running by a restart are picked up again by ``resume_jobs`` at
+startup and continue from their last checkpoint. Gmail trash and label
+calls are idempotent, so re-running a chunk is harmless. A job is run
+under a ``job:<id>`` lease (services.leases), so only one replica executes
+it at a time. The lease is renewed every ``JOB_LEASE_RENEW_SECONDS`` while
+the job runs, however long a chunk and its retries take; a job whose lease
+is lost anyway stops after its current chunk.
+
+Handlers are registered per job kind and take ``(params, items)``,
+returning a ``BulkResult`` of the items that succeeded and the failures.
+"""
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlmodel import col, select
+
+from db import get_session
+from models.job import Job
+from services import leases
+from services.gmail_clients import get_gmail_service
+from services.gmail_service import BulkResult
+from services.sync_service import label_emails, trash_emails
+
+log = logging.getLogger(__name__)
+
+JOB_WORKERS = max(1, int(os.getenv("JOB_WORKERS", "2")))
+JOB_CHUNK_SIZE = max(1, int(os.getenv("JOB_CHUNK_SIZE", "500")))
+JOB_CHUNK_RETRIES = int(os.getenv("JOB_CHUNK_RETRIES", "3"))
+# Well inside the lease TTL, so a renewal can fail once or twice without losing it.
+JOB_LEASE_RENEW_SECONDS = float(os.getenv("JOB_LEASE_RENEW_SECONDS", str(leases.LEASE_TTL_SECONDS / 3)))
+# Per-item error messages kept on the job row; counts stay exact beyond it.
+JOB_MAX_FAILURE_DETAILS = int(os.getenv("JOB_MAX_FAILURE_DETAILS", "1000"))
+
+ACTIVE = ("queued", "running")
+
+JOBS_FINISHED = Counter("jobs_finished_total", "Background jobs finished", ["kind", "status"])
+JOB_DURATION = Histogram(
+    "job_duration_seconds", "Wall time of a background job run", ["kind"],
+    buckets=(0.5, 1, 5, 15, 30, 60, 120, 300, 900),
+)
+JOBS_RUNNING = Gauge("jobs_running", "Background jobs executing in this process")
+JOB_ITEMS = Counter("job_items_total", "Items processed by background jobs", ["kind", "outcome"])
+
+JobHandler = Callable[[dict, List[str]], BulkResult]
+_handlers: Dict[str, JobHandler] = {}
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# Set on shutdown: running jobs stop after their current chunk and resume on the next start.
+_stopping = threading.Event()
+
+
+def register_handler(kind: str, handler: JobHandler) -> None:
+    _handlers[kind] = handler
+
+
+def submit(kind: str, items: List[str], **params) -> Job:
+    """Persist a job over ``items`` and start it in the background."""
+    if kind not in _handlers:
+        raise ValueError(f"Unknown job kind: {kind}")
+    items = list(dict.fromkeys(items))
+    with get_session() as session:
+        job = Job(kind=kind, params={"items": items, **params}, total=len(items))
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+    _dispatch(job.id)
+    return job
+
+
+def get_job(job_id: int) -> Optional[Job]:
+    with get_session() as session:
+        return session.get(Job, job_id)
+
+
+def list_jobs(status: Optional[str] = None, limit: int = 50) -> List[Job]:
+    with get_session() as session:
+        stmt = select(Job).order_by(col(Job.id).desc()).limit(limit)
+        if status:
+            stmt = stmt.where(Job.status == status)
+        return list(session.exec(stmt))
+
+
+def resume_jobs() -> int:
+    """Restart jobs a previous process left queued or running; returns how many."""
+    with get_session() as session:
+        ids = list(session.exec(select(Job.id).where(col(Job.status).in_(ACTIVE))))
+    for job_id in ids:
+        _dispatch(job_id)
+    if ids:
+        log.info(f"Resuming {len(ids)} background jobs")
+    return len(ids)
+
+
+def shutdown(wait: bool = False) -> None:
+    global _executor
+    _stopping.set()
+    with _executor_lock:
+        if _executor:
+            _executor.shutdown(wait=wait, cancel_futures=not wait)
+            _executor = None
+
+
+def _dispatch(job_id: int) -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _stopping.clear()
+            _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+        _executor.submit(_run, job_id)
+
+
+def _run(job_id: int) -> None:
+    lease = f"job:{job_id}"
+    if not leases.acquire(lease, leases.REPLICA_ID):
+        return  # another replica is running it
+    job = get_job(job_id)
+    if job is None or job.status not in ACTIVE:
+        leases.release([lease], leases.REPLICA_ID)
+        return
+    JOBS_RUNNING.inc()
+    start = time.perf_counter()
+    status = "failed"
+    done, lost = threading.Event(), threading.Event()
+    threading.Thread(target=_keep_lease, args=(lease, done, lost), name=f"{lease}-lease", daemon=True).start()
+    try:
+        status = "succeeded" if _execute(job, lost) else "interrupted"
+    except Exception as exc:  # noqa: BLE001 - recorded on the job row
+        log.exception(f"Job {job_id} ({job.kind}) failed")
+        _update(job_id, status="failed", error=str(exc), finished_at=datetime.utcnow())
+    finally:
+        done.set()
+        JOBS_RUNNING.dec()
+        JOB_DURATION.labels(kind=job.kind).observe(time.perf_counter() - start)
+        JOBS_FINISHED.labels(kind=job.kind, status=status).inc()
+        leases.release([lease], leases.REPLICA_ID)
+
+
+def _keep_lease(lease: str, done: threading.Event, lost: threading.Event) -> None:
+    """Renew ``lease`` until ``done`` is set; set ``lost`` if another replica took it."""
+    while not done.wait(JOB_LEASE_RENEW_SECONDS):
+        try:
+            held = leases.acquire(lease, leases.REPLICA_ID)
+        except Exception as exc:  # noqa: BLE001 - try again at the next renewal
+            log.warning(f"Could not renew {lease}: {exc}")
+            continue
+        if not held:
+            log.warning(f"Lost {lease} to another replica; stopping after the current chunk")
+            lost.set()
+            return
+
+
+def _execute(job: Job, lost: threading.Event) -> bool:
+    """Run the job's remaining chunks; False if stopped early by shutdown or a lost lease."""
+    handler = _handlers[job.kind]
+    _update(job.id, status="running", started_at=job.started_at or datetime.utcnow(), attempts=job.attempts + 1)
+    items = job.params.get("items", [])
+    offset = job.processed
+    while offset < len(items):
+        if _stopping.is_set() or lost.is_set():
+            return False
+        chunk = items[offset:offset + JOB_CHUNK_SIZE]
+        result = _run_chunk(handler, job.params, chunk)
+        offset += len(chunk)
+        _checkpoint(job.id, offset, result)
+        JOB_ITEMS.labels(kind=job.kind, outcome="succeeded").inc(len(result.succeeded))
+        JOB_ITEMS.labels(kind=job.kind, outcome="failed").inc(len(result.failed))
+    _update(job.id, status="succeeded", finished_at=datetime.utcnow())
+    return True
+
+
+def _run_chunk(handler: JobHandler, params: dict, chunk: List[str]) -> BulkResult:
+    for attempt in range(JOB_CHUNK_RETRIES + 1):
+        try:
+            return handler(params, chunk)
+        except Exception as exc:  # noqa: BLE001 - retried, then fails the job
+            if attempt == JOB_CHUNK_RETRIES:
+                raise
+            log.warning(f"Job chunk failed (attempt {attempt + 1}), retrying: {exc}")
+            time.sleep(min(30.0, 2.0 * 2 ** attempt) * random.uniform(0.5, 1.5))
+
+
+def _checkpoint(job_id: int, processed: int, result: BulkResult) -> None:
+    with get_session() as session:
+        job = session.get(Job, job_id)
+        job.processed = processed
+        job.succeeded_count += len(result.succeeded)
+        job.failed_count += len(result.failed)
+        if result.failed:
+            failures = dict(job.failures or {})
+            room = max(0, JOB_MAX_FAILURE_DETAILS - len(failures))
+            failures.update(list(result.failed.items())[:room])
+            job.failures = failures
+        job.updated_at = datetime.utcnow()
+        session.add(job)
+        session.commit()
+
+
+def _update(job_id: int, **fields) -> None:
+    with get_session() as session:
+        job = session.get(Job, job_id)
+        for field, value in fields.items():
+            setattr(job, field, value)
+        job.updated_at = datetime.utcnow()
+        session.add(job)
+        session.commit()
+
+
+def _gmail_delete(params: dict, gmail_ids: List[str]) -> BulkResult:
+    return trash_emails(get_gmail_service(params.get("account_id")), gmail_ids)
+
+
+def _gmail_move(params: dict, gmail_ids: List[str]) -> BulkResult:
+    return label_emails(get_gmail_service(params.get("account_id")), gmail_ids, params["label_id"])
+
+
+register_handler("gmail.delete", _gmail_delete)
+register_handler("gmail.move", _gmail_move)
@@ -0,0 +1,157 @@
+"""Database row leases for sharing scheduled work between backend replicas.
+
+A lease is a ``schedulerlease`` row naming its owner and an expiry time.
+Taking one is a single conditional UPDATE (ours already, or expired) with an
+INSERT ... ON CONFLICT DO NOTHING fallback, so two replicas racing for the
+same name cannot both win on either SQLite or PostgreSQL. Owners renew all
+their leases in one statement per heartbeat; a replica that stops
+heartbeating loses everything once its leases expire.
+
+``AccountLeases`` builds account ownership on top: each replica registers a
+``replica:<id>`` lease, claims ``account:<id>`` leases as their syncs come
+due, and never holds more than its fair share of accounts, releasing surplus
+when replicas join so the newcomers pick them up.
+"""
+import logging
+import math
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from prometheus_client import Gauge
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from db import engine
+from models.scheduler_lease import SchedulerLease
+
+log = logging.getLogger(__name__)
+
+# Defaults to host + pid, which is unique per pod and per local process.
+REPLICA_ID = os.getenv("SCHEDULER_REPLICA_ID") or f"{socket.gethostname()}-{os.getpid()}"
+# Leases outlive a few missed heartbeats; a dead replica's accounts move after this.
+LEASE_TTL_SECONDS = int(os.getenv("SCHEDULER_LEASE_TTL_SECONDS", "90"))
+
+OWNED_ACCOUNTS = Gauge("scheduler_owned_accounts", "Accounts whose syncs this replica owns")
+LIVE_REPLICAS = Gauge("scheduler_live_replicas", "Replicas with an unexpired heartbeat lease")
+FAIR_SHARE = Gauge("scheduler_fair_share", "Most accounts this replica will own")
+
+_table = SchedulerLease.__table__
+
+
+def acquire(name: str, owner: str, ttl: int = LEASE_TTL_SECONDS) -> bool:
+    """Take or extend ``name`` for ``owner``; False if someone else holds it."""
+    now = datetime.utcnow()
+    expires = now + timedelta(seconds=ttl)
+    with engine.begin() as conn:
+        taken = conn.execute(
+            update(_table)
+            .where(_table.c.name == name, (_table.c.owner == owner) | (_table.c.expires_at < now))
+            .values(owner=owner, expires_at=expires)
+        ).rowcount
+        if taken:
+            return True
+        row = {"name": name, "owner": owner, "expires_at": expires}
+        if engine.dialect.name in {"postgresql", "sqlite"}:
+            if engine.dialect.name == "postgresql":
+                from sqlalchemy.dialects.postgresql import insert
+            else:
+                from sqlalchemy.dialects.sqlite import insert
+            return conn.execute(insert(_table).on_conflict_do_nothing(), row).rowcount == 1
+    try:
+        with engine.begin() as conn:
+            conn.execute(_table.insert(), row)
+        return True
+    except IntegrityError:
+        return False
+
+
+def renew(owner: str, ttl: int = LEASE_TTL_SECONDS) -> int:
+    """Extend every unexpired lease of ``owner``; returns how many."""
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        return conn.execute(
+            update(_table)
+            .where(_table.c.owner == owner, _table.c.expires_at >= now)
+            .values(expires_at=now + timedelta(seconds=ttl))
+        ).rowcount
+
+
+def release(names: List[str], owner: str) -> None:
+    if not names:
+        return
+    with engine.begin() as conn:
+        conn.execute(delete(_table).where(_table.c.owner == owner, _table.c.name.in_(names)))
+
+
+def release_all(owner: str) -> None:
+    with engine.begin() as conn:
+        conn.execute(delete(_table).where(_table.c.owner == owner))
+
+
+def held(owner: str, prefix: str = "") -> List[str]:
+    """Names of the unexpired leases ``owner`` holds, optionally filtered by prefix."""
+    query = select(_table.c.name).where(_table.c.owner == owner, _table.c.expires_at >= datetime.utcnow())
+    if prefix:
+        query = query.where(_table.c.name.like(f"{prefix}%"))
+    with engine.connect() as conn:
+        return list(conn.execute(query.order_by(_table.c.name)).scalars())
+
+
+def count_live(prefix: str) -> int:
+    query = select(func.count()).select_from(_table).where(
+        _table.c.name.like(f"{prefix}%"), _table.c.expires_at >= datetime.utcnow()
+    )
+    with engine.connect() as conn:
+        return conn.execute(query).scalar_one()
+
+
+def purge_expired() -> None:
+    with engine.begin() as conn:
+        conn.execute(delete(_table).where(_table.c.expires_at < datetime.utcnow()))
+
+
+class AccountLeases:
+    """Account sync ownership for one replica."""
+
+    def __init__(self, owner: str = REPLICA_ID, ttl: int = LEASE_TTL_SECONDS):
+        self.owner = owner
+        self.ttl = ttl
+        # Unlimited until the first heartbeat has counted the replicas.
+        self.fair_share = None
+
+    def heartbeat(self, total_accounts: int, busy: Callable[[int], bool] = lambda account_id: False) -> int:
+        """Refresh this replica's leases and shed accounts above its fair share."""
+        acquire(f"replica:{self.owner}", self.owner, self.ttl)
+        renew(self.owner, self.ttl)
+        purge_expired()
+        replicas = max(1, count_live("replica:"))
+        self.fair_share = max(1, math.ceil(total_accounts / replicas))
+        owned = held(self.owner, "account:")
+        excess = len(owned) - self.fair_share
+        surplus = []
+        if excess > 0:
+            # Accounts mid-sync stay put so the new owner cannot overlap the run.
+            idle = [name for name in owned if not busy(int(name.split(":", 1)[1]))]
+            surplus = idle[-excess:]
+        if surplus:
+            release(surplus, self.owner)
+            log.info(f"Released {len(surplus)} account leases to rebalance across {replicas} replicas")
+        OWNED_ACCOUNTS.set(len(owned) - len(surplus))
+        LIVE_REPLICAS.set(replicas)
+        FAIR_SHARE.set(self.fair_share)
+        return self.fair_share
+
+    def claim(self, account_id: int) -> bool:
+        """True if this replica owns (or just took) the account's sync."""
+        name = f"account:{account_id}"
+        if self.fair_share is not None:
+            owned = held(self.owner, "account:")
+            if name not in owned and len(owned) >= self.fair_share:
+                return False
+        return acquire(name, self.owner, self.ttl)
+
+    def release_all(self) -> None:
+        release_all(self.owner)
+        OWNED_ACCOUNTS.set(0)
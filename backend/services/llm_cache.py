@@ -0,0 +1,188 @@
+"""Response cache and request coalescing for repeatable LLM calls.
+
+Summaries and action items depend only on the prompt, so they are cached
+under ``sha256(operation, model, normalized prompt)``; whitespace is
+collapsed before hashing so re-wrapped copies of an email share an entry.
+Tier 1 is a bounded in-process LRU with a TTL; tier 2 (``LLM_CACHE_PERSIST``)
+is the ``llmcacheentry`` table, so answers survive restarts and are shared
+between workers. Concurrent misses for one key are coalesced: the first
+caller runs the model call and the others await its result. Failures are
+never cached.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from prometheus_client import Counter
+from sqlalchemy import delete
+from sqlalchemy.exc import SQLAlchemyError
+
+from db import engine, get_session
+from models.llm_cache import LLMCacheEntry
+
+log = logging.getLogger(__name__)
+
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_PERSIST = os.getenv("LLM_CACHE_PERSIST", "true").lower() in {"1", "true", "yes"}
+
+LLM_CACHE_REQUESTS = Counter(
+    "llm_cache_requests_total", "Cacheable LLM requests by how they were answered", ["operation", "result"]
+)
+# Rough token count (4 characters per token) of the prompts and completions not sent upstream.
+LLM_CACHE_SAVED_TOKENS = Counter(
+    "llm_cache_saved_tokens_total", "Estimated LLM tokens saved by cache hits and coalescing", ["operation"]
+)
+LLM_CACHE_EVICTIONS = Counter("llm_cache_evictions_total", "Entries evicted from the in-process LLM cache")
+
+_WHITESPACE = re.compile(r"\s+")
+
+_lru: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+_lru_lock = threading.Lock()
+_inflight: Dict[str, asyncio.Future] = {}
+
+
+def cache_key(operation: str, model: str, prompt: str) -> str:
+    normalized = _WHITESPACE.sub(" ", prompt).strip()
+    digest = hashlib.sha256()
+    for part in (operation, model, normalized):
+        digest.update(part.encode("utf-8", "surrogatepass"))
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+async def cached(
+    operation: str, model: str, prompt: str, compute: Callable[[], Awaitable[Tuple[str, bool]]]
+) -> str:
+    """The cached answer for ``prompt``, or ``await compute()`` once for all concurrent callers.
+
+    ``compute`` returns the answer and whether it may be stored under
+    ``model``; concurrent callers share it either way.
+    """
+    key = cache_key(operation, model, prompt)
+    hit = await get(operation, model, prompt, key=key)
+    if hit is not None:
+        return hit
+
+    pending = _inflight.get(key)
+    if pending is not None and pending.get_loop() is asyncio.get_running_loop():
+        LLM_CACHE_REQUESTS.labels(operation=operation, result="coalesced").inc()
+        try:
+            result = await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise  # this caller was cancelled
+            # The caller running the request was cancelled; take over.
+            return await cached(operation, model, prompt, compute)
+        LLM_CACHE_SAVED_TOKENS.labels(operation=operation).inc(_tokens(prompt, result))
+        return result
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    LLM_CACHE_REQUESTS.labels(operation=operation, result="miss").inc()
+    try:
+        result, cacheable = await compute()
+    except asyncio.CancelledError:
+        future.cancel()
+        raise
+    except Exception as exc:
+        future.set_exception(exc)
+        future.exception()  # mark retrieved: there may be no waiters
+        raise
+    else:
+        future.set_result(result)
+        if cacheable:
+            await put(operation, model, prompt, result, key=key)
+        return result
+    finally:
+        _inflight.pop(key, None)
+
+
+async def get(operation: str, model: str, prompt: str, key: Optional[str] = None) -> Optional[str]:
+    """A cached, unexpired answer, memory first; None on a miss."""
+    key = key or cache_key(operation, model, prompt)
+    now = time.time()
+    with _lru_lock:
+        entry = _lru.get(key)
+        if entry is not None and entry[1] <= now:
+            del _lru[key]
+            entry = None
+        if entry is not None:
+            _lru.move_to_end(key)
+    tier = "memory"
+    if entry is None and LLM_CACHE_PERSIST:
+        entry = await run_in_threadpool(_load, key)
+        tier = "db"
+        if entry is not None:
+            _remember(key, *entry)
+    if entry is None:
+        return None
+    LLM_CACHE_REQUESTS.labels(operation=operation, result=f"hit_{tier}").inc()
+    LLM_CACHE_SAVED_TOKENS.labels(operation=operation).inc(_tokens(prompt, entry[0]))
+    return entry[0]
+
+
+async def put(operation: str, model: str, prompt: str, response: str, key: Optional[str] = None) -> None:
+    key = key or cache_key(operation, model, prompt)
+    expires = time.time() + LLM_CACHE_TTL_SECONDS
+    _remember(key, response, expires)
+    if LLM_CACHE_PERSIST:
+        await run_in_threadpool(_save, key, operation, model, response, expires)
+
+
+def clear() -> None:
+    """Drop the in-process tier; persisted entries expire on their own."""
+    with _lru_lock:
+        _lru.clear()
+
+
+def _tokens(prompt: str, response: str) -> int:
+    return (len(prompt) + len(response)) // 4
+
+
+def _remember(key: str, response: str, expires: float) -> None:
+    evicted = 0
+    with _lru_lock:
+        _lru[key] = (response, expires)
+        _lru.move_to_end(key)
+        while len(_lru) > LLM_CACHE_SIZE:
+            _lru.popitem(last=False)
+            evicted += 1
+    if evicted:
+        LLM_CACHE_EVICTIONS.inc(evicted)
+
+
+def _load(key: str) -> Optional[Tuple[str, float]]:
+    try:
+        with get_session() as session:
+            row = session.get(LLMCacheEntry, key)
+    except SQLAlchemyError as exc:
+        # The cache is an optimisation; a missing table or locked DB only costs a model call.
+        log.warning("llm cache lookup failed: %s", exc)
+        return None
+    if row is None or row.expires_at <= datetime.utcnow():
+        return None
+    return row.response, time.time() + (row.expires_at - datetime.utcnow()).total_seconds()
+
+
+def _save(key: str, operation: str, model: str, response: str, expires: float) -> None:
+    table = LLMCacheEntry.__table__
+    now = datetime.utcnow()
+    row = {
+        "key": key, "operation": operation, "model": model, "response": response,
+        "created_at": now, "expires_at": now + timedelta(seconds=expires - time.time()),
+    }
+    try:
+        with engine.begin() as conn:
+            conn.execute(delete(table).where((table.c.key == key) | (table.c.expires_at <= now)))
+            conn.execute(table.insert(), row)
+    except SQLAlchemyError as exc:
+        log.warning("llm cache write failed: %s", exc)
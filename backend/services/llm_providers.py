@@ -0,0 +1,241 @@
+"""One call path for every LLM provider, with deadlines, circuit breaking and fallback.
+
+A provider exposes ``name``, ``available()`` (is it configured?),
+``async complete(prompt)`` and ``stream(prompt)``, an async iterator of text
+pieces. ``gpt_service`` and ``gemini_service`` register theirs on import;
+``stub`` answers deterministically without a network and is meant for tests
+and local development (``LLM_PROVIDERS=stub``).
+
+``complete`` and ``stream`` try the preferred provider first and then, with
+``LLM_FALLBACK``, the other enabled providers in ``LLM_PROVIDERS`` order.
+Each attempt is cut off after ``LLM_TIMEOUT_SECONDS`` and the whole call
+after ``LLM_DEADLINE_SECONDS``; a stream's limits apply until its first
+piece, since a long answer is expected to take a while to finish. After
+``LLM_BREAKER_FAILURES`` failures in a row a provider's circuit opens and it
+is skipped for ``LLM_BREAKER_RESET_SECONDS``; then one trial call decides
+whether it closes again.
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+log = logging.getLogger(__name__)
+
+LLM_PROVIDERS = [name.strip() for name in os.getenv("LLM_PROVIDERS", "openai,gemini").split(",") if name.strip()]
+LLM_FALLBACK = os.getenv("LLM_FALLBACK", "true").lower() in {"1", "true", "yes"}
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "20"))
+LLM_DEADLINE_SECONDS = float(os.getenv("LLM_DEADLINE_SECONDS", "30"))
+LLM_BREAKER_FAILURES = max(1, int(os.getenv("LLM_BREAKER_FAILURES", "5")))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_seconds", "Latency of LLM calls, including retries", ["provider", "outcome"],
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60),
+)
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    "llm_first_token_seconds", "Time from request to the first streamed token", ["provider"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+LLM_ERRORS = Counter("llm_errors_total", "Failed or skipped LLM provider attempts", ["provider", "reason"])
+LLM_FALLBACKS = Counter("llm_fallbacks_total", "LLM attempts made on a fallback provider", ["provider"])
+LLM_CIRCUIT_OPEN = Gauge("llm_circuit_open", "1 while a provider's circuit breaker is open", ["provider"])
+
+
+class NotConfigured(RuntimeError):
+    """No enabled provider is configured."""
+
+
+class CircuitOpen(RuntimeError):
+    """Every configured provider is failing and being skipped."""
+
+
+class _Breaker:
+    def __init__(self, name: str):
+        self.name = name
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.trial or time.monotonic() - self.opened_at < LLM_BREAKER_RESET_SECONDS:
+            return False
+        self.trial = True  # half-open: this call decides
+        return True
+
+    def record(self, ok: bool) -> None:
+        self.trial = False
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+            LLM_CIRCUIT_OPEN.labels(provider=self.name).set(0)
+            return
+        self.failures += 1
+        if self.opened_at is not None or self.failures >= LLM_BREAKER_FAILURES:
+            if self.opened_at is None:
+                log.warning(f"LLM provider {self.name} failed {self.failures} times in a row; opening its circuit")
+            self.opened_at = time.monotonic()
+            LLM_CIRCUIT_OPEN.labels(provider=self.name).set(1)
+
+    def release(self) -> None:
+        """The call was cancelled by its caller; it says nothing about the provider."""
+        self.trial = False
+
+
+_providers: Dict[str, object] = {}
+_breakers: Dict[str, _Breaker] = {}
+
+
+def register(provider) -> None:
+    _providers[provider.name] = provider
+    _breakers[provider.name] = _Breaker(provider.name)
+
+
+def reset() -> None:
+    """Close every circuit (tests, or after fixing credentials)."""
+    for name in _breakers:
+        _breakers[name] = _Breaker(name)
+        LLM_CIRCUIT_OPEN.labels(provider=name).set(0)
+
+
+def providers_for(prefer: str) -> List[object]:
+    """The configured providers to try, ``prefer`` first."""
+    names = [prefer] if prefer in LLM_PROVIDERS else []
+    if LLM_FALLBACK or not names:
+        names += [name for name in LLM_PROVIDERS if name != prefer]
+    return [_providers[name] for name in names if name in _providers and _providers[name].available()]
+
+
+async def complete(prompt: str, prefer: str, served_by: Optional[Callable[[str], None]] = None) -> str:
+    """The answer of the first provider to reply in time; the last error if none does.
+
+    ``served_by`` is called with the name of the provider that answered.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + LLM_DEADLINE_SECONDS
+    error = None
+    for attempt, provider in enumerate(_attempts(prefer)):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        if attempt:
+            LLM_FALLBACKS.labels(provider=provider.name).inc()
+        breaker = _breakers[provider.name]
+        start = time.perf_counter()
+        outcome = "cancelled"
+        try:
+            result = await asyncio.wait_for(provider.complete(prompt), min(LLM_TIMEOUT_SECONDS, remaining))
+            outcome = "ok"
+            if served_by:
+                served_by(provider.name)
+            return result
+        except asyncio.TimeoutError as exc:
+            outcome, error = "timeout", exc
+        except Exception as exc:  # noqa: BLE001 - any failure moves on to the next provider
+            outcome, error = "error", exc
+        finally:
+            _finish(provider.name, breaker, outcome, start, error)
+    raise error or CircuitOpen("No LLM provider is available: circuits are open or the deadline passed")
+
+
+async def stream(prompt: str, prefer: str, served_by: Optional[Callable[[str], None]] = None) -> AsyncIterator[str]:
+    """Pieces of the answer from the first provider to start in time.
+
+    Providers are only switched before anything has been yielded; a failure
+    mid-answer is raised to the caller. ``served_by`` is called with the
+    name of the provider once it starts answering.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + LLM_DEADLINE_SECONDS
+    error = None
+    for attempt, provider in enumerate(_attempts(prefer)):
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        if attempt:
+            LLM_FALLBACKS.labels(provider=provider.name).inc()
+        breaker = _breakers[provider.name]
+        start = time.perf_counter()
+        outcome = "cancelled"
+        chunks = provider.stream(prompt).__aiter__()
+        try:
+            try:
+                first = await asyncio.wait_for(chunks.__anext__(), min(LLM_TIMEOUT_SECONDS, remaining))
+            except StopAsyncIteration:
+                outcome = "ok"
+                return
+            except asyncio.TimeoutError as exc:
+                outcome, error = "timeout", exc
+                continue
+            except Exception as exc:  # noqa: BLE001 - nothing sent yet, so try the next provider
+                outcome, error = "error", exc
+                continue
+            LLM_FIRST_TOKEN_SECONDS.labels(provider=provider.name).observe(time.perf_counter() - start)
+            if served_by:
+                served_by(provider.name)
+            try:
+                yield first
+                async for chunk in chunks:
+                    yield chunk
+            except (asyncio.CancelledError, GeneratorExit):
+                raise
+            except Exception as exc:
+                outcome, error = "error", exc
+                raise
+            outcome = "ok"
+            return
+        finally:
+            await chunks.aclose()
+            _finish(provider.name, breaker, outcome, start, error)
+    raise error or CircuitOpen("No LLM provider is available: circuits are open or the deadline passed")
+
+
+def _attempts(prefer: str):
+    candidates = providers_for(prefer)
+    if not candidates:
+        raise NotConfigured(f"No LLM provider is configured (LLM_PROVIDERS={','.join(LLM_PROVIDERS)})")
+    for provider in candidates:
+        if _breakers[provider.name].allow():
+            yield provider
+        else:
+            LLM_ERRORS.labels(provider=provider.name, reason="circuit_open").inc()
+
+
+def _finish(name: str, breaker: _Breaker, outcome: str, start: float, error: Optional[BaseException]) -> None:
+    LLM_CALL_SECONDS.labels(provider=name, outcome=outcome).observe(time.perf_counter() - start)
+    if outcome == "cancelled":
+        breaker.release()
+        return
+    breaker.record(outcome == "ok")
+    if outcome != "ok":
+        LLM_ERRORS.labels(provider=name, reason=outcome).inc()
+        log.warning(f"LLM provider {name} failed ({outcome}): {error!r}")
+
+
+_WORDS = re.compile(r"\S+")
+
+
+class StubProvider:
+    """Deterministic offline answers: the words of the prompt's last paragraph, capped."""
+    name = "stub"
+    max_words = 40
+
+    def available(self) -> bool:
+        return True
+
+    async def complete(self, prompt: str) -> str:
+        return "".join([piece async for piece in self.stream(prompt)])
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        words = _WORDS.findall(prompt.strip().split("\n\n")[-1])[: self.max_words]
+        for n, word in enumerate(["[stub]"] + words):
+            yield word if n == 0 else f" {word}"
+
+
+register(StubProvider())
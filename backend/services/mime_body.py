@@ -0,0 +1,143 @@
+"""Bounded text extraction from Gmail message payloads.
+
+Walks the MIME part tree iteratively (no recursion limit on deep nesting),
+skips attachment and binary parts while recording their metadata, and
+base64-decodes only as much of each text part as the per-part and
+per-message caps can use, so a multi-megabyte inline part costs no more
+than the cap. HTML-only messages get a cheap regex HTML-to-text rendition
+for analysis and search.
+"""
+import base64
+import binascii
+import html
+import os
+import re
+from typing import List, NamedTuple, Optional
+
+# Caps on decoded characters; longer text is cut and flagged as truncated.
+BODY_PART_MAX_CHARS = int(os.getenv("BODY_PART_MAX_CHARS", "100000"))
+BODY_MAX_CHARS = int(os.getenv("BODY_MAX_CHARS", "200000"))
+# Bound on parts visited, against pathological or malicious part trees.
+MAX_MIME_PARTS = int(os.getenv("MAX_MIME_PARTS", "2000"))
+
+_CHARSET_RE = re.compile(r'charset="?([\w.:-]+)"?', re.IGNORECASE)
+_DROP_BLOCKS_RE = re.compile(r"<(script|style|head)\b.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_COMMENT_RE = re.compile(r"<!--.*?-->", re.DOTALL)
+_BREAK_RE = re.compile(r"<(br|/p|/div|/li|/tr|/h[1-6]|/blockquote)\b[^>]*>", re.IGNORECASE)
+_TAG_RE = re.compile(r"<[^>]+>")
+_SPACES_RE = re.compile(r"[ \t\r\f\v ]+")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n\s*\n+")
+
+
+class ExtractedBody(NamedTuple):
+    text: str
+    html: str
+    attachments: List[dict]
+    truncated: bool
+
+    @property
+    def has_attachments(self) -> bool:
+        return bool(self.attachments)
+
+    def analysis_text(self) -> str:
+        """Plain text when the message has it, otherwise the HTML rendered to text."""
+        return self.text or html_to_text(self.html)
+
+
+def extract_body(
+    payload: Optional[dict],
+    part_max_chars: int = BODY_PART_MAX_CHARS,
+    max_chars: int = BODY_MAX_CHARS,
+) -> ExtractedBody:
+    """Collect text/plain and text/html parts of ``payload`` in document order."""
+    if not payload:
+        return ExtractedBody("", "", [], False)
+    plain: List[str] = []
+    rich: List[str] = []
+    attachments: List[dict] = []
+    budget = {"text/plain": max_chars, "text/html": max_chars}
+    truncated = False
+    stack = [payload]
+    visited = 0
+    while stack and visited < MAX_MIME_PARTS:
+        part = stack.pop()
+        visited += 1
+        children = part.get("parts")
+        if children:
+            stack.extend(reversed(children))
+            continue
+        mime_type = (part.get("mimeType") or "").lower()
+        body = part.get("body") or {}
+        if _is_attachment(part, mime_type):
+            attachments.append({
+                "filename": part.get("filename") or "",
+                "mime_type": mime_type,
+                "size": body.get("size", 0),
+                "attachment_id": body.get("attachmentId"),
+            })
+            continue
+        data = body.get("data")
+        if not data:
+            continue
+        kind = "text/html" if mime_type.startswith("text/html") else "text/plain"
+        limit = min(part_max_chars, budget[kind])
+        if limit <= 0:
+            truncated = True
+            continue
+        text, cut = _decode(data, limit, _charset(part))
+        truncated = truncated or cut
+        budget[kind] -= len(text)
+        (rich if kind == "text/html" else plain).append(text)
+    if stack:
+        truncated = True
+    return ExtractedBody("\n".join(plain), "\n".join(rich), attachments, truncated)
+
+
+def html_to_text(markup: str) -> str:
+    """Strip tags with a few regexes; good enough for classification and snippets."""
+    if not markup:
+        return ""
+    text = _DROP_BLOCKS_RE.sub(" ", markup)
+    text = _COMMENT_RE.sub(" ", text)
+    text = _BREAK_RE.sub("\n", text)
+    text = html.unescape(_TAG_RE.sub(" ", text))
+    text = _SPACES_RE.sub(" ", text)
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+def _is_attachment(part: dict, mime_type: str) -> bool:
+    if part.get("filename") or (part.get("body") or {}).get("attachmentId"):
+        return True
+    disposition = _header(part, "Content-Disposition") or ""
+    if disposition.lower().startswith("attachment"):
+        return True
+    # Anything that is not text (images, application/*, audio...) is binary.
+    return bool(mime_type) and not mime_type.startswith("text/")
+
+
+def _decode(data: str, limit: int, charset: str):
+    """Decode at most ``limit`` characters of base64url ``data``; returns (text, truncated)."""
+    # UTF-8 needs at most 4 bytes per character and base64 4 chars per 3 bytes.
+    prefix_len = -(-limit * 4 // 3) * 4
+    chunk = data[:prefix_len]
+    try:
+        raw = base64.urlsafe_b64decode(chunk + "=" * (-len(chunk) % 4))
+    except (binascii.Error, ValueError):
+        return "", False
+    try:
+        text = raw.decode(charset, errors="ignore")
+    except LookupError:
+        text = raw.decode("utf-8", errors="ignore")
+    cut = len(data) > prefix_len or len(text) > limit
+    return text[:limit], cut
+
+
+def _charset(part: dict) -> str:
+    match = _CHARSET_RE.search(_header(part, "Content-Type") or "")
+    return match.group(1) if match else "utf-8"
+
+
+def _header(part: dict, name: str) -> Optional[str]:
+    lowered = name.lower()
+    return next((h.get("value") for h in part.get("headers") or [] if h.get("name", "").lower() == lowered), None)
@@ -0,0 +1,55 @@
+"""Opaque keyset cursors for newest-first list endpoints.
+
+A cursor encodes the ``(sort value, id)`` of the last row on a page. The next
+page is fetched with a row-value ``WHERE (sort, id) < (:v, :id)`` instead of
+``OFFSET``, which both SQLite and PostgreSQL turn into an index range seek, so
+deep pages cost the same as the first one. NULL sort values sort last.
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from sqlalchemy import tuple_
+from sqlmodel import col, or_
+
+
+def encode_cursor(sort_value: Optional[datetime], row_id: int) -> str:
+    payload = {"v": sort_value.isoformat() if sort_value else None, "id": row_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], int]:
+    """Decode a cursor produced by ``encode_cursor``; raises ValueError if malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        value = datetime.fromisoformat(payload["v"]) if payload["v"] is not None else None
+        return value, int(payload["id"])
+    except (ValueError, TypeError, KeyError, json.JSONDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+
+def order_newest_first(stmt, sort_column, id_column):
+    return stmt.order_by(col(sort_column).desc().nulls_last(), col(id_column).desc())
+
+
+def apply_cursor(stmt, sort_column, id_column, cursor: str):
+    """Restrict ``stmt`` to rows after ``cursor`` in newest-first order."""
+    value, last_id = decode_cursor(cursor)
+    sort_column, id_column = col(sort_column), col(id_column)
+    if value is None:
+        return stmt.where(sort_column.is_(None), id_column < last_id)
+    after = tuple_(sort_column, id_column) < tuple_(value, last_id)
+    if sort_column.expression.nullable:
+        after = or_(after, sort_column.is_(None))
+    return stmt.where(after)
+
+
+def next_cursor(records: Sequence, limit: int, sort_attr: str) -> Optional[str]:
+    """Cursor for the page after ``records``, or None when this page was the last."""
+    if not records or len(records) < limit:
+        return None
+    last = records[-1]
+    return encode_cursor(getattr(last, sort_attr), last.id)
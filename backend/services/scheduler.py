@@ -1,17 +1,178 @@
 import logging
+import os
+import random
 import threading
-from typing import Optional
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional, Set
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
+from googleapiclient.errors import HttpError
+from prometheus_client import Counter, Gauge, Histogram
 
+from services import leases
 from services.account_service import list_accounts
-from services.email_store import upsert_emails
-from services.gmail_service import authenticate_gmail, fetch_emails
+from services.gmail_clients import get_gmail_service
+from services.sync_service import sync_account
 
 log = logging.getLogger(__name__)
 
+# Account syncs run on their own bounded pool; APScheduler jobs only enqueue them.
+SYNC_WORKERS = max(1, int(os.getenv("SYNC_WORKERS", "8")))
+# Each run fires up to this many seconds late, on top of a random phase per account,
+# so accounts sharing an interval do not all hit Gmail on the same boundary.
+SYNC_JITTER_SECONDS = int(os.getenv("SYNC_JITTER_SECONDS", "60"))
+# Failed syncs retry after base * 2^(failures-1) seconds (+-20%), capped; quota errors start higher.
+SYNC_BACKOFF_BASE_SECONDS = float(os.getenv("SYNC_BACKOFF_BASE_SECONDS", "60"))
+SYNC_QUOTA_BACKOFF_SECONDS = float(os.getenv("SYNC_QUOTA_BACKOFF_SECONDS", "300"))
+SYNC_BACKOFF_MAX_SECONDS = float(os.getenv("SYNC_BACKOFF_MAX_SECONDS", "3600"))
+# "local" syncs every account in every process; "lease" shares accounts between
+# replicas through database leases (see services.leases) so each is synced once.
+SCHEDULER_MODE = os.getenv("SCHEDULER_MODE", "local").lower()
+SCHEDULER_HEARTBEAT_SECONDS = int(os.getenv("SCHEDULER_HEARTBEAT_SECONDS", "30"))
+
+SYNC_QUEUE_DEPTH = Gauge("account_sync_queue_depth", "Account syncs waiting for a worker")
+SYNC_RUNNING = Gauge("account_sync_running", "Account syncs in progress")
+SYNC_RUNS = Counter(
+    "account_sync_runs_total", "Account sync attempts by outcome", ["outcome"]
+)
+SYNC_DURATION = Histogram(
+    "account_sync_duration_seconds", "Wall time of one account sync", ["mode"],
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+SYNC_LAST_DURATION = Gauge(
+    "account_sync_last_duration_seconds", "Wall time of the latest sync per account", ["account_id"]
+)
+SYNC_LAG = Gauge(
+    "account_sync_lag_seconds", "Seconds the latest sync waited between being due and starting", ["account_id"]
+)
+SYNC_LAST_SUCCESS = Gauge(
+    "account_sync_last_success_timestamp_seconds", "Unix time of the latest successful sync", ["account_id"]
+)
+
+_QUOTA_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded", "dailyLimitExceeded")
+
+
+def is_quota_error(exc: Exception) -> bool:
+    if not isinstance(exc, HttpError):
+        return False
+    if exc.resp.status == 429:
+        return True
+    return exc.resp.status == 403 and any(reason in str(exc.content) for reason in _QUOTA_REASONS)
+
+
+class SyncCoordinator:
+    """Runs account syncs on a bounded pool with per-account exclusion and backoff.
+
+    ``submit`` is cheap and non-blocking: an account that is already queued or
+    running is skipped, as is one still backing off from a failure. Failures
+    set a jittered exponential backoff and hand the retry delay to
+    ``schedule_retry``.
+    """
+
+    def __init__(
+        self,
+        sync: Callable[[int], dict],
+        workers: int = SYNC_WORKERS,
+        schedule_retry: Optional[Callable[[int, float], None]] = None,
+    ):
+        self._sync = sync
+        self._schedule_retry = schedule_retry
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="account-sync")
+        self._lock = threading.Lock()
+        self._queued: Set[int] = set()
+        self._running: Set[int] = set()
+        self._failures: Dict[int, int] = {}
+        self._not_before: Dict[int, float] = {}
+
+    def submit(self, account_id: int, force: bool = False) -> Optional[Future]:
+        """Queue a sync; ``force`` ignores backoff (but never overlaps a run)."""
+        now = time.time()
+        with self._lock:
+            if account_id in self._queued or account_id in self._running:
+                SYNC_RUNS.labels(outcome="skipped_running").inc()
+                return None
+            if not force and self._not_before.get(account_id, 0) > now:
+                SYNC_RUNS.labels(outcome="skipped_backoff").inc()
+                return None
+            self._queued.add(account_id)
+        SYNC_QUEUE_DEPTH.inc()
+        future = self._pool.submit(self._run, account_id, now)
+        future.add_done_callback(lambda done: self._dequeue_cancelled(account_id, done))
+        return future
+
+    def busy(self, account_id: int) -> bool:
+        with self._lock:
+            return account_id in self._queued or account_id in self._running
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._queued)
+
+    def backoff_until(self, account_id: int) -> Optional[float]:
+        with self._lock:
+            return self._not_before.get(account_id)
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _dequeue_cancelled(self, account_id: int, future: Future) -> None:
+        # A cancelled sync never reaches _run, so it leaves the queue here.
+        if not future.cancelled():
+            return
+        with self._lock:
+            self._queued.discard(account_id)
+        SYNC_QUEUE_DEPTH.dec()
+
+    def _run(self, account_id: int, due_at: float) -> Optional[dict]:
+        with self._lock:
+            self._queued.discard(account_id)
+            self._running.add(account_id)
+        SYNC_QUEUE_DEPTH.dec()
+        SYNC_RUNNING.inc()
+        label = str(account_id)
+        started = time.time()
+        SYNC_LAG.labels(account_id=label).set(started - due_at)
+        mode = "error"
+        try:
+            result = self._sync(account_id)
+            mode = result.get("mode", "unknown") if isinstance(result, dict) else "unknown"
+            with self._lock:
+                self._failures.pop(account_id, None)
+                self._not_before.pop(account_id, None)
+            SYNC_RUNS.labels(outcome="success").inc()
+            SYNC_LAST_SUCCESS.labels(account_id=label).set(time.time())
+            return result
+        except Exception as exc:  # noqa: BLE001 - any failure backs the account off
+            self._back_off(account_id, exc)
+            return None
+        finally:
+            elapsed = time.time() - started
+            SYNC_DURATION.labels(mode=mode).observe(elapsed)
+            SYNC_LAST_DURATION.labels(account_id=label).set(elapsed)
+            with self._lock:
+                self._running.discard(account_id)
+            SYNC_RUNNING.dec()
+
+    def _back_off(self, account_id: int, exc: Exception) -> None:
+        quota = is_quota_error(exc)
+        with self._lock:
+            failures = self._failures.get(account_id, 0) + 1
+            self._failures[account_id] = failures
+            base = SYNC_QUOTA_BACKOFF_SECONDS if quota else SYNC_BACKOFF_BASE_SECONDS
+            delay = min(SYNC_BACKOFF_MAX_SECONDS, base * 2 ** (failures - 1)) * random.uniform(0.8, 1.2)
+            self._not_before[account_id] = time.time() + delay
+        SYNC_RUNS.labels(outcome="quota_error" if quota else "error").inc()
+        log.error(f"Sync failed for account {account_id} (attempt {failures}); retrying in {delay:.0f}s: {exc}")
+        if self._schedule_retry:
+            self._schedule_retry(account_id, delay)
+
+
 _scheduler: Optional[BackgroundScheduler] = None
+_coordinator: Optional[SyncCoordinator] = None
+_account_leases: Optional[leases.AccountLeases] = None
 _scheduler_lock = threading.Lock()
 
 
@@ -22,36 +183,111 @@ def get_scheduler() -> BackgroundScheduler:
         with _scheduler_lock:
             # Double-check after acquiring lock
             if _scheduler is None:
-                _scheduler = BackgroundScheduler()
+                # Jobs only enqueue work, so a missed or piled-up run is coalesced into one.
+                _scheduler = BackgroundScheduler(
+                    job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": 300}
+                )
                 _scheduler.start()
                 log.info("Scheduler started")
+                if SCHEDULER_MODE == "lease":
+                    _scheduler.add_job(
+                        _heartbeat,
+                        trigger=IntervalTrigger(seconds=SCHEDULER_HEARTBEAT_SECONDS),
+                        id="scheduler_heartbeat",
+                        next_run_time=datetime.now(),
+                        replace_existing=True,
+                    )
+                    log.info(f"Lease scheduling enabled as replica {leases.REPLICA_ID}")
     return _scheduler
 
 
-def fetch_emails_for_account(account_id: int, account_email: str):
-    """
-    Background task to fetch emails for a specific account.
-    
-    Note: Currently uses default Gmail authentication. In production, this should:
-    1. Retrieve account-specific OAuth tokens from the database
-    2. Use those tokens to authenticate with Gmail API
-    3. Handle token refresh if expired
-    """
+def get_coordinator() -> SyncCoordinator:
+    global _coordinator
+    if _coordinator is None:
+        with _scheduler_lock:
+            if _coordinator is None:
+                _coordinator = SyncCoordinator(_sync_account, schedule_retry=_schedule_retry)
+    return _coordinator
+
+
+def get_account_leases() -> leases.AccountLeases:
+    global _account_leases
+    if _account_leases is None:
+        with _scheduler_lock:
+            if _account_leases is None:
+                _account_leases = leases.AccountLeases()
+    return _account_leases
+
+
+def _heartbeat() -> None:
     try:
-        log.info(f"Fetching emails for account {account_email} (ID: {account_id})")
-        # TODO: Implement account-specific authentication
-        # For now, use the default authentication (requires improvement)
-        service = authenticate_gmail()
-        emails = fetch_emails(service)
-        
-        # Add account_id to each email
-        for email in emails:
-            email['account_id'] = account_id
-        
-        records = upsert_emails(emails)
-        log.info(f"Fetched and stored {len(records)} emails for account {account_email}")
-    except Exception as e:
-        log.error(f"Error fetching emails for account {account_email}: {e}")
+        total = sum(1 for account in list_accounts(active_only=True) if account.fetch_enabled)
+        get_account_leases().heartbeat(total, busy=get_coordinator().busy)
+    except Exception as exc:  # noqa: BLE001 - the next heartbeat retries
+        log.error(f"Scheduler heartbeat failed: {exc}")
+
+
+def _owns_account(account_id: int) -> bool:
+    """In lease mode, whether this replica should sync the account now."""
+    if SCHEDULER_MODE != "lease":
+        return True
+    try:
+        owned = get_account_leases().claim(account_id)
+    except Exception as exc:  # noqa: BLE001 - without a lease, leave the account to others
+        log.error(f"Could not claim account {account_id}: {exc}")
+        owned = False
+    if not owned:
+        SYNC_RUNS.labels(outcome="skipped_lease").inc()
+    return owned
+
+
+def _sync_account(account_id: int) -> dict:
+    # Accounts without stored OAuth tokens fall back to the default token.json login.
+    service = get_gmail_service(account_id)
+    result = sync_account(service, account_id)
+    log.info(
+        f"{result['mode'].capitalize()} sync for account {account_id}: "
+        f"{result['added']} added, {result['deleted']} deleted, {result['updated']} relabeled"
+    )
+    return result
+
+
+def _schedule_retry(account_id: int, delay: float) -> None:
+    get_scheduler().add_job(
+        _retry_account,
+        trigger="date",
+        run_date=datetime.now() + timedelta(seconds=delay),
+        args=[account_id],
+        id=f"retry_account_{account_id}",
+        replace_existing=True,
+    )
+
+
+def _retry_account(account_id: int) -> None:
+    if _owns_account(account_id):
+        get_coordinator().submit(account_id, force=True)
+
+
+def fetch_emails_for_account(account_id: int, account_email: Optional[str] = None):
+    """Scheduled job: queue a sync for the account on the coordinator's worker pool.
+
+    The sync itself (see sync_service.sync_account) runs later on a worker;
+    an account whose previous run is still going, or that is backing off
+    after a failure, is skipped. In lease mode every replica schedules every
+    account, and only the replica holding the account's lease queues it.
+    """
+    if not _owns_account(account_id):
+        return
+    if get_coordinator().submit(account_id) is not None:
+        log.info(f"Queued email sync for account {account_email or account_id}")
+
+
+def _interval_trigger(interval_minutes: int) -> IntervalTrigger:
+    # A random phase within the interval spreads accounts over time instead of
+    # firing them all on the same boundary; jitter keeps them from re-aligning.
+    interval = timedelta(minutes=interval_minutes)
+    start = datetime.now() + interval * random.random()
+    return IntervalTrigger(minutes=interval_minutes, start_date=start, jitter=SYNC_JITTER_SECONDS)
 
 
 def schedule_account_fetches():
@@ -72,7 +308,7 @@ def schedule_account_fetches():
         # Schedule new job
         scheduler.add_job(
             fetch_emails_for_account,
-            trigger=IntervalTrigger(minutes=account.fetch_interval_minutes),
+            trigger=_interval_trigger(account.fetch_interval_minutes),
             args=[account.id, account.email],
             id=job_id,
             replace_existing=True,
@@ -92,7 +328,7 @@ def add_account_schedule(account_id: int, account_email: str, interval_minutes:
     # Add new job
     scheduler.add_job(
         fetch_emails_for_account,
-        trigger=IntervalTrigger(minutes=interval_minutes),
+        trigger=_interval_trigger(interval_minutes),
         args=[account_id, account_email],
         id=job_id,
         replace_existing=True,
@@ -108,12 +344,24 @@ def remove_account_schedule(account_id: int):
     if scheduler.get_job(job_id):
         scheduler.remove_job(job_id)
         log.info(f"Removed email fetch schedule for account {account_id}")
+    if scheduler.get_job(f"retry_account_{account_id}"):
+        scheduler.remove_job(f"retry_account_{account_id}")
 
 
 def shutdown_scheduler():
     """Shutdown the scheduler."""
-    global _scheduler
+    global _scheduler, _coordinator, _account_leases
     if _scheduler:
         _scheduler.shutdown()
         _scheduler = None
         log.info("Scheduler shutdown")
+    if _coordinator:
+        _coordinator.shutdown()
+        _coordinator = None
+    if _account_leases:
+        # Hand accounts over now rather than after the leases expire.
+        try:
+            _account_leases.release_all()
+        except Exception as exc:  # noqa: BLE001
+            log.error(f"Could not release scheduler leases: {exc}")
+        _account_leases = None
@@ -0,0 +1,342 @@
+"""Full-text search backends for ``email_store.search_emails``.
+
+The backend is picked by ``SEARCH_BACKEND``:
+
+- ``auto`` (default): SQLite FTS5 on SQLite, ``tsvector`` + GIN on PostgreSQL,
+  otherwise the in-process inverted index.
+- ``fts5`` / ``postgres`` / ``memory``: force a specific backend.
+- ``like``: the original ``ILIKE '%q%'`` scan over subject, body and snippet.
+
+Each backend narrows a ``select(EmailRecord)`` to matching rows and orders
+them by relevance; structured filters are applied by the caller as before.
+"""
+import bisect
+import logging
+import math
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Union
+
+from sqlalchemy import Row, column, false, func, inspect, literal_column, table, text
+from sqlmodel import col, or_, select
+
+from db import engine, get_session
+from models.email import EmailRecord
+
+log = logging.getLogger(__name__)
+
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "auto").lower()
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def escape_like_pattern(pattern: str) -> str:
+    """Escape SQL LIKE wildcards in user input to prevent wildcard injection."""
+    return pattern.replace("%", "\\%").replace("_", "\\_")
+
+
+def tokenize(text_value: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall((text_value or "").lower())
+
+
+class SearchBackend(ABC):
+    """Base backend: narrow and rank in SQL, then page with OFFSET/LIMIT."""
+
+    name = "base"
+
+    def setup(self) -> None:
+        """Create or refresh the index; must be safe to call again on an indexed database."""
+
+    def index_records(self, records: Iterable[EmailRecord]) -> None:
+        pass
+
+    @abstractmethod
+    def apply(self, stmt, query: str):
+        """``stmt`` narrowed (and ranked, where the backend can) to rows matching ``query``."""
+
+    def search(self, session, stmt, query: str, limit: int, offset: int) -> List[Union[EmailRecord, Row]]:
+        stmt = self.apply(stmt, query).order_by(EmailRecord.created_at.desc())
+        return list(session.exec(stmt.offset(offset).limit(limit)))
+
+
+class LikeSearchBackend(SearchBackend):
+    """Substring scan; needs no index and matches the legacy behaviour."""
+
+    name = "like"
+
+    def apply(self, stmt, query: str):
+        search_pattern = f"%{escape_like_pattern(query)}%"
+        return stmt.where(
+            or_(
+                col(EmailRecord.subject).ilike(search_pattern, escape="\\"),
+                col(EmailRecord.body_text).ilike(search_pattern, escape="\\"),
+                col(EmailRecord.snippet).ilike(search_pattern, escape="\\"),
+            )
+        )
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """External-content FTS5 table kept in sync with ``emailrecord`` by triggers."""
+
+    name = "fts5"  # triggers keep the index current, so index_records is a no-op
+    _fts = table("emailrecord_fts", column("rowid"))
+
+    _DDL = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS emailrecord_fts USING fts5(
+            subject, snippet, body_text,
+            content='emailrecord', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS emailrecord_fts_ai AFTER INSERT ON emailrecord BEGIN
+            INSERT INTO emailrecord_fts(rowid, subject, snippet, body_text)
+            VALUES (new.id, new.subject, new.snippet, new.body_text);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS emailrecord_fts_ad AFTER DELETE ON emailrecord BEGIN
+            INSERT INTO emailrecord_fts(emailrecord_fts, rowid, subject, snippet, body_text)
+            VALUES ('delete', old.id, old.subject, old.snippet, old.body_text);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS emailrecord_fts_au
+        AFTER UPDATE OF subject, snippet, body_text ON emailrecord BEGIN
+            INSERT INTO emailrecord_fts(emailrecord_fts, rowid, subject, snippet, body_text)
+            VALUES ('delete', old.id, old.subject, old.snippet, old.body_text);
+            INSERT INTO emailrecord_fts(rowid, subject, snippet, body_text)
+            VALUES (new.id, new.subject, new.snippet, new.body_text);
+        END
+        """,
+    ]
+
+    def setup(self) -> None:
+        with engine.begin() as conn:
+            existed = inspect(conn).has_table("emailrecord_fts")
+            for ddl in self._DDL:
+                conn.exec_driver_sql(ddl)
+            if not existed:
+                # Index rows written before the FTS table existed.
+                conn.exec_driver_sql("INSERT INTO emailrecord_fts(emailrecord_fts) VALUES ('rebuild')")
+                log.info("Built FTS5 index for emailrecord")
+
+    def apply(self, stmt, query: str):
+        terms = tokenize(query)
+        if not terms:
+            return LikeSearchBackend().apply(stmt, query)
+        # Quote every term so user input is never parsed as FTS5 syntax.
+        match_expr = " AND ".join(f'"{term}"*' for term in terms)
+        rank = func.bm25(literal_column("emailrecord_fts"), 10.0, 2.0, 1.0)
+        return (
+            stmt.join(self._fts, self._fts.c.rowid == EmailRecord.id)
+            .where(text("emailrecord_fts MATCH :fts_query").bindparams(fts_query=match_expr))
+            .order_by(rank)
+        )
+
+
+class PostgresFTSBackend(SearchBackend):
+    """``to_tsvector`` expression over subject/snippet/body with a GIN index."""
+
+    name = "postgres"  # the expression index is maintained by PostgreSQL
+    _DOCUMENT = (
+        "coalesce(emailrecord.subject, '') || ' ' || "
+        "coalesce(emailrecord.snippet, '') || ' ' || "
+        "coalesce(emailrecord.body_text, '')"
+    )
+
+    def setup(self) -> None:
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "CREATE INDEX IF NOT EXISTS ix_emailrecord_search ON emailrecord "
+                f"USING GIN (to_tsvector('english', {self._DOCUMENT}))"
+            )
+
+    def apply(self, stmt, query: str):
+        vector = f"to_tsvector('english', {self._DOCUMENT})"
+        ts_query = "websearch_to_tsquery('english', :pg_query)"
+        return stmt.where(text(f"{vector} @@ {ts_query}").bindparams(pg_query=query)).order_by(
+            text(f"ts_rank({vector}, {ts_query}) DESC").bindparams(pg_query=query)
+        )
+
+
+class InvertedIndexBackend(SearchBackend):
+    """In-process term -> {email id: term frequency} index with TF-IDF ranking.
+
+    Built from the database on first use and updated from ``upsert_emails``;
+    each worker process keeps its own copy.
+    """
+
+    name = "memory"
+
+    def __init__(self) -> None:
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._doc_terms: Dict[int, Set[str]] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+        self._lock = threading.Lock()
+
+    def setup(self) -> None:
+        stmt = select(EmailRecord.id, EmailRecord.subject, EmailRecord.snippet, EmailRecord.body_text)
+        with get_session() as session:
+            with self._lock:
+                # Rebuilt from scratch, so rows from a previous database do not linger.
+                self._postings.clear()
+                self._doc_terms.clear()
+                self._vocabulary_dirty = True
+                for row in session.exec(stmt.execution_options(yield_per=1000)):
+                    self._add(row[0], row[1], row[2], row[3])
+        log.info("Built in-memory search index with %d emails", len(self._doc_terms))
+
+    def index_records(self, records: Iterable[EmailRecord]) -> None:
+        with self._lock:
+            for rec in records:
+                if rec.id is not None:
+                    self._add(rec.id, rec.subject, rec.snippet, rec.body_text)
+
+    def _add(self, doc_id: int, *fields: Optional[str]) -> None:
+        for term in self._doc_terms.pop(doc_id, ()):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+                    self._vocabulary_dirty = True
+        terms: Dict[str, int] = defaultdict(int)
+        for value in fields:
+            for term in tokenize(value):
+                terms[term] += 1
+        for term, count in terms.items():
+            if term not in self._postings:
+                self._vocabulary_dirty = True
+            self._postings[term][doc_id] = count
+        self._doc_terms[doc_id] = set(terms)
+
+    def _expand(self, prefix: str) -> List[str]:
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        end = bisect.bisect_left(self._vocabulary, prefix + "\uffff")
+        return self._vocabulary[start:end]
+
+    def score(self, query: str) -> Dict[int, float]:
+        terms = tokenize(query)
+        if not terms:
+            return {}
+        scores: Optional[Dict[int, float]] = None
+        with self._lock:
+            total_docs = max(len(self._doc_terms), 1)
+            for term in terms:
+                term_scores: Dict[int, float] = defaultdict(float)
+                for expanded in self._expand(term):
+                    postings = self._postings[expanded]
+                    idf = math.log(1 + total_docs / len(postings))
+                    for doc_id, freq in postings.items():
+                        term_scores[doc_id] += (1 + math.log(freq)) * idf
+                if scores is None:
+                    scores = dict(term_scores)
+                else:
+                    scores = {doc_id: s + term_scores[doc_id] for doc_id, s in scores.items() if doc_id in term_scores}
+                if not scores:
+                    return {}
+        return scores or {}
+
+    # Ranked ids are resolved against the SQL filters this many at a time.
+    RESOLVE_CHUNK_SIZE = 500
+
+    def apply(self, stmt, query: str):
+        if not tokenize(query):
+            return LikeSearchBackend().apply(stmt, query)
+        scores = self.score(query)
+        if not scores:
+            return stmt.where(false())
+        return stmt.where(col(EmailRecord.id).in_(list(scores)))
+
+    def search(self, session, stmt, query: str, limit: int, offset: int) -> List[Union[EmailRecord, Row]]:
+        """Rank in Python, then walk ranked ids until the requested page is filled."""
+        if not tokenize(query):
+            return super().search(session, stmt, query, limit, offset)
+        scores = self.score(query)
+        ranked = sorted(scores, key=lambda doc_id: (-scores[doc_id], -doc_id))
+        wanted = offset + limit
+        found: List[Union[EmailRecord, Row]] = []
+        for start in range(0, len(ranked), self.RESOLVE_CHUNK_SIZE):
+            chunk = ranked[start:start + self.RESOLVE_CHUNK_SIZE]
+            rows = {rec.id: rec for rec in session.exec(stmt.where(col(EmailRecord.id).in_(chunk)))}
+            found.extend(rows[doc_id] for doc_id in chunk if doc_id in rows)
+            if len(found) >= wanted:
+                break
+        return found[offset:wanted]
+
+
+_BACKENDS = {
+    "like": LikeSearchBackend,
+    "fts5": SQLiteFTSBackend,
+    "postgres": PostgresFTSBackend,
+    "memory": InvertedIndexBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _sqlite_has_fts5() -> bool:
+    try:
+        with engine.connect() as conn:
+            return bool(conn.exec_driver_sql("SELECT sqlite_compileoption_used('ENABLE_FTS5')").scalar())
+    except Exception:
+        return False
+
+
+def _resolve_backend_name(name: str) -> str:
+    if name != "auto":
+        return name
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        return "fts5" if _sqlite_has_fts5() else "memory"
+    if dialect == "postgresql":
+        return "postgres"
+    return "memory"
+
+
+def get_search_backend():
+    """Return the configured backend, creating its index on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                name = _resolve_backend_name(SEARCH_BACKEND)
+                if name not in _BACKENDS:
+                    raise ValueError(f"Unknown SEARCH_BACKEND: {name}")
+                backend = _BACKENDS[name]()
+                backend.setup()
+                log.info("Search backend: %s", backend.name)
+                _backend = backend
+    return _backend
+
+
+def set_search_backend(name: str):
+    """Swap the active backend, e.g. for benchmarks comparing implementations."""
+    global _backend
+    backend = _BACKENDS[name]()
+    backend.setup()
+    with _backend_lock:
+        _backend = backend
+    return backend
+
+
+def init_search_index() -> None:
+    """Set up the index at startup; an existing backend is set up again, since the database may be new."""
+    if _backend is None:
+        get_search_backend()
+    else:
+        _backend.setup()
+
+
+def index_records(records: Iterable[EmailRecord]) -> None:
+    get_search_backend().index_records(records)
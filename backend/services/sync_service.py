@@ -0,0 +1,189 @@
+"""Per-account Gmail sync: full resync or incremental via ``users.history.list``.
+
+The first sync for an account, or one whose stored historyId Gmail has
+expired, lists the newest ``SYNC_FULL_MAX_RESULTS`` messages. Later syncs
+ask Gmail for the history since the stored historyId, so a quiet mailbox
+costs one ``history.list`` call: only added messages are downloaded, Gmail
+deletions mark local rows deleted, and label changes update read/starred
+flags without fetching the message again.
+
+With ``GMAIL_FETCH_FORMAT=metadata`` syncs store headers, snippet and labels
+only; ``hydrate_emails`` downloads bodies when an email is opened or needs
+categorizing.
+"""
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from db import get_session
+from models.sync_state import AccountSyncState
+from services.ai_service import AI_CATEGORIZE_ON_FETCH, analyze_changed_emails
+from models.email import EmailRecord
+from services.email_store import analysis_state, bulk_update, delete_by_gmail_ids, metadata_only, upsert_emails
+from services.gmail_clients import get_gmail_service
+from services.gmail_service import (
+    BulkResult,
+    HistoryExpired,
+    delete_emails,
+    fetch_emails,
+    get_history_id,
+    get_messages,
+    label_flags,
+    list_history,
+    move_emails_to_label,
+)
+
+log = logging.getLogger(__name__)
+
+SYNC_FULL_MAX_RESULTS = int(os.getenv("SYNC_FULL_MAX_RESULTS", "50"))
+# Local fields that mirror a Gmail label being added (see gmail_service.label_flags).
+LABEL_EFFECTS = {"UNREAD": {"is_read": False}, "STARRED": {"is_starred": True}, "TRASH": {"status": "deleted"}}
+
+
+def get_sync_state(account_id: int) -> Optional[AccountSyncState]:
+    with get_session() as session:
+        return session.get(AccountSyncState, account_id)
+
+
+def reset_sync_state(account_id: int) -> None:
+    """Forget the stored historyId so the next sync is a full one."""
+    with get_session() as session:
+        state = session.get(AccountSyncState, account_id)
+        if state:
+            state.history_id = None
+            state.updated_at = datetime.utcnow()
+            session.commit()
+
+
+def sync_account(service, account_id: int, max_results: int = SYNC_FULL_MAX_RESULTS) -> dict:
+    """Bring the local copy of ``account_id`` up to date; returns what changed."""
+    state = get_sync_state(account_id)
+    if state and state.history_id:
+        try:
+            return _incremental_sync(service, account_id, state.history_id)
+        except HistoryExpired:
+            log.info(f"History {state.history_id} expired for account {account_id}; running a full sync")
+    return _full_sync(service, account_id, max_results)
+
+
+def _full_sync(service, account_id: int, max_results: int) -> dict:
+    # Read the historyId before listing so changes made during the listing are replayed next time.
+    history_id = get_history_id(service)
+    emails = fetch_emails(service, max_results)
+    _store(service, emails, account_id)
+    _save_state(account_id, history_id, full=True)
+    return {"mode": "full", "added": len(emails), "deleted": 0, "updated": 0, "history_id": history_id}
+
+
+def _incremental_sync(service, account_id: int, start_history_id: str) -> dict:
+    records, latest = list_history(service, start_history_id)
+    added, deleted, relabeled = _changes(records)
+
+    emails = get_messages(service, added)
+    _store(service, emails, account_id)
+    if deleted:
+        delete_by_gmail_ids(deleted)
+    known = analysis_state(relabeled)  # label changes only matter for messages we already store
+    updates = [{"gmail_id": gmail_id, **label_flags(labels)} for gmail_id, labels in relabeled.items() if gmail_id in known]
+    if updates:
+        upsert_emails(updates)
+
+    _save_state(account_id, latest, full=False)
+    return {
+        "mode": "incremental",
+        "added": len(emails),
+        "deleted": len(deleted),
+        "updated": len(updates),
+        "history_id": latest,
+    }
+
+
+def _changes(records: List[dict]):
+    """Fold history records into added ids, deleted ids and final labels of relabeled messages."""
+    added: "OrderedDict[str, None]" = OrderedDict()
+    deleted: "OrderedDict[str, None]" = OrderedDict()
+    relabeled: Dict[str, List[str]] = {}
+    for record in records:
+        for item in record.get("messagesAdded", []):
+            added[item["message"]["id"]] = None
+            deleted.pop(item["message"]["id"], None)
+        for item in record.get("messagesDeleted", []):
+            msg_id = item["message"]["id"]
+            added.pop(msg_id, None)
+            relabeled.pop(msg_id, None)
+            deleted[msg_id] = None
+        for item in record.get("labelsAdded", []) + record.get("labelsRemoved", []):
+            message = item["message"]
+            if message["id"] not in deleted:
+                relabeled[message["id"]] = message.get("labelIds", [])
+    # Newly added messages are downloaded with their current labels anyway.
+    for msg_id in added:
+        relabeled.pop(msg_id, None)
+    return list(added), list(deleted), relabeled
+
+
+def _store(service, emails: List[dict], account_id: int) -> None:
+    if not emails:
+        return
+    for email in emails:
+        email["account_id"] = account_id
+    if AI_CATEGORIZE_ON_FETCH:
+        analyze_changed_emails(emails, account_id=account_id, hydrate=lambda bodiless: fill_bodies(service, bodiless))
+    upsert_emails(emails)
+
+
+def hydrate_emails(gmail_ids: List[str], service=None) -> List[EmailRecord]:
+    """Download bodies for the stored metadata-only rows among ``gmail_ids``.
+
+    Rows that already have a body cost one indexed query and no Gmail call.
+    """
+    pending = metadata_only(gmail_ids)
+    if not pending:
+        return []
+    return upsert_emails(get_messages(service or get_gmail_service(), pending, message_format="full"))
+
+
+def fill_bodies(service, emails: List[dict]) -> None:
+    """Replace metadata-only email dicts' contents with the full messages, in place."""
+    full = {message["gmail_id"]: message for message in get_messages(
+        service, [email["gmail_id"] for email in emails], message_format="full"
+    )}
+    for email in emails:
+        email.update(full.get(email["gmail_id"], {}))
+
+
+def trash_emails(service, gmail_ids: List[str]) -> BulkResult:
+    """Trash messages in Gmail, then mark the ones Gmail accepted as deleted locally."""
+    result = delete_emails(service, gmail_ids)
+    delete_by_gmail_ids(result.succeeded)
+    return result
+
+
+def label_emails(service, gmail_ids: List[str], label_id: str) -> BulkResult:
+    """Add a Gmail label, mirroring read/starred/trash onto stored rows Gmail accepted."""
+    result = move_emails_to_label(service, gmail_ids, label_id)
+    apply_label_effects(result.succeeded, label_id)
+    return result
+
+
+def apply_label_effects(gmail_ids: List[str], label_id: str) -> int:
+    """Set the flags a label stands for (read/starred/trash) on stored rows; returns rows matched."""
+    effect = LABEL_EFFECTS.get(label_id)
+    if not effect or not gmail_ids:
+        return 0
+    return bulk_update(gmail_ids=gmail_ids, **effect)
+
+
+def _save_state(account_id: int, history_id: str, full: bool) -> None:
+    now = datetime.utcnow()
+    with get_session() as session:
+        state = session.get(AccountSyncState, account_id) or AccountSyncState(account_id=account_id)
+        state.history_id = history_id
+        state.last_synced_at = now
+        if full:
+            state.last_full_sync_at = now
+        state.updated_at = now
+        session.add(state)
+        session.commit()
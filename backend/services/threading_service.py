@@ -1,13 +1,15 @@
 import logging
 import re
 from datetime import datetime
-from typing import List, Optional
+from typing import List, Optional, Sequence
 
 from sqlmodel import select
 
-from db import get_session
+from db import get_async_session, get_session
 from models.email import EmailRecord
 from models.thread import EmailThread
+from services.email_store import EmailResult, select_emails
+from services.pagination import apply_cursor, order_newest_first
 
 log = logging.getLogger(__name__)
 
@@ -117,12 +119,25 @@ def update_thread_stats(thread_id: str):
         session.commit()
 
 
-def get_thread_emails(thread_id: str, limit: int = 100) -> List[EmailRecord]:
-    """Get all emails in a thread, ordered by date."""
+def get_thread_emails(
+    thread_id: str, limit: int = 100, fields: Optional[Sequence[str]] = None
+) -> List[EmailResult]:
+    """Get all emails in a thread, ordered by date; ``fields`` as in ``email_store.list_emails``."""
     with get_session() as session:
-        stmt = select(EmailRecord).where(EmailRecord.thread_id == thread_id)
-        stmt = stmt.order_by(EmailRecord.created_at.asc()).limit(limit)
-        return list(session.exec(stmt))
+        return list(session.exec(_thread_emails_stmt(thread_id, limit, fields)))
+
+
+async def get_thread_emails_async(
+    thread_id: str, limit: int = 100, fields: Optional[Sequence[str]] = None
+) -> List[EmailResult]:
+    """``get_thread_emails`` on the async engine."""
+    async with get_async_session() as session:
+        return list(await session.exec(_thread_emails_stmt(thread_id, limit, fields)))
+
+
+def _thread_emails_stmt(thread_id: str, limit: int, fields: Optional[Sequence[str]]):
+    stmt = select_emails(fields).where(EmailRecord.thread_id == thread_id)
+    return stmt.order_by(EmailRecord.created_at.asc()).limit(limit)
 
 
 def list_threads(
@@ -131,26 +146,44 @@ def list_threads(
     archived_only: bool = False,
     limit: int = 50,
     offset: int = 0,
+    cursor: Optional[str] = None,
 ) -> List[EmailThread]:
-    """List email threads with filters."""
+    """List email threads by latest activity; ``cursor`` (keyset) takes precedence over ``offset``."""
     with get_session() as session:
-        stmt = select(EmailThread)
-        
-        if account_id:
-            stmt = stmt.where(EmailThread.account_id == account_id)
-        
-        if unread_only:
-            stmt = stmt.where(EmailThread.has_unread.is_(True))
-        
-        if archived_only:
-            stmt = stmt.where(EmailThread.is_archived.is_(True))
-        else:
-            stmt = stmt.where(EmailThread.is_archived.is_(False))
-        
-        stmt = stmt.order_by(EmailThread.last_message_at.desc())
-        stmt = stmt.offset(offset).limit(limit)
-        
-        return list(session.exec(stmt))
+        return list(session.exec(_threads_stmt(account_id, unread_only, archived_only, limit, offset, cursor)))
+
+
+async def list_threads_async(
+    account_id: Optional[int] = None,
+    unread_only: bool = False,
+    archived_only: bool = False,
+    limit: int = 50,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+) -> List[EmailThread]:
+    """``list_threads`` on the async engine."""
+    async with get_async_session() as session:
+        return list(await session.exec(_threads_stmt(account_id, unread_only, archived_only, limit, offset, cursor)))
+
+
+def _threads_stmt(account_id, unread_only, archived_only, limit, offset, cursor):
+    stmt = select(EmailThread)
+
+    if account_id:
+        stmt = stmt.where(EmailThread.account_id == account_id)
+
+    if unread_only:
+        stmt = stmt.where(EmailThread.has_unread.is_(True))
+
+    if archived_only:
+        stmt = stmt.where(EmailThread.is_archived.is_(True))
+    else:
+        stmt = stmt.where(EmailThread.is_archived.is_(False))
+
+    stmt = order_newest_first(stmt, EmailThread.last_message_at, EmailThread.id)
+    if cursor:
+        return apply_cursor(stmt, EmailThread.last_message_at, EmailThread.id, cursor).limit(limit)
+    return stmt.offset(offset).limit(limit)
 
 
 def archive_thread(thread_id: str) -> bool:
@@ -0,0 +1,262 @@
+"""Local fake of the Gmail REST API for tests and benchmarks.
+
+Serves ``messages.list`` (with ``nextPageToken`` paging), ``messages.get``,
+``messages.trash``, ``messages.modify``, ``messages.batchModify``,
+``getProfile``, ``history.list`` and the multipart ``/batch`` endpoint over
+real HTTP, so a discovery-built client exercises the same code path as
+against Google. ``latency`` is added to every HTTP request; ``rate_limited``
+maps message ids to how many times their get, trash or modify should
+answer 429 first. ``batchModify`` answers 400 if any id is unknown.
+``format=metadata`` gets return headers only; ``bytes_sent`` totals the
+response bodies. ``add``/``delete``/``set_labels`` mutate the mailbox and
+record history; ``expire_history`` makes every earlier historyId answer 404.
+"""
+import base64
+import json
+import os
+import threading
+import time
+import uuid
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+import googleapiclient
+import httplib2
+from googleapiclient.discovery import build_from_document
+
+_DISCOVERY = os.path.join(os.path.dirname(googleapiclient.__file__), "discovery_cache", "documents", "gmail.v1.json")
+_PREFIX = "/gmail/v1/users/me/"
+
+
+def make_message(idx: int, body: Optional[str] = None, labels: Optional[List[str]] = None) -> dict:
+    text = body if body is not None else f"Body of message {idx}"
+    return {
+        "id": f"m{idx:06d}",
+        "threadId": f"t{idx // 3:06d}",
+        "labelIds": labels if labels is not None else ["INBOX", "UNREAD"],
+        "snippet": text[:100],
+        "historyId": str(1000 + idx),
+        "payload": {
+            "mimeType": "text/plain",
+            "headers": [
+                {"name": "Subject", "value": f"Message {idx}"},
+                {"name": "From", "value": f"sender{idx % 7}@example.com"},
+                {"name": "To", "value": "me@example.com"},
+            ],
+            "body": {"data": base64.urlsafe_b64encode(text.encode()).decode(), "size": len(text)},
+        },
+    }
+
+
+class FakeGmailServer:
+    def __init__(self, messages: List[dict], latency: float = 0.0, page_size: int = 100):
+        self.messages: Dict[str, dict] = {m["id"]: m for m in messages}
+        self.order = [m["id"] for m in messages]
+        self.latency = latency
+        self.page_size = page_size
+        self.rate_limited: Dict[str, int] = {}
+        self.history_id = max((int(m.get("historyId", 0)) for m in messages), default=0)
+        self.history: List[dict] = []
+        self.history_floor = 0
+        self.requests: List[str] = []
+        self.bytes_sent = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/"
+
+    def __enter__(self) -> "FakeGmailServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def service(self):
+        """A discovery-built Gmail client pointed at this server."""
+        with open(_DISCOVERY, encoding="utf-8") as handle:
+            document = json.load(handle)
+        document["rootUrl"] = self.url
+        document["baseUrl"] = self.url
+        return build_from_document(document, http=httplib2.Http())
+
+    # Mailbox changes --------------------------------------------------
+
+    def _record(self, **change) -> None:
+        self.history_id += 1
+        self.history.append({"id": str(self.history_id), **change})
+
+    def add(self, message: dict) -> None:
+        with self._lock:
+            self.messages[message["id"]] = message
+            self.order.insert(0, message["id"])
+            self._record(messagesAdded=[{"message": {"id": message["id"], "labelIds": message["labelIds"]}}])
+
+    def delete(self, msg_id: str) -> None:
+        with self._lock:
+            self.messages.pop(msg_id)
+            self.order.remove(msg_id)
+            self._record(messagesDeleted=[{"message": {"id": msg_id}}])
+
+    def set_labels(self, msg_id: str, labels: List[str]) -> None:
+        with self._lock:
+            before = set(self.messages[msg_id]["labelIds"])
+            self.messages[msg_id]["labelIds"] = labels
+            message = {"id": msg_id, "labelIds": labels}
+            change = {}
+            if set(labels) - before:
+                change["labelsAdded"] = [{"message": message, "labelIds": sorted(set(labels) - before)}]
+            if before - set(labels):
+                change["labelsRemoved"] = [{"message": message, "labelIds": sorted(before - set(labels))}]
+            self._record(**change)
+
+    def expire_history(self) -> None:
+        with self._lock:
+            self.history_floor = self.history_id
+
+    # Request handling -------------------------------------------------
+
+    def handle(self, method: str, path: str, body: bytes = b""):
+        """Return ``(status, json)`` for one (possibly batched) API call."""
+        parsed = urlparse(path)
+        params = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        route = parsed.path[len(_PREFIX):] if parsed.path.startswith(_PREFIX) else None
+        if method == "GET" and route == "messages":
+            return 200, self._list(params)
+        if method == "GET" and route == "profile":
+            return 200, {"emailAddress": "me@example.com", "messagesTotal": len(self.order),
+                         "historyId": str(self.history_id)}
+        if method == "GET" and route == "history":
+            return self._history(params)
+        if method == "POST" and route == "messages/batchModify":
+            return self._batch_modify(json.loads(body or b"{}"))
+        if route and route.startswith("messages/"):
+            msg_id, _, action = route.split("/", 1)[1].partition("/")
+            with self._lock:
+                if self.rate_limited.get(msg_id, 0) > 0:
+                    self.rate_limited[msg_id] -= 1
+                    return 429, {"error": {"code": 429, "message": "Rate limit exceeded"}}
+            if msg_id not in self.messages:
+                return 404, {"error": {"code": 404, "message": "Not Found"}}
+            if method == "POST" and action == "trash":
+                self._relabel(msg_id, ["TRASH"], ["INBOX"])
+                return 200, {"id": msg_id}
+            if method == "POST" and action == "modify":
+                change = json.loads(body or b"{}")
+                self._relabel(msg_id, change.get("addLabelIds", []), change.get("removeLabelIds", []))
+                return 200, {"id": msg_id}
+            if method != "GET" or action:
+                return 404, {"error": {"code": 404, "message": f"No route for {method} {parsed.path}"}}
+            message = self.messages[msg_id]
+            if params.get("format") == "metadata":
+                wanted = parse_qs(parsed.query).get("metadataHeaders", [])
+                headers = [h for h in message["payload"]["headers"] if h["name"] in wanted]
+                message = {**{k: v for k, v in message.items() if k != "payload"}, "payload": {"headers": headers}}
+            return 200, message
+        return 404, {"error": {"code": 404, "message": f"No route for {method} {parsed.path}"}}
+
+    def _relabel(self, msg_id: str, add: List[str], remove: List[str]) -> None:
+        labels = self.messages[msg_id]["labelIds"]
+        self.set_labels(msg_id, [label for label in labels if label not in remove] +
+                        [label for label in add if label not in labels])
+
+    def _batch_modify(self, change: dict):
+        ids = change.get("ids", [])
+        unknown = [msg_id for msg_id in ids if msg_id not in self.messages]
+        if unknown:
+            return 400, {"error": {"code": 400, "message": f"Invalid id value: {unknown[0]}"}}
+        for msg_id in ids:
+            self._relabel(msg_id, change.get("addLabelIds", []), change.get("removeLabelIds", []))
+        return 204, {}
+
+    def _list(self, params: dict) -> dict:
+        start = int(params.get("pageToken", 0))
+        size = min(int(params.get("maxResults", 100)), self.page_size)
+        ids = self.order[start:start + size]
+        result = {"messages": [{"id": i, "threadId": self.messages[i]["threadId"]} for i in ids],
+                  "resultSizeEstimate": len(self.order)}
+        if start + size < len(self.order):
+            result["nextPageToken"] = str(start + size)
+        return result
+
+    def _history(self, params: dict):
+        start = int(params["startHistoryId"])
+        if start < self.history_floor:
+            return 404, {"error": {"code": 404, "message": "Requested entity was not found."}}
+        records = [r for r in self.history if int(r["id"]) > start]
+        offset = int(params.get("pageToken", 0))
+        size = int(params.get("maxResults", 100))
+        result = {"history": records[offset:offset + size], "historyId": str(self.history_id)}
+        if offset + size < len(records):
+            result["nextPageToken"] = str(offset + size)
+        return 200, result
+
+    def _batch(self, content_type: str, body: bytes):
+        message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+        boundary = f"batch_{uuid.uuid4().hex}"
+        parts = []
+        for part in message.iter_parts():
+            content = (part.get_payload(decode=True) or part.get_payload().encode()).decode().lstrip()
+            request_line = content.split("\n", 1)[0].strip()
+            method, path, _ = request_line.split(" ", 2)
+            request_body = content.replace("\r\n", "\n").partition("\n\n")[2].strip()
+            status, payload = self.handle(method, path, request_body.encode())
+            content_id = part["Content-ID"].strip("<>")
+            parts.append(
+                f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id}>\r\n\r\n"
+                f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\nContent-Type: application/json\r\n\r\n"
+                f"{json.dumps(payload)}\r\n"
+            )
+        return f"multipart/mixed; boundary={boundary}", ("".join(parts) + f"--{boundary}--\r\n").encode()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _serve(self, method: str) -> None:
+                with server._lock:
+                    server.requests.append(f"{method} {urlparse(self.path).path}")
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                payload = b""
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    length = int(self.headers.get("Content-Length", 0))
+                    body = self.rfile.read(length) if length else b""
+                    if method == "POST" and urlparse(self.path).path == "/batch":
+                        content_type, payload = server._batch(self.headers["Content-Type"], body)
+                        status = 200
+                    else:
+                        status, data = server.handle(method, self.path, body)
+                        content_type, payload = "application/json", json.dumps(data).encode() if status != 204 else b""
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+                        server.bytes_sent += len(payload)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._serve("GET")
+
+            def do_POST(self):
+                self._serve("POST")
+
+        return Handler
@@ -0,0 +1,136 @@
+"""Local fake of the OpenAI chat completions API for tests and benchmarks.
+
+Serves ``POST /v1/chat/completions`` over real HTTP, so the ``openai`` client
+runs its normal code path against ``base_url``. Replies echo the last user
+message. ``latency`` delays every response; ``failures`` is a list of HTTP
+statuses to answer (in order) before succeeding. ``in_flight`` and
+``max_in_flight`` track concurrent requests.
+
+``chunk_delay`` is the generation time per word: ``stream=True`` requests get
+one SSE chunk per word that far apart, plain requests wait for all of them.
+``chunks_sent`` counts streamed chunks and ``streams_aborted`` counts streams
+whose client hung up before the end.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+
+class FakeOpenAIServer:
+    def __init__(self, latency: float = 0.0, failures: Optional[List[int]] = None, chunk_delay: float = 0.0):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.chunks_sent = 0
+        self.streams_aborted = 0
+        self.failures = list(failures or [])
+        self.requests: List[dict] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._httpd.server_address[1]}/v1"
+
+    def __enter__(self) -> "FakeOpenAIServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reply_for(self, body: dict) -> str:
+        return f"echo:{body['messages'][-1]['content']}"
+
+    def completion(self, body: dict) -> dict:
+        content = self.reply_for(body)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 1, "completion_tokens": len(content.split()), "total_tokens": 1 + len(content.split())},
+        }
+
+    def chunks(self, body: dict) -> List[dict]:
+        words = self.reply_for(body).split(" ")
+        pieces = [word if i == 0 else f" {word}" for i, word in enumerate(words)]
+        base = {"id": f"chatcmpl-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": body.get("model", "fake")}
+        chunks = [{**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece},
+                                        "finish_reason": None}]} for piece in pieces]
+        chunks.append({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        return chunks
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, payload: dict, headers: Optional[dict] = None) -> None:
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _stream(self, body: dict) -> None:
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    for chunk in server.chunks(body):
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                        self.wfile.flush()
+                        with server._lock:
+                            server.chunks_sent += 1
+                        time.sleep(server.chunk_delay)
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    with server._lock:
+                        server.streams_aborted += 1
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests.append(body)
+                    server.in_flight += 1
+                    server.max_in_flight = max(server.max_in_flight, server.in_flight)
+                    failure = server.failures.pop(0) if server.failures else None
+                try:
+                    if server.latency:
+                        time.sleep(server.latency)
+                    if not self.path.endswith("/chat/completions"):
+                        self._send(404, {"error": {"message": "not found"}})
+                    elif failure:
+                        self._send(failure, {"error": {"message": f"fake {failure}", "type": "fake"}},
+                                   {"Retry-After": "0"} if failure == 429 else None)
+                    elif body.get("stream"):
+                        self._stream(body)
+                    else:
+                        time.sleep(server.chunk_delay * len(server.reply_for(body).split(" ")))
+                        self._send(200, server.completion(body))
+                finally:
+                    with server._lock:
+                        server.in_flight -= 1
+
+        return Handler
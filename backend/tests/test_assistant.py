@@ -0,0 +1,141 @@
+import asyncio
+import json
+import os
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Use a throwaway sqlite DB for tests
+os.environ["DATABASE_URL"] = "sqlite:///./test_assistant.db"
+
+from app import app, request_log  # noqa: E402
+from db import dispose_engine, engine  # noqa: E402
+from fake_openai import FakeOpenAIServer  # noqa: E402
+from services import gpt_service  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def client():
+    db_files = [Path(f"{engine.url.database}{suffix}") for suffix in ("", "-wal", "-shm")]
+    for path in db_files:
+        path.unlink(missing_ok=True)
+    request_log.clear()
+    with TestClient(app) as c:
+        yield c
+    dispose_engine()
+    for path in db_files:
+        path.unlink(missing_ok=True)
+
+
+@pytest.fixture
+def openai_server(monkeypatch):
+    with FakeOpenAIServer(latency=0.05) as server:
+        monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+        monkeypatch.setenv("OPENAI_BASE_URL", server.url)
+        monkeypatch.setattr(gpt_service, "OPENAI_RETRY_BASE_SECONDS", 0.01)
+        monkeypatch.setattr(gpt_service, "_async_client", None)
+        yield server
+
+
+def test_reply_route_is_bounded_by_the_concurrency_limit(client, openai_server, monkeypatch):
+    monkeypatch.setattr(gpt_service, "OPENAI_MAX_CONCURRENCY", 2)
+    openai_server.latency = 0.2
+    replies = []
+
+    def ask(n):
+        replies.append(client.post("/assistant/reply", json={"prompt": f"hello {n}"}).json()["reply"])
+
+    threads = [threading.Thread(target=ask, args=(n,)) for n in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(replies) == [f"echo:hello {n}" for n in range(6)]
+    assert openai_server.max_in_flight == 2
+
+
+def test_rate_limits_and_server_errors_are_retried(openai_server):
+    openai_server.failures = [429, 503]
+    before = gpt_service.LLM_RETRIES.labels(provider="openai", reason="rate_limited")._value.get()
+    assert asyncio.run(gpt_service.generate_reply_async("again")) == "echo:again"
+    assert len(openai_server.requests) == 3
+    assert gpt_service.LLM_RETRIES.labels(provider="openai", reason="rate_limited")._value.get() == before + 1
+
+
+def test_client_errors_are_not_retried(openai_server):
+    openai_server.failures = [400]
+    assert asyncio.run(gpt_service.generate_reply_async("bad")) == gpt_service.FAILED
+    assert len(openai_server.requests) == 1
+
+
+
+def test_a_new_event_loop_closes_the_previous_client(openai_server):
+    async def reply():
+        await gpt_service.generate_reply_async("hi")
+        return gpt_service._async_client
+
+    first = asyncio.run(reply())
+    second = asyncio.run(reply())
+    assert second is not first
+    assert first.is_closed() and not second.is_closed()
+    asyncio.run(gpt_service.close_async_client())
+    assert second.is_closed() and gpt_service._async_client is None
+
+def _sse_events(response):
+    events, name = [], "message"
+    for line in response.iter_lines():
+        if line.startswith("event: "):
+            name = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((name, json.loads(line[len("data: "):])))
+            name = "message"
+    return events
+
+
+def test_reply_streams_as_server_sent_events(client, openai_server):
+    with client.stream("POST", "/assistant/reply/stream", json={"prompt": "one two three"}) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = _sse_events(response)
+    assert events[-1] == ("done", {})
+    assert "".join(data["delta"] for name, data in events[:-1]) == "echo:one two three"
+    assert len(events) == 4  # one event per word
+
+
+def test_closing_a_stream_stops_the_upstream_completion(openai_server):
+    openai_server.chunk_delay = 0.02
+    prompt = " ".join(f"w{n}" for n in range(50))
+
+    async def read_two():
+        stream = gpt_service.stream_reply(prompt)
+        received = [await stream.__anext__(), await stream.__anext__()]
+        await stream.aclose()
+        await asyncio.sleep(0.3)
+        return received
+
+    assert asyncio.run(read_two()) == ["echo:w0", " w1"]
+    assert openai_server.streams_aborted == 1
+    assert openai_server.chunks_sent < 25
+
+
+def test_gemini_summary_streams(client, monkeypatch):
+    from services import gemini_service
+
+    class FakeModel:
+        def __init__(self, name):
+            pass
+
+        async def generate_content_async(self, prompt, stream=False):
+            async def chunks():
+                for text in ("Short ", "summary."):
+                    yield SimpleNamespace(text=text)
+            return chunks()
+
+    monkeypatch.setattr(gemini_service, "_gemini_configured", True)
+    monkeypatch.setattr(gemini_service.genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(gemini_service, "_model", None)
+    with client.stream("POST", "/assistant/gemini/summarize/stream", json={"prompt": "long email"}) as response:
+        events = _sse_events(response)
+    assert events == [("message", {"delta": "Short "}), ("message", {"delta": "summary."}), ("done", {})]
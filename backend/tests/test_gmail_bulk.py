@@ -0,0 +1,90 @@
+import os
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fake_gmail import FakeGmailServer, make_message
+
+# Use a throwaway sqlite DB for tests
+os.environ["DATABASE_URL"] = "sqlite:///./test_gmail_bulk.db"
+
+from app import app, request_log  # noqa: E402
+from db import dispose_engine, engine  # noqa: E402
+from services import gmail_service  # noqa: E402
+from services.email_store import get_email_by_gmail_id, upsert_emails  # noqa: E402
+from services.gmail_service import QuotaBudget, delete_emails, move_emails_to_label  # noqa: E402
+from services.sync_service import label_emails, trash_emails  # noqa: E402
+
+
+def _unlimited():
+    return QuotaBudget(units_per_second=0)
+
+
+@pytest.fixture(scope="module")
+def client():
+    db_files = [Path(f"{engine.url.database}{suffix}") for suffix in ("", "-wal", "-shm")]
+    for path in db_files:
+        path.unlink(missing_ok=True)
+    request_log.clear()
+    with TestClient(app) as c:
+        yield c
+    dispose_engine()
+    for path in db_files:
+        path.unlink(missing_ok=True)
+
+
+def test_trash_is_batched_and_reports_each_id(monkeypatch):
+    monkeypatch.setattr(gmail_service, "GMAIL_FETCH_RETRIES", 1)
+    with FakeGmailServer([make_message(i) for i in range(120)]) as server:
+        server.rate_limited = {"m000005": 1}
+        ids = [f"m{i:06d}" for i in range(120)] + ["missing"]
+        result = delete_emails(server.service(), ids, batch_size=50, quota=_unlimited())
+        assert "TRASH" in server.messages["m000005"]["labelIds"]
+    assert len(result.succeeded) == 120
+    assert list(result.failed) == ["missing"]
+    # 3 batches of trash calls plus one retry for the rate-limited id.
+    assert server.requests.count("POST /batch") == 4
+    assert not any("/trash" in request for request in server.requests)
+
+
+def test_move_uses_batch_modify_and_isolates_bad_ids():
+    with FakeGmailServer([make_message(i) for i in range(1500)]) as server:
+        service = server.service()
+        ids = [f"m{i:06d}" for i in range(1500)]
+        result = move_emails_to_label(service, ids, "Label_1", quota=_unlimited())
+        assert (len(result.succeeded), result.failed) == (1500, {})
+        assert server.requests.count("POST /gmail/v1/users/me/messages/batchModify") == 2
+        assert "Label_1" in server.messages["m001499"]["labelIds"]
+
+        result = move_emails_to_label(service, ["m000001", "gone", "m000002"], "STARRED", quota=_unlimited())
+    assert result.succeeded == ["m000001", "m000002"]
+    assert list(result.failed) == ["gone"]
+
+
+def test_jobs_update_local_state_only_for_remote_successes(client, monkeypatch):
+    upsert_emails([{"gmail_id": f"m{i:06d}", "subject": f"Message {i}"} for i in range(3)])
+    upsert_emails([{"gmail_id": "stale", "subject": "Deleted in Gmail"}])
+    with FakeGmailServer([make_message(i) for i in range(3)]) as server:
+        monkeypatch.setattr(gmail_service, "_quota", _unlimited())
+        service = server.service()
+
+        result = label_emails(service, ["m000000", "stale"], "STARRED")
+        assert (result.succeeded, list(result.failed)) == (["m000000"], ["stale"])
+        assert get_email_by_gmail_id("m000000").is_starred
+        assert not get_email_by_gmail_id("stale").is_starred
+
+        result = trash_emails(service, ["m000001", "m000002", "stale"])
+    assert (result.succeeded, list(result.failed)) == (["m000001", "m000002"], ["stale"])
+    assert get_email_by_gmail_id("m000001").status == "deleted"
+    assert get_email_by_gmail_id("stale").status == "keep"
+
+
+def test_local_only_move_mirrors_the_label(client):
+    upsert_emails([{"gmail_id": f"local{i}", "subject": f"Local {i}", "is_read": True} for i in range(3)])
+    for label_id, gmail_id in (("STARRED", "local0"), ("UNREAD", "local1"), ("TRASH", "local2")):
+        response = client.post("/gmail/move", json={"gmail_ids": [gmail_id], "label_id": label_id, "skip_remote": True})
+        assert response.json() == {"moved": 1}
+    assert get_email_by_gmail_id("local0").is_starred
+    assert not get_email_by_gmail_id("local1").is_read
+    assert get_email_by_gmail_id("local2").status == "deleted"
@@ -0,0 +1,99 @@
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+from google.oauth2.credentials import Credentials
+from prometheus_client import REGISTRY
+
+# Use a throwaway sqlite DB for tests
+os.environ["DATABASE_URL"] = "sqlite:///./test_gmail_clients.db"
+
+from app import app, request_log  # noqa: E402
+from db import dispose_engine, engine  # noqa: E402
+from services import gmail_clients  # noqa: E402
+from services.account_service import create_account, get_account  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def client():
+    db_files = [Path(f"{engine.url.database}{suffix}") for suffix in ("", "-wal", "-shm")]
+    for path in db_files:
+        path.unlink(missing_ok=True)
+    request_log.clear()
+    with TestClient(app) as c:
+        yield c
+    dispose_engine()
+    for path in db_files:
+        path.unlink(missing_ok=True)
+
+
+@pytest.fixture
+def refreshes(monkeypatch):
+    calls = []
+
+    def fake_refresh(self, request):
+        time.sleep(0.05)
+        calls.append(self.refresh_token)
+        self.token = f"fresh-{len(calls)}"
+        self.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    monkeypatch.setattr(Credentials, "refresh", fake_refresh)
+    gmail_clients.clear()
+    yield calls
+    gmail_clients.clear()
+
+
+def _hits():
+    return REGISTRY.get_sample_value("gmail_client_cache_total", {"result": "hit"}) or 0
+
+
+def test_service_is_reused_per_thread(client, refreshes):
+    account = create_account(email="cached@example.com", access_token="tok", refresh_token="r1",
+                             token_expiry=datetime.utcnow() + timedelta(hours=1))
+    hits = _hits()
+    first = gmail_clients.get_gmail_service(account.id)
+    assert gmail_clients.get_gmail_service(account.id) is first
+    assert _hits() == hits + 1
+    assert first._http.credentials.token == "tok"
+    assert refreshes == []
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(gmail_clients.get_gmail_service(account.id)))
+    thread.start()
+    thread.join()
+    # Each thread gets its own client (httplib2 is not thread-safe) over the same credentials.
+    assert other[0] is not first
+    assert other[0]._http.credentials is first._http.credentials
+
+
+def test_expiring_token_is_refreshed_once_and_saved(client, refreshes):
+    account = create_account(email="expiring@example.com", access_token="old", refresh_token="r2",
+                             token_expiry=datetime.utcnow() + timedelta(seconds=30))
+    services = []
+    threads = [threading.Thread(target=lambda: services.append(gmail_clients.get_gmail_service(account.id)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert refreshes == ["r2"]
+    assert {s._http.credentials.token for s in services} == {"fresh-1"}
+    stored = get_account(account.id)
+    assert stored.access_token == "fresh-1"
+    assert stored.token_expiry > datetime.utcnow() + timedelta(minutes=50)
+    assert REGISTRY.get_sample_value("gmail_token_refresh_seconds_count") >= 1
+
+
+def test_token_update_invalidates_cached_client(client, refreshes):
+    account = create_account(email="rotated@example.com", access_token="before", refresh_token="r3",
+                             token_expiry=datetime.utcnow() + timedelta(hours=1))
+    assert gmail_clients.get_gmail_service(account.id)._http.credentials.token == "before"
+    response = client.patch(f"/accounts/{account.id}/tokens", json={
+        "access_token": "after", "token_expiry": (datetime.utcnow() + timedelta(hours=1)).isoformat(),
+    })
+    assert response.status_code == 200
+    assert gmail_clients.get_gmail_service(account.id)._http.credentials.token == "after"
@@ -0,0 +1,86 @@
+import gc
+import time
+
+from fake_gmail import FakeGmailServer, make_message
+
+from services import gmail_service
+from services.gmail_service import QuotaBudget, fetch_emails
+
+
+def _unlimited():
+    return QuotaBudget(units_per_second=0)
+
+
+def test_fetch_follows_pages_and_batches_gets():
+    messages = [make_message(i) for i in range(230)]
+    with FakeGmailServer(messages, page_size=100) as server:
+        emails = fetch_emails(server.service(), max_results=1000, batch_size=50, concurrency=4, quota=_unlimited())
+
+    assert [e["gmail_id"] for e in emails] == [m["id"] for m in messages]
+    assert emails[5]["subject"] == "Message 5"
+    assert emails[5]["body_text"] == "Body of message 5"
+    assert emails[5]["is_read"] is False
+    lists = [r for r in server.requests if r.endswith("/messages")]
+    batches = [r for r in server.requests if r == "POST /batch"]
+    assert len(lists) == 3
+    assert len(batches) == 5  # 100 + 100 + 30 ids in batches of 50
+    assert not [r for r in server.requests if "/messages/" in r]  # no per-message round trips
+
+
+def test_fetch_stops_at_max_results():
+    with FakeGmailServer([make_message(i) for i in range(300)], page_size=100) as server:
+        emails = fetch_emails(server.service(), max_results=120, quota=_unlimited())
+    assert len(emails) == 120
+    assert len([r for r in server.requests if r.endswith("/messages")]) == 2
+
+
+def test_fetch_retries_rate_limited_parts(monkeypatch):
+    monkeypatch.setattr(gmail_service, "GMAIL_FETCH_RETRIES", 2)
+    messages = [make_message(i) for i in range(10)]
+    with FakeGmailServer(messages) as server:
+        server.rate_limited = {"m000003": 1, "m000007": 1}
+        emails = fetch_emails(server.service(), max_results=10, quota=_unlimited())
+    assert [e["gmail_id"] for e in emails] == [m["id"] for m in messages]
+    assert server.requests.count("POST /batch") == 2
+
+
+def test_batches_run_concurrently():
+    with FakeGmailServer([make_message(i) for i in range(200)], latency=0.05, page_size=200) as server:
+        fetch_emails(server.service(), max_results=200, batch_size=25, concurrency=4, quota=_unlimited())
+    assert server.max_in_flight > 1
+
+
+
+def test_worker_http_clients_are_dropped_with_their_service():
+    with FakeGmailServer([make_message(0)]) as server:
+        service = server.service()
+        http = gmail_service._worker_http(service)
+        assert gmail_service._worker_http(service) is http
+        assert gmail_service._worker_http(server.service()) is not http
+        del service
+        gc.collect()
+        assert len(gmail_service._http_local.clients) == 0
+
+def test_quota_budget_throttles():
+    budget = QuotaBudget(units_per_second=100)
+    start = time.monotonic()
+    for _ in range(30):
+        budget.acquire(5)  # 150 units: the first 100 are free, the rest take ~0.5s
+    assert 0.35 < time.monotonic() - start < 1.5
+
+
+def test_fetch_records_attachments_without_decoding_them():
+    message = make_message(1)
+    text_part = dict(message["payload"], headers=[])
+    message["payload"] = {
+        "mimeType": "multipart/mixed",
+        "headers": message["payload"]["headers"],
+        "parts": [text_part, {"mimeType": "application/pdf", "filename": "a.pdf",
+                              "body": {"attachmentId": "att-9", "size": 1234}}],
+    }
+    with FakeGmailServer([message]) as server:
+        email = fetch_emails(server.service(), max_results=1, quota=_unlimited())[0]
+    assert email["body_text"] == "Body of message 1"
+    assert email["to_email"] == "me@example.com"
+    assert email["has_attachments"] is True
+    assert email["attachments"][0]["attachment_id"] == "att-9"
@@ -0,0 +1,143 @@
+import os
+import threading
+from pathlib import Path
+from time import monotonic, sleep
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import update
+
+from fake_gmail import FakeGmailServer, make_message
+
+# Use a throwaway sqlite DB for tests
+os.environ["DATABASE_URL"] = "sqlite:///./test_jobs.db"
+
+from app import app, request_log  # noqa: E402
+from db import dispose_engine, engine, get_session  # noqa: E402
+from models.job import Job  # noqa: E402
+from models.scheduler_lease import SchedulerLease  # noqa: E402
+from services import gmail_service, job_service, leases  # noqa: E402
+from services.email_store import get_email_by_gmail_id, upsert_emails  # noqa: E402
+from services.gmail_service import BulkResult, QuotaBudget  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def client():
+    db_files = [Path(f"{engine.url.database}{suffix}") for suffix in ("", "-wal", "-shm")]
+    for path in db_files:
+        path.unlink(missing_ok=True)
+    request_log.clear()
+    with TestClient(app) as c:
+        yield c
+    dispose_engine()
+    for path in db_files:
+        path.unlink(missing_ok=True)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(job_service.time, "sleep", lambda seconds: None)
+
+
+def _wait(client, job_id, timeout=15):
+    deadline = monotonic() + timeout
+    while monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()["job"]
+        if job["status"] not in job_service.ACTIVE:
+            return job
+        sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish: {job}")
+
+
+def test_remote_delete_runs_as_chunked_background_job(client, monkeypatch):
+    monkeypatch.setattr(job_service, "JOB_CHUNK_SIZE", 50)
+    monkeypatch.setattr(gmail_service, "_quota", QuotaBudget(units_per_second=0))
+    ids = [f"m{i:06d}" for i in range(120)]
+    upsert_emails([{"gmail_id": gmail_id, "subject": "Promo"} for gmail_id in ids])
+    with FakeGmailServer([make_message(i) for i in range(120)]) as server:
+        service = server.service()
+        monkeypatch.setattr("services.job_service.get_gmail_service", lambda account_id=None: service)
+        response = client.post("/gmail/delete", json={"gmail_ids": ids + ["missing"]})
+        assert response.status_code == 202
+        assert response.json()["total"] == 121
+        job = _wait(client, response.json()["job_id"])
+
+    assert (job["status"], job["processed"], job["progress"]) == ("succeeded", 121, 1.0)
+    assert (job["succeeded_count"], job["failed_count"]) == (120, 1)
+    assert list(job["failures"]) == ["missing"]
+    assert "items" not in job["params"]
+    assert get_email_by_gmail_id("m000119").status == "deleted"
+    assert client.get("/jobs/?status=succeeded").json()["jobs"][0]["id"] == job["id"]
+
+
+def test_failing_chunks_are_retried_then_fail_the_job(client, monkeypatch):
+    monkeypatch.setattr(job_service, "JOB_CHUNK_RETRIES", 1)
+    calls = []
+
+    def flaky(params, items):
+        calls.append(items)
+        if len(calls) == 1:
+            raise ConnectionError("reset by peer")
+        return BulkResult(items, {})
+
+    def broken(params, items):
+        raise ConnectionError("still down")
+
+    job_service.register_handler("test.flaky", flaky)
+    job_service.register_handler("test.broken", broken)
+
+    job = _wait(client, job_service.submit("test.flaky", ["a", "b"]).id)
+    assert (job["status"], job["succeeded_count"], len(calls)) == ("succeeded", 2, 2)
+
+    job = _wait(client, job_service.submit("test.broken", ["a"]).id)
+    assert (job["status"], job["processed"], job["error"]) == ("failed", 0, "still down")
+
+
+def test_interrupted_job_resumes_from_its_checkpoint(client, monkeypatch):
+    monkeypatch.setattr(job_service, "JOB_CHUNK_SIZE", 3)
+    chunks = []
+    job_service.register_handler("test.record", lambda params, items: chunks.append(items) or BulkResult(items, {}))
+    with get_session() as session:
+        # As left by a process that died after checkpointing four items.
+        job = Job(kind="test.record", status="running", params={"items": [str(i) for i in range(10)]},
+                  total=10, processed=4, succeeded_count=4, attempts=1)
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+
+    assert job_service.resume_jobs() == 1
+    done = _wait(client, job.id)
+    assert chunks == [["4", "5", "6"], ["7", "8", "9"]]
+    assert (done["status"], done["succeeded_count"], done["attempts"]) == ("succeeded", 10, 2)
+
+
+def test_lease_is_renewed_during_a_chunk_and_a_lost_lease_stops_the_job(client, monkeypatch):
+    monkeypatch.setattr(job_service, "JOB_CHUNK_SIZE", 1)
+    monkeypatch.setattr(job_service, "JOB_LEASE_RENEW_SECONDS", 0.02)
+    renewals = []
+    acquire = leases.acquire
+    monkeypatch.setattr(leases, "acquire", lambda name, owner: renewals.append(name) or acquire(name, owner))
+    chunks = []
+
+    def slow(params, items):
+        chunks.append(items)
+        threading.Event().wait(0.2)  # several renewal periods
+        if len(chunks) == 1:
+            # Another replica takes over, as if this one had stalled past the TTL.
+            with engine.begin() as conn:
+                conn.execute(update(SchedulerLease).where(SchedulerLease.name == f"job:{job.id}").values(owner="other-replica"))
+            threading.Event().wait(0.1)
+        return BulkResult(items, {})
+
+    job_service.register_handler("test.slow", slow)
+    job = job_service.submit("test.slow", ["a", "b", "c"])
+    deadline = monotonic() + 5
+    while job_service.JOBS_RUNNING._value.get() or not chunks:
+        assert monotonic() < deadline
+        sleep(0.05)
+
+    assert len(renewals) >= 3
+    assert chunks == [["a"]]
+    assert job_service.get_job(job.id).processed == 1
+    leases.release([f"job:{job.id}"], "other-replica")
+    job_service._update(job.id, status="failed")
@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Use a throwaway sqlite DB for tests
+os.environ["DATABASE_URL"] = "sqlite:///./test_leases.db"
+
+from app import app, request_log  # noqa: E402
+from db import dispose_engine, engine  # noqa: E402
+from services import leases  # noqa: E402
+from services.leases import AccountLeases  # noqa: E402
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+CLAIM_SCRIPT = """
+import json, random, sys
+from services.leases import AccountLeases
+replica = AccountLeases(owner=sys.argv[1])
+accounts = list(range(1, 41))
+random.shuffle(accounts)
+print(json.dumps([a for a in accounts if replica.claim(a)]))
+"""
+
+
+@pytest.fixture(scope="module")
+def client():
+    db_files = [Path(f"{engine.url.database}{suffix}") for suffix in ("", "-wal", "-shm")]
+    for path in db_files:
+        path.unlink(missing_ok=True)
+    request_log.clear()
+    with TestClient(app) as c:
+        yield c
+    dispose_engine()
+    for path in db_files:
+        path.unlink(missing_ok=True)
+
+
+@pytest.fixture(autouse=True)
+def clean_leases(client):
+    for owner in ("a", "b", "p0", "p1", "p2", "p3"):
+        leases.release_all(owner)
+
+
+def test_processes_never_share_an_account(client):
+    # The engine is bound to whichever test module imported db first; claim against that DB.
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{Path(engine.url.database).resolve()}"}
+    procs = [
+        subprocess.Popen([sys.executable, "-c", CLAIM_SCRIPT, f"p{i}"], cwd=BACKEND, env=env,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for i in range(4)
+    ]
+    claimed = []
+    for proc in procs:
+        out, err = proc.communicate(timeout=60)
+        assert proc.returncode == 0, err
+        claimed.append(json.loads(out.strip().splitlines()[-1]))
+    owned = [account for accounts in claimed for account in accounts]
+    assert sorted(owned) == list(range(1, 41))  # every account exactly once
+    for i, accounts in enumerate(claimed):
+        assert leases.held(f"p{i}", "account:") == sorted(f"account:{a}" for a in accounts)
+
+
+def test_joining_replica_takes_over_a_fair_share(client):
+    a, b = AccountLeases(owner="a"), AccountLeases(owner="b")
+    assert all(a.claim(account) for account in range(1, 11))
+    assert a.heartbeat(total_accounts=10) == 10
+    assert b.heartbeat(total_accounts=10) == 5
+    assert not any(b.claim(account) for account in range(1, 11))
+
+    # a sheds its surplus on its next heartbeat, keeping the account mid-sync.
+    assert a.heartbeat(total_accounts=10, busy=lambda account: account == 9) == 5
+    kept = leases.held("a", "account:")
+    assert len(kept) == 5 and "account:9" in kept
+    taken = [account for account in range(1, 11) if b.claim(account)]
+    assert len(taken) == 5 and 9 not in taken
+    # a is at its share and will not grab more.
+    assert not a.claim(taken[0])
+
+
+def test_expired_leases_move_to_another_replica(client):
+    a, b = AccountLeases(owner="a", ttl=1), AccountLeases(owner="b")
+    assert a.claim(1)
+    assert not b.claim(1)
+    time.sleep(1.2)
+    assert b.claim(1)
+    assert not a.claim(1)
+    b.release_all()
+    assert a.claim(1)
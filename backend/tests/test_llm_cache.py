@@ -0,0 +1,129 @@
+import asyncio
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Use a throwaway sqlite DB for tests
+os.environ["DATABASE_URL"] = "sqlite:///./test_llm_cache.db"
+
+from app import app, request_log  # noqa: E402
+from db import dispose_engine, engine  # noqa: E402
+from services import gemini_service, llm_cache, llm_providers  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def client():
+    db_files = [Path(f"{engine.url.database}{suffix}") for suffix in ("", "-wal", "-shm")]
+    for path in db_files:
+        path.unlink(missing_ok=True)
+    request_log.clear()
+    with TestClient(app) as c:
+        yield c
+    dispose_engine()
+    for path in db_files:
+        path.unlink(missing_ok=True)
+
+
+@pytest.fixture
+def gemini(client, monkeypatch):
+    """A fake Gemini model that counts calls; ``fail`` makes the next calls raise."""
+    state = SimpleNamespace(calls=0, fail=False, delay=0.0)
+
+    class FakeModel:
+        def __init__(self, name):
+            pass
+
+        async def generate_content_async(self, prompt, stream=False):
+            state.calls += 1
+            await asyncio.sleep(state.delay)
+            if state.fail:
+                raise RuntimeError("quota exceeded")
+            if stream:
+                async def chunks():
+                    for text in ("Streamed ", "summary."):
+                        yield SimpleNamespace(text=text)
+                return chunks()
+            return SimpleNamespace(text=f"summary #{state.calls}")
+
+    monkeypatch.setattr(gemini_service, "_gemini_configured", True)
+    monkeypatch.setattr(gemini_service.genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(gemini_service, "_model", None)
+    llm_cache.clear()
+    yield state
+    llm_cache.clear()
+
+
+def test_repeated_summaries_are_served_from_cache(gemini):
+    first = asyncio.run(gemini_service.generate_summary("Lunch on Friday?"))
+    # Whitespace differences hash to the same entry.
+    second = asyncio.run(gemini_service.generate_summary("Lunch  on\nFriday?"))
+    assert first == second == "summary #1"
+    assert gemini.calls == 1
+    # Operations are cached separately.
+    assert asyncio.run(gemini_service.extract_action_items("Lunch on Friday?")) == "summary #2"
+
+
+def test_concurrent_identical_requests_share_one_call(gemini):
+    gemini.delay = 0.05
+
+    async def burst():
+        return await asyncio.gather(*(gemini_service.generate_summary("Quarterly report") for _ in range(10)))
+
+    assert asyncio.run(burst()) == ["summary #1"] * 10
+    assert gemini.calls == 1
+
+
+def test_failures_are_not_cached(gemini):
+    gemini.fail = True
+    assert asyncio.run(gemini_service.generate_summary("Flaky")).startswith("Error")
+    gemini.fail = False
+    assert asyncio.run(gemini_service.generate_summary("Flaky")) == "summary #2"
+
+
+def test_entries_expire_and_are_evicted(gemini, monkeypatch):
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_PERSIST", False)
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_TTL_SECONDS", 0)
+    asyncio.run(gemini_service.generate_summary("Short-lived"))
+    asyncio.run(gemini_service.generate_summary("Short-lived"))
+    assert gemini.calls == 2
+
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_TTL_SECONDS", 60)
+    monkeypatch.setattr(llm_cache, "LLM_CACHE_SIZE", 2)
+    for text in ("a", "b", "c"):
+        asyncio.run(gemini_service.generate_summary(text))
+    assert len(llm_cache._lru) == 2
+    asyncio.run(gemini_service.generate_summary("a"))  # evicted, so recomputed
+    assert gemini.calls == 6
+
+
+def test_persisted_summaries_survive_a_restart(gemini):
+    assert asyncio.run(gemini_service.generate_summary("Board meeting notes")) == "summary #1"
+    llm_cache.clear()  # what a new process starts with
+    assert asyncio.run(gemini_service.generate_summary("Board meeting notes")) == "summary #1"
+    assert gemini.calls == 1
+
+
+def test_completed_streams_fill_the_cache(client, gemini):
+    for _ in range(2):
+        with client.stream("POST", "/assistant/gemini/summarize/stream", json={"prompt": "Travel plans"}) as response:
+            body = "".join(response.iter_text())
+        assert '"delta"' in body
+    assert gemini.calls == 1
+    assert asyncio.run(gemini_service.generate_summary("Travel plans")) == "Streamed summary."
+    assert gemini.calls == 1
+
+
+def test_fallback_answers_are_not_cached(client, gemini, monkeypatch):
+    monkeypatch.setattr(llm_providers, "LLM_PROVIDERS", ["gemini", "stub"])
+    monkeypatch.setattr(llm_providers, "_breakers", {name: llm_providers._Breaker(name) for name in llm_providers._breakers})
+    gemini.fail = True
+    assert asyncio.run(gemini_service.generate_summary("Gemini is down")) == "[stub] Gemini is down"
+    with client.stream("POST", "/assistant/gemini/summarize/stream", json={"prompt": "Gemini is down"}) as response:
+        assert "[stub]" in "".join(response.iter_text())
+
+    gemini.fail = False
+    assert asyncio.run(gemini_service.generate_summary("Gemini is down")) == "summary #3"
+    assert gemini.calls == 3
@@ -0,0 +1,149 @@
+import asyncio
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+# Use a throwaway sqlite DB for tests
+os.environ["DATABASE_URL"] = "sqlite:///./test_llm_providers.db"
+
+from app import app, request_log  # noqa: E402
+from db import dispose_engine, engine  # noqa: E402
+from services import gemini_service, gpt_service, llm_providers  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def client():
+    db_files = [Path(f"{engine.url.database}{suffix}") for suffix in ("", "-wal", "-shm")]
+    for path in db_files:
+        path.unlink(missing_ok=True)
+    request_log.clear()
+    with TestClient(app) as c:
+        yield c
+    dispose_engine()
+    for path in db_files:
+        path.unlink(missing_ok=True)
+
+
+class FakeProvider:
+    """Answers after ``delay`` seconds, or raises while ``fail`` is set."""
+
+    def __init__(self, name, delay=0.0, fail=False):
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def available(self):
+        return True
+
+    async def complete(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError(f"{self.name} is down")
+        return f"{self.name}: {prompt}"
+
+    async def stream(self, prompt):
+        answer = await self.complete(prompt)
+        for word in answer.split(" "):
+            yield word + " "
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Register fake providers for one test; the first one is preferred."""
+    monkeypatch.setattr(llm_providers, "_providers", dict(llm_providers._providers))
+    monkeypatch.setattr(llm_providers, "_breakers", dict(llm_providers._breakers))
+
+    def install(*fakes):
+        for fake in fakes:
+            llm_providers.register(fake)
+        monkeypatch.setattr(llm_providers, "LLM_PROVIDERS", [fake.name for fake in fakes])
+        return fakes
+
+    return install
+
+
+def test_timed_out_provider_falls_back(providers, monkeypatch):
+    providers(FakeProvider("slow", delay=1), FakeProvider("fast"))
+    monkeypatch.setattr(llm_providers, "LLM_TIMEOUT_SECONDS", 0.05)
+    before = llm_providers.LLM_ERRORS.labels(provider="slow", reason="timeout")._value.get()
+
+    assert asyncio.run(llm_providers.complete("hi", prefer="slow")) == "fast: hi"
+    assert llm_providers.LLM_ERRORS.labels(provider="slow", reason="timeout")._value.get() == before + 1
+
+    monkeypatch.setattr(llm_providers, "LLM_FALLBACK", False)
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(llm_providers.complete("hi", prefer="slow"))
+
+
+def test_deadline_bounds_the_whole_call(providers, monkeypatch):
+    providers(FakeProvider("slow", delay=1), FakeProvider("slower", delay=1))
+    monkeypatch.setattr(llm_providers, "LLM_DEADLINE_SECONDS", 0.1)
+
+    async def timed():
+        start = asyncio.get_running_loop().time()
+        with pytest.raises(asyncio.TimeoutError):
+            await llm_providers.complete("hi", prefer="slow")
+        return asyncio.get_running_loop().time() - start
+
+    assert asyncio.run(timed()) < 0.5
+
+
+def test_failing_provider_trips_its_circuit(providers, monkeypatch):
+    flaky, _ = providers(FakeProvider("flaky", fail=True), FakeProvider("backup"))
+    monkeypatch.setattr(llm_providers, "LLM_BREAKER_FAILURES", 2)
+    for _ in range(4):
+        assert asyncio.run(llm_providers.complete("hi", prefer="flaky")) == "backup: hi"
+    assert flaky.calls == 2  # skipped once open
+
+    # After the reset period a single trial call closes it again.
+    monkeypatch.setattr(llm_providers, "LLM_BREAKER_RESET_SECONDS", 0)
+    flaky.fail = False
+    assert asyncio.run(llm_providers.complete("hi", prefer="flaky")) == "flaky: hi"
+    assert llm_providers.LLM_CIRCUIT_OPEN.labels(provider="flaky")._value.get() == 0
+
+
+def test_stream_falls_back_before_the_first_piece(providers):
+    down, _ = providers(FakeProvider("down", fail=True), FakeProvider("up"))
+
+    async def collect():
+        return [piece async for piece in llm_providers.stream("a b", prefer="down")]
+
+    assert "".join(asyncio.run(collect())) == "up: a b "
+    assert down.calls == 1
+
+
+def test_stub_provider_serves_the_routes(client, monkeypatch):
+    monkeypatch.setattr(llm_providers, "LLM_PROVIDERS", ["stub"])
+    reply = client.post("/assistant/reply", json={"prompt": "Can we  move the call to Friday?"}).json()["reply"]
+    assert reply == "[stub] Can we move the call to Friday?"
+    rewritten = client.post("/assistant/gemini/rewrite", json={"text": "see you soon", "tone": "Friendly"}).json()
+    assert rewritten["reply"] == "[stub] see you soon"
+
+
+def test_no_configured_provider(monkeypatch):
+    monkeypatch.setattr(llm_providers, "LLM_PROVIDERS", ["openai"])
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    assert asyncio.run(gpt_service.generate_reply_async("hi")) == gpt_service.NOT_CONFIGURED
+
+
+def test_gemini_model_is_built_once(monkeypatch):
+    built = []
+
+    class FakeModel:
+        def __init__(self, name):
+            built.append(name)
+
+        async def generate_content_async(self, prompt, stream=False):
+            return SimpleNamespace(text="rewritten")
+
+    monkeypatch.setattr(gemini_service, "_gemini_configured", True)
+    monkeypatch.setattr(gemini_service.genai, "GenerativeModel", FakeModel)
+    monkeypatch.setattr(gemini_service, "_model", None)
+    for tone in ("Friendly", "Concise", "Professional"):
+        assert asyncio.run(gemini_service.rewrite_draft("hello", tone)) == "rewritten"
+    assert built == [gemini_service.GEMINI_MODEL]
@@ -0,0 +1,56 @@
+import base64
+
+from services.mime_body import extract_body, html_to_text
+
+
+def _part(mime_type, text=None, **extra):
+    part = {"mimeType": mime_type, "headers": extra.pop("headers", []), "body": extra.pop("body", {})}
+    if text is not None:
+        raw = text.encode(extra.pop("encoding", "utf-8"))
+        part["body"] = {"data": base64.urlsafe_b64encode(raw).decode(), "size": len(raw)}
+    part.update(extra)
+    return part
+
+
+def test_deeply_nested_parts_do_not_recurse():
+    payload = _part("text/plain", "innermost")
+    for _ in range(1500):  # deeper than the default recursion limit
+        payload = {"mimeType": "multipart/mixed", "parts": [payload]}
+    body = extract_body(payload)
+    assert body.text == "innermost"
+
+
+def test_attachments_are_skipped_and_recorded():
+    payload = {"mimeType": "multipart/mixed", "parts": [
+        _part("text/plain", "hello"),
+        _part("application/pdf", filename="invoice.pdf", body={"attachmentId": "att-1", "size": 52000}),
+        _part("image/png", "\x89PNG binary-ish"),
+    ]}
+    body = extract_body(payload)
+    assert body.text == "hello"
+    assert body.has_attachments
+    assert [a["filename"] for a in body.attachments] == ["invoice.pdf", ""]
+    assert body.attachments[0] == {"filename": "invoice.pdf", "mime_type": "application/pdf",
+                                   "size": 52000, "attachment_id": "att-1"}
+
+
+def test_text_is_capped_per_part_and_per_message():
+    payload = {"mimeType": "multipart/mixed", "parts": [_part("text/plain", "x" * 10_000) for _ in range(5)]}
+    body = extract_body(payload, part_max_chars=3000, max_chars=7000)
+    assert [len(chunk) for chunk in body.text.split("\n")] == [3000, 3000, 1000]
+    assert body.truncated
+
+
+def test_html_only_message_is_rendered_to_text():
+    markup = "<html><head><style>p{}</style></head><body><p>Hi&nbsp;there</p><script>x()</script>" \
+             "<div>Total: <b>$5</b></div></body></html>"
+    body = extract_body(_part("text/html", markup))
+    assert body.text == ""
+    assert body.analysis_text() == "Hi there\nTotal: $5"
+    assert html_to_text("a<br>b") == "a\nb"
+
+
+def test_declared_charset_is_used():
+    part = _part("text/plain", "café", encoding="latin-1",
+                 headers=[{"name": "Content-Type", "value": 'text/plain; charset="ISO-8859-1"'}])
+    assert extract_body(part).text == "café"
@@ -7,18 +7,21 @@ from fastapi.testclient import TestClient
 # Use a throwaway sqlite DB for tests
 os.environ["DATABASE_URL"] = "sqlite:///./test_search.db"
 
-from app import app  # noqa: E402
+from app import app, request_log  # noqa: E402
+from db import dispose_engine, engine  # noqa: E402
 
 
 @pytest.fixture(scope="module")
 def client():
-    db_path = Path("test_search.db")
-    if db_path.exists():
-        db_path.unlink()
+    db_files = [Path(f"{engine.url.database}{suffix}") for suffix in ("", "-wal", "-shm")]
+    for path in db_files:
+        path.unlink(missing_ok=True)
+    request_log.clear()
     with TestClient(app) as c:
         yield c
-    if db_path.exists():
-        db_path.unlink()
+    dispose_engine()
+    for path in db_files:
+        path.unlink(missing_ok=True)
 
 
 def test_search_emails_by_query(client):
@@ -100,3 +103,111 @@ def test_search_emails_pagination(client):
     # Pages should be different
     if page2:  # Only if there are enough emails
         assert page1[0]["id"] != page2[0]["id"]
+
+
+def test_search_ranks_subject_matches_first(client):
+    """Full-text search should rank subject hits above body-only hits."""
+    from services.email_store import upsert_emails
+
+    upsert_emails([
+        {"gmail_id": "rank-body", "subject": "Weekly notes", "body_text": "the zephyrine report is attached"},
+        {"gmail_id": "rank-subject", "subject": "Zephyrine report", "body_text": "see attached"},
+    ])
+    resp = client.get("/gmail/search", params={"query": "zephyrine"})
+    ids = [email["gmail_id"] for email in resp.json()["emails"]]
+    assert ids == ["rank-subject", "rank-body"]
+
+    filtered = client.get("/gmail/search", params={"query": "zephyrine", "status": "deleted"})
+    assert filtered.json()["emails"] == []
+
+
+def test_search_memory_backend_matches_prefixes(client):
+    """The in-process inverted index supports prefix matches and stays in sync."""
+    from services import search_index
+    from services.email_store import search_emails, upsert_emails
+
+    previous = search_index.get_search_backend()
+    try:
+        search_index.set_search_backend("memory")
+        upsert_emails([{"gmail_id": "mem-1", "subject": "Quarterly quokkas", "body_text": ""}])
+        assert [r.gmail_id for r in search_emails(query="quokka")] == ["mem-1"]
+
+        upsert_emails([{"gmail_id": "mem-1", "subject": "Renamed", "body_text": ""}])
+        assert search_emails(query="quokka") == []
+    finally:
+        search_index._backend = previous
+
+
+def test_async_ranked_search_scores_off_the_event_loop(client, monkeypatch):
+    import asyncio
+    import threading
+
+    from services import search_index
+    from services.email_store import search_emails_async, upsert_emails
+
+    previous = search_index.get_search_backend()
+    try:
+        backend = search_index.set_search_backend("memory")
+        upsert_emails([{"gmail_id": "mem-async", "subject": "Asynchronous wombats", "body_text": ""}])
+        scored_on = []
+        score = backend.score
+        monkeypatch.setattr(backend, "score", lambda query: scored_on.append(threading.current_thread()) or score(query))
+
+        async def search():
+            return await search_emails_async(query="wombat"), threading.current_thread()
+
+        records, loop_thread = asyncio.run(search())
+        assert [r.gmail_id for r in records] == ["mem-async"]
+        assert scored_on and loop_thread not in scored_on
+    finally:
+        search_index._backend = previous
+
+
+def test_cursor_pagination_walks_all_rows(client):
+    """Keyset cursors return every row exactly once, in the same order as offset paging."""
+    client.get("/gmail/fetch", params={"use_sample": True})
+    by_offset = client.get("/gmail/list", params={"limit": 500}).json()["emails"]
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 3, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/gmail/list", params=params).json()
+        seen.extend(email["id"] for email in page["emails"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [email["id"] for email in by_offset]
+
+    filtered = client.get("/gmail/search", params={"status": "keep", "limit": 2}).json()
+    assert filtered["next_cursor"]
+    after = client.get("/gmail/search", params={"status": "keep", "limit": 2, "cursor": filtered["next_cursor"]})
+    assert after.status_code == 200
+    assert filtered["emails"][-1]["id"] not in [email["id"] for email in after.json()["emails"]]
+
+
+def test_cursor_pagination_rejects_bad_cursors(client):
+    assert client.get("/gmail/list", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/threads/", params={"cursor": "not-a-cursor"}).status_code == 400
+    resp = client.get("/gmail/search", params={"query": "invoice", "cursor": "x"})
+    assert resp.status_code == 400
+
+
+def test_thread_cursor_pagination(client):
+    from datetime import datetime, timedelta
+
+    from services.threading_service import get_or_create_thread
+
+    base = datetime(2024, 1, 1)
+    for idx in range(5):
+        get_or_create_thread(f"cursor-thread-{idx}", f"Cursor topic {idx}", "a@example.com", None, base + timedelta(hours=idx))
+    get_or_create_thread("cursor-thread-undated", "Cursor undated", "a@example.com", None, None)
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/threads/", params=params).json()
+        seen.extend(thread["thread_id"] for thread in page["threads"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == [f"cursor-thread-{idx}" for idx in reversed(range(5))] + ["cursor-thread-undated"]
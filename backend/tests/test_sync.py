@@ -0,0 +1,100 @@
+import os
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+from fake_gmail import FakeGmailServer, make_message
+
+# Use a throwaway sqlite DB for tests
+os.environ["DATABASE_URL"] = "sqlite:///./test_sync.db"
+
+from app import app, request_log  # noqa: E402
+from db import dispose_engine, engine  # noqa: E402
+from services import gmail_service  # noqa: E402
+from services.account_service import create_account  # noqa: E402
+from services.email_store import list_emails  # noqa: E402
+from services.sync_service import get_sync_state, sync_account  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def client():
+    db_files = [Path(f"{engine.url.database}{suffix}") for suffix in ("", "-wal", "-shm")]
+    for path in db_files:
+        path.unlink(missing_ok=True)
+    request_log.clear()
+    with TestClient(app) as c:
+        yield c
+    dispose_engine()
+    for path in db_files:
+        path.unlink(missing_ok=True)
+
+
+@pytest.fixture(autouse=True)
+def no_quota(monkeypatch):
+    monkeypatch.setattr(gmail_service, "_quota", gmail_service.QuotaBudget(units_per_second=0))
+
+
+def _stored():
+    return {rec.gmail_id: rec for rec in list_emails(limit=500)}
+
+
+def test_incremental_sync_pulls_only_changes(client):
+    account = create_account(email="sync@example.com")
+    with FakeGmailServer([make_message(i) for i in range(20)]) as server:
+        service = server.service()
+        first = sync_account(service, account.id)
+        assert (first["mode"], first["added"]) == ("full", 20)
+        assert get_sync_state(account.id).history_id == str(server.history_id)
+
+        server.requests.clear()
+        quiet = sync_account(service, account.id)
+        assert (quiet["mode"], quiet["added"], quiet["deleted"], quiet["updated"]) == ("incremental", 0, 0, 0)
+        assert server.requests == ["GET /gmail/v1/users/me/history"]
+
+        server.add(make_message(100))
+        server.delete("m000001")
+        server.set_labels("m000002", ["INBOX", "STARRED"])
+        server.requests.clear()
+        result = sync_account(service, account.id)
+
+    assert (result["mode"], result["added"], result["deleted"], result["updated"]) == ("incremental", 1, 1, 1)
+    assert server.requests == ["GET /gmail/v1/users/me/history", "POST /batch"]
+    stored = _stored()
+    assert stored["m000100"].account_id == account.id
+    assert stored["m000001"].status == "deleted"
+    assert stored["m000002"].is_read and stored["m000002"].is_starred
+
+
+def test_expired_history_falls_back_to_full_sync(client):
+    account = create_account(email="expired@example.com")
+    with FakeGmailServer([make_message(i) for i in range(200, 205)]) as server:
+        service = server.service()
+        sync_account(service, account.id)
+        server.add(make_message(300))
+        server.expire_history()
+        result = sync_account(service, account.id)
+    assert (result["mode"], result["added"]) == ("full", 6)
+    assert get_sync_state(account.id).history_id == str(server.history_id)
+
+
+def test_metadata_sync_hydrates_bodies_on_open(client, monkeypatch):
+    monkeypatch.setattr(gmail_service, "GMAIL_FETCH_FORMAT", "metadata")
+    account = create_account(email="metadata@example.com")
+    with FakeGmailServer([make_message(i, body=f"Long body {i}") for i in range(400, 405)]) as server:
+        service = server.service()
+        sync_account(service, account.id)
+        stored = _stored()
+        assert stored["m000400"].body_state == "metadata"
+        assert stored["m000400"].body_text == ""
+        assert stored["m000400"].subject == "Message 400"
+
+        monkeypatch.setattr("services.sync_service.get_gmail_service", lambda: service)
+        opened = client.get("/gmail/email/m000400").json()["email"]
+        assert (opened["body_state"], opened["body_text"]) == ("full", "Long body 400")
+
+        # A later metadata re-sync keeps the downloaded body.
+        server.expire_history()
+        sync_account(service, account.id)
+    assert _stored()["m000400"].body_text == "Long body 400"
+    assert _stored()["m000401"].body_state == "metadata"
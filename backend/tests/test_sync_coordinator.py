@@ -0,0 +1,94 @@
+import threading
+import time
+
+import httplib2
+from googleapiclient.errors import HttpError
+
+from services import scheduler
+from services.scheduler import SyncCoordinator, is_quota_error
+
+
+def _http_error(status, reason=""):
+    return HttpError(httplib2.Response({"status": status}), f'{{"error": {{"errors": [{{"reason": "{reason}"}}]}}}}'.encode())
+
+
+def test_runs_are_bounded_and_never_overlap_per_account():
+    release = threading.Event()
+    lock = threading.Lock()
+    running, peak, calls = set(), [0], []
+
+    def sync(account_id):
+        with lock:
+            assert account_id not in running
+            running.add(account_id)
+            peak[0] = max(peak[0], len(running))
+            calls.append(account_id)
+        release.wait(5)
+        with lock:
+            running.discard(account_id)
+        return {"mode": "incremental"}
+
+    coordinator = SyncCoordinator(sync, workers=2)
+    futures = [coordinator.submit(i) for i in range(5)]
+    # Duplicates of queued or running accounts are dropped, not queued again.
+    assert coordinator.submit(0) is None
+    assert coordinator.submit(4) is None
+    time.sleep(0.1)
+    assert coordinator.queue_depth() == 3
+    release.set()
+    for future in futures:
+        assert future.result(5) == {"mode": "incremental"}
+    coordinator.shutdown(wait=True)
+    assert peak[0] == 2
+    assert sorted(calls) == [0, 1, 2, 3, 4]
+
+
+
+def test_shutdown_takes_cancelled_syncs_off_the_queue_gauge():
+    release = threading.Event()
+    before = scheduler.SYNC_QUEUE_DEPTH._value.get()
+    coordinator = SyncCoordinator(lambda account_id: release.wait(5), workers=1)
+    futures = [coordinator.submit(i) for i in range(4)]
+    time.sleep(0.1)
+    coordinator.shutdown()
+    release.set()
+    assert [future.cancelled() for future in futures] == [False, True, True, True]
+    assert coordinator.queue_depth() == 0
+    assert scheduler.SYNC_QUEUE_DEPTH._value.get() == before
+
+def test_failures_back_off_exponentially_and_reset_on_success(monkeypatch):
+    monkeypatch.setattr(scheduler, "SYNC_BACKOFF_BASE_SECONDS", 10)
+    monkeypatch.setattr(scheduler, "SYNC_QUOTA_BACKOFF_SECONDS", 100)
+    monkeypatch.setattr(scheduler, "SYNC_BACKOFF_MAX_SECONDS", 1000)
+    outcomes = [RuntimeError("boom"), RuntimeError("boom"), _http_error(429), None]
+    retries = []
+
+    def sync(account_id):
+        outcome = outcomes.pop(0)
+        if outcome:
+            raise outcome
+        return {"mode": "full"}
+
+    coordinator = SyncCoordinator(sync, workers=1, schedule_retry=lambda a, d: retries.append((a, d)))
+    assert coordinator.submit(7).result(5) is None
+    # Interval runs inside the backoff window are skipped; the retry job forces one.
+    assert coordinator.submit(7) is None
+    assert coordinator.submit(7, force=True).result(5) is None
+    assert coordinator.submit(7, force=True).result(5) is None
+    assert coordinator.submit(7, force=True).result(5) == {"mode": "full"}
+    assert coordinator.backoff_until(7) is None
+    coordinator.shutdown(wait=True)
+
+    delays = [d for _, d in retries]
+    assert [a for a, _ in retries] == [7, 7, 7]
+    assert 8 <= delays[0] <= 12
+    assert 16 <= delays[1] <= 24
+    assert 320 <= delays[2] <= 480  # quota error: quota base, third failure
+
+
+def test_quota_errors_are_recognised():
+    assert is_quota_error(_http_error(429))
+    assert is_quota_error(_http_error(403, "userRateLimitExceeded"))
+    assert not is_quota_error(_http_error(403, "insufficientPermissions"))
+    assert not is_quota_error(_http_error(500))
+    assert not is_quota_error(RuntimeError("boom"))
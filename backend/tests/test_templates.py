@@ -7,18 +7,21 @@ from fastapi.testclient import TestClient
 # Use a throwaway sqlite DB for tests
 os.environ["DATABASE_URL"] = "sqlite:///./test_templates.db"
 
-from app import app  # noqa: E402
+from app import app, request_log  # noqa: E402
+from db import dispose_engine, engine  # noqa: E402
 
 
 @pytest.fixture(scope="module")
 def client():
-    db_path = Path("test_templates.db")
-    if db_path.exists():
-        db_path.unlink()
+    db_files = [Path(f"{engine.url.database}{suffix}") for suffix in ("", "-wal", "-shm")]
+    for path in db_files:
+        path.unlink(missing_ok=True)
+    request_log.clear()
     with TestClient(app) as c:
         yield c
-    if db_path.exists():
-        db_path.unlink()
+    dispose_engine()
+    for path in db_files:
+        path.unlink(missing_ok=True)
 
 
 def test_create_template(client):